@@ -0,0 +1,137 @@
+"""
+Übernahme der früheren Speicherformate des Web-Backends.
+
+Vor der gemeinsamen Datenbank lagen die Objektdaten in objekte.json (eine
+JSON-Liste) und danach in objekte.jsonl (ein Datensatz pro Zeile, Löschungen
+als Grabstein, Mehrfachspeicherungen hinter einer Stapel-Kopfzeile). Beide
+Dateien werden nur noch gelesen und einmalig in die Datenbank übernommen.
+
+Die Tabelle objekt_daten hat das Log samt Schreib-Thread abgelöst und
+übernimmt dessen Zusicherungen:
+- Der Primärschlüssel bild_id ersetzt den Index im Speicher. Die
+  Duplikatprüfung bleibt unabhängig von der Datenmenge, ohne Aufbau beim
+  Start.
+- Eine Transaktion im WAL-Modus ersetzt das Anhängen mit fsync. Eine
+  Kompaktierung entfällt.
+- Die Schreibsperre von SQLite (BEGIN IMMEDIATE in
+  ConnectionPool.transaction) ersetzt den einzelnen Schreib-Thread und die
+  Dateisperre, auch über mehrere Worker-Prozesse hinweg.
+- Leser sehen einen WAL-Schnappschuss und warten nicht auf Schreiber.
+
+loadtest.py prüft das weiterhin auf verlorene oder doppelte Datensätze.
+"""
+import json
+import os
+
+from storage import insert_objects
+
+# Markiert einen gelöschten Datensatz im Log
+TOMBSTONE_KEY = "_geloescht"
+
+# Kopfzeile eines Stapels, der nur vollständig gültig ist
+BATCH_KEY = "_stapel"
+
+
+def read_log(log_path):
+    """
+    Liest die lebenden Datensätze aus objekte.jsonl.
+
+    Ein späterer Datensatz mit derselben bild_id ersetzt den früheren, ein
+    Grabstein entfernt ihn. Eine unvollständige letzte Zeile oder ein
+    unvollständiger letzter Stapel (Absturz beim Schreiben) wird ignoriert.
+
+    Returns:
+        Liste der Datensätze in der Reihenfolge ihres letzten Schreibens
+
+    Raises:
+        ValueError: Bei einer beschädigten Zeile mitten im Log
+    """
+    records = {}
+    batch = None
+
+    def apply(record):
+        bild_id = record["bild_id"]
+        records.pop(bild_id, None)
+        if not record.get(TOMBSTONE_KEY):
+            records[bild_id] = record
+
+    with open(log_path, "rb") as datei:
+        lines = datei.readlines()
+    for number, line in enumerate(lines, start=1):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            if number == len(lines):
+                break
+            raise ValueError(f"Beschädigte Zeile {number} in {log_path}")
+        if BATCH_KEY in record:
+            batch = [record[BATCH_KEY], []]
+            continue
+        if batch is None:
+            apply(record)
+            continue
+        batch[1].append(record)
+        if len(batch[1]) == batch[0]:
+            for entry in batch[1]:
+                apply(entry)
+            batch = None
+    return list(records.values())
+
+
+def read_records(log_path, legacy_path=None):
+    """
+    Liest die Objektdaten im jeweils neuesten vorhandenen Format.
+
+    objekte.jsonl hat Vorrang; die alte JSON-Datei wurde beim Anlegen des
+    Logs vollständig in dieses übernommen.
+    """
+    if os.path.exists(log_path) and os.path.getsize(log_path) > 0:
+        return read_log(log_path)
+    if legacy_path and os.path.exists(legacy_path):
+        with open(legacy_path, "r", encoding="utf-8") as datei:
+            inhalt = datei.read()
+        return json.loads(inhalt) if inhalt.strip() else []
+    return []
+
+
+def import_legacy_files(conn, log_path, legacy_path, logger=None):
+    """
+    Übernimmt objekte.jsonl bzw. objekte.json einmalig in die Datenbank.
+
+    Die Dateien werden danach in *.importiert umbenannt. Laufen mehrere
+    Server-Worker gleichzeitig an, ist das unschädlich: bereits gespeicherte
+    bild_ids überspringt insert_objects, und wer eine Datei nicht mehr
+    vorfindet, hat sie einem anderen Worker überlassen.
+
+    Args:
+        conn: sqlite3.Connection mit aktuellem Schema (außerhalb einer Transaktion)
+        log_path: Pfad zu objekte.jsonl
+        legacy_path: Pfad zu objekte.json
+        logger: Optionaler Logger
+
+    Returns:
+        Anzahl neu gespeicherter Datensätze
+    """
+    alte_dateien = [pfad for pfad in (log_path, legacy_path)
+                    if os.path.exists(pfad) and os.path.getsize(pfad) > 0]
+    if not alte_dateien:
+        return 0
+    try:
+        datensaetze = read_records(log_path, legacy_path)
+    except FileNotFoundError:
+        return 0
+    with conn:
+        anzahl = sum(insert_objects(conn, datensaetze))
+    for pfad in alte_dateien:
+        try:
+            os.replace(pfad, pfad + ".importiert")
+        except FileNotFoundError:
+            pass
+    try:
+        # Sperrdatei des früheren Logs
+        os.remove(log_path + ".lock")
+    except FileNotFoundError:
+        pass
+    if logger:
+        logger.info(f"{anzahl} Datensätze aus {', '.join(alte_dateien)} in die Datenbank übernommen")
+    return anzahl
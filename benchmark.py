@@ -0,0 +1,379 @@
+"""
+Benchmark-Suite für die Annotationswerkzeuge.
+
+Erzeugt einen synthetischen Bilderordner img/<Kategorie>/ samt vorbefüllter
+Box-Datenbank in einem Arbeitsverzeichnis und misst ohne Bildschirm:
+
+    category_load   Laden einer Kategorie (Katalog wie in load_images)
+    image_switch    Bildwechsel (Dekodieren in Anzeigegröße + Boxen lesen)
+    box_save        Speichern von Boxen über den BoxWriter
+    export          Durchsatz von export_category je Format
+    flask           Latenz und Durchsatz der Endpunkte in main.py
+
+Mit --gui werden zusätzlich die echten Methoden von gui4.BoundingBoxApp
+gemessen (benötigt ein Display, z.B. xvfb-run). Die Ergebnisse werden als
+JSON ausgegeben, um Läufe über Commits hinweg zu vergleichen.
+
+Aufruf:
+    python benchmark.py --categories 4 --images 200 --output ergebnis.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "webp": ".webp", "bmp": ".bmp"}
+
+
+def summarize(seconds):
+    """Fasst Einzelmessungen (in Sekunden) zu Kennzahlen in Millisekunden zusammen."""
+    if not seconds:
+        return {"n": 0}
+    values = sorted(seconds)
+    n = len(values)
+    return {
+        "n": n,
+        "mean_ms": round(sum(values) / n * 1000, 3),
+        "p50_ms": round(values[n // 2] * 1000, 3),
+        "p95_ms": round(values[min(n - 1, int(n * 0.95))] * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def generate_tree(work_dir, categories, images, resolutions, formats, seed=0):
+    """Erzeugt img/<Kategorie>/ mit synthetischen Bildern (Verläufe, schnell erzeugt)."""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    base = Image.linear_gradient("L")
+    templates = {}
+    paths = []
+    for c in range(categories):
+        category = f"kategorie_{c:03d}"
+        folder = os.path.join(work_dir, "img", category)
+        os.makedirs(folder, exist_ok=True)
+        for i in range(images):
+            resolution = resolutions[i % len(resolutions)]
+            fmt = formats[i % len(formats)]
+            if resolution not in templates:
+                gradient = base.resize(resolution)
+                templates[resolution] = Image.merge(
+                    "RGB", (gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT), gradient.rotate(180))
+                )
+            path = os.path.join(folder, f"bild_{i:06d}{EXTENSIONS[fmt]}")
+            templates[resolution].save(path, fmt.upper())
+            paths.append((category, path, resolution))
+    rng.shuffle(paths)
+    return paths
+
+
+def fill_database(work_dir, paths, boxes_per_image, seed=0):
+    """Legt die Datenbank an, liest den Katalog ein und schreibt zufällige Boxen."""
+    from catalog import ImageCatalog
+    from schema import insert_box
+    from storage import ConnectionPool
+
+    rng = random.Random(seed)
+    pool = ConnectionPool(os.path.join(work_dir, "bounding_boxes.db"))
+    conn = pool.connection()
+    ImageCatalog(conn, os.path.join(work_dir, "img")).refresh(force=True)
+    with pool.transaction():
+        for category, path, (width, height) in paths:
+            image_name = os.path.splitext(os.path.basename(path))[0]
+            for _ in range(boxes_per_image):
+                x1, y1 = rng.randrange(width // 2), rng.randrange(height // 2)
+                bbox = (x1, y1, x1 + rng.randrange(10, width // 2), y1 + rng.randrange(10, height // 2))
+                insert_box(conn, category, image_name, bbox)
+    pool.close_all()
+
+
+def bench_category_load(work_dir, categories):
+    """Kaltes (Verzeichnis neu einlesen) und warmes Laden der Bildliste einer Kategorie."""
+    from catalog import ImageCatalog
+    from storage import connect
+
+    conn = connect(os.path.join(work_dir, "bounding_boxes.db"))
+    catalog = ImageCatalog(conn, os.path.join(work_dir, "img"))
+    cold, warm = [], []
+    for category in categories:
+        start = time.perf_counter()
+        catalog.refresh_category(category)
+        catalog.image_paths(category)
+        cold.append(time.perf_counter() - start)
+        for _ in range(5):
+            start = time.perf_counter()
+            catalog.ensure_category(category)
+            catalog.image_paths(category)
+            warm.append(time.perf_counter() - start)
+    conn.close()
+    return {"cold": summarize(cold), "warm": summarize(warm)}
+
+
+def bench_image_switch(work_dir, paths, sample, canvas_size=(800, 600)):
+    """Dekodieren in Anzeigegröße plus Boxabfrage, wie beim Wechsel auf ein nicht vorgeladenes Bild."""
+    from prefetch import decode_for_display
+    from storage import connect
+
+    conn = connect(os.path.join(work_dir, "bounding_boxes.db"))
+    decode, boxes, total = [], [], []
+    for category, path, _ in paths[:sample]:
+        image_name = os.path.splitext(os.path.basename(path))[0]
+        decode_time, _ = timed(decode_for_display, path, canvas_size)
+        query_time, _ = timed(lambda: conn.execute(
+            "SELECT b.id, b.x1, b.y1, b.x2, b.y2 FROM categories c "
+            "JOIN images i ON i.category_id = c.id JOIN boxes b ON b.image_id = i.id "
+            "WHERE c.name = ? AND i.name = ? ORDER BY b.id", (category, image_name)
+        ).fetchall())
+        decode.append(decode_time)
+        boxes.append(query_time)
+        total.append(decode_time + query_time)
+    conn.close()
+    return {"decode": summarize(decode), "load_boxes": summarize(boxes), "total": summarize(total)}
+
+
+def bench_box_save(work_dir, paths, count, flush_threshold=50):
+    """Latenz von BoxWriter.add und der gebündelten Schreibvorgänge."""
+    from storage import BoxWriter, connect
+
+    conn = connect(os.path.join(work_dir, "bounding_boxes.db"))
+    writer = BoxWriter(conn, flush_threshold=10 ** 9)
+    add, flush = [], []
+    for i in range(count):
+        category, path, _ = paths[i % len(paths)]
+        image_name = os.path.splitext(os.path.basename(path))[0]
+        add.append(timed(writer.add, category, image_name, (1, 2, 30, 40))[0])
+        if len(writer) >= flush_threshold:
+            flush.append(timed(writer.flush)[0])
+    if len(writer):
+        flush.append(timed(writer.flush)[0])
+    conn.close()
+    return {"add": summarize(add), "flush": summarize(flush), "flush_threshold": flush_threshold}
+
+
+def bench_export(work_dir, category):
+    """Durchsatz von export_category für alle Formate."""
+    from exporter import EXPORT_FORMATS, export_category
+
+    results = {}
+    for fmt in EXPORT_FORMATS:
+        output = os.path.join(work_dir, "export", f"{category}.{fmt}")
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        result = export_category(
+            os.path.join(work_dir, "bounding_boxes.db"), os.path.join(work_dir, "img"),
+            category, fmt, output=output, resume=False
+        )
+        results[fmt] = {
+            "boxes": result["boxes"],
+            "seconds": round(result["seconds"], 4),
+            "boxes_per_second": round(result["boxes_per_second"]),
+        }
+    return results
+
+
+def bench_flask(work_dir, categories, paths, requests):
+    """Latenz und Durchsatz der Endpunkte über den Flask-Testclient."""
+    previous = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        import main
+        client = main.app.test_client()
+        category = categories[0]
+
+        def series(method, url_for, n, **kwargs):
+            times = []
+            start = time.perf_counter()
+            for i in range(n):
+                elapsed, response = timed(getattr(client, method), url_for(i), **kwargs)
+                if response.status_code >= 500:
+                    raise RuntimeError(f"{url_for(i)} -> {response.status_code}")
+                times.append(elapsed)
+            result = summarize(times)
+            result["requests_per_second"] = round(n / (time.perf_counter() - start))
+            return result
+
+        pages = client.get(f"/api/kategorien/{category}/bilder?limit=100").get_json()
+        cursor = pages["weiter"] or ""
+        results = {
+            "kategorien": series("get", lambda i: "/api/kategorien", requests),
+            "bilder_seite_1": series("get", lambda i: f"/api/kategorien/{category}/bilder?limit=100", requests),
+            "bilder_seite_2": series(
+                "get", lambda i: f"/api/kategorien/{category}/bilder?limit=100&nach={cursor}", requests
+            ),
+        }
+
+        times = []
+        for i in range(requests):
+            elapsed, _ = timed(client.post, "/api/objekt_daten",
+                               json={"bild_id": f"bench_{i}", "boxen": [[1, 2, 3, 4]]})
+            times.append(elapsed)
+        results["objekt_daten"] = summarize(times)
+
+        batch = [{"bild_id": f"stapel_{i}", "boxen": [[1, 2, 3, 4]]} for i in range(10000)]
+        elapsed, response = timed(client.post, "/api/objekt_daten/batch", json=batch)
+        results["objekt_daten_batch"] = {
+            "records": len(batch),
+            "seconds": round(elapsed, 4),
+            "records_per_second": round(len(batch) / elapsed),
+            "gespeichert": response.get_json()["gespeichert"],
+        }
+
+        sample = [os.path.relpath(path, os.path.join(work_dir, "img")).replace(os.sep, "/")
+                  for _, path, _ in paths[:min(requests, 50)]]
+        cold = series("get", lambda i: f"/api/bild/{sample[i]}?w=800&h=600&format=jpeg", len(sample))
+        warm = series("get", lambda i: f"/api/bild/{sample[i]}?w=800&h=600&format=jpeg", len(sample))
+        response = client.get(f"/api/bild/{sample[0]}?w=800&h=600&format=jpeg")
+        etag = response.headers["ETag"]
+        not_modified = series("get", lambda i: f"/api/bild/{sample[0]}?w=800&h=600&format=jpeg",
+                              requests, headers={"If-None-Match": etag})
+        results["bild_derivat"] = {"kalt": cold, "warm": warm, "nicht_geaendert": not_modified}
+        main.derivat_cache.shutdown()
+        main.db.close_all()
+        return results
+    finally:
+        os.chdir(previous)
+
+
+def bench_gui(work_dir, categories, sample):
+    """Misst die Methoden von gui4.BoundingBoxApp; benötigt ein Display."""
+    import tkinter as tk
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return {"skipped": str(e)}
+
+    previous = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        from gui4 import BoundingBoxApp
+        root.geometry("1200x800")
+        app = BoundingBoxApp(root, "img")
+        root.update()
+
+        load, switch, save = [], [], []
+        for category in categories:
+            app.current_category = category
+            app.prefetcher.cancel()
+            load.append(timed(app.load_images)[0])
+            root.update()
+            for _ in range(min(sample, len(app.images) - 1)):
+                start = time.perf_counter()
+                app.next_image()
+                root.update_idletasks()
+                switch.append(time.perf_counter() - start)
+                image_id = app.get_image_id_from_path(app.current_image_path)
+                save.append(timed(app.save_bounding_box, image_id, category, (5, 5, 50, 50))[0])
+        app.on_close()
+        return {
+            "load_images": summarize(load),
+            "next_image": summarize(switch),
+            "save_bounding_box": summarize(save),
+        }
+    finally:
+        os.chdir(previous)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark der Annotationswerkzeuge")
+    parser.add_argument("--categories", type=int, default=4, help="Anzahl der Kategorien")
+    parser.add_argument("--images", type=int, default=200, help="Bilder pro Kategorie")
+    parser.add_argument("--resolutions", default="1920x1080,4000x3000",
+                        help="Kommagetrennte Auflösungen, z.B. 1920x1080,4000x3000")
+    parser.add_argument("--formats", default="jpeg,png", help=f"Kommagetrennt aus {', '.join(EXTENSIONS)}")
+    parser.add_argument("--boxes", type=int, default=5, help="Vorhandene Boxen pro Bild")
+    parser.add_argument("--sample", type=int, default=50, help="Bilder pro Latenzmessung")
+    parser.add_argument("--requests", type=int, default=200, help="Anfragen pro Endpunktmessung")
+    parser.add_argument("--gui", action="store_true", help="Zusätzlich gui4 messen (benötigt ein Display)")
+    parser.add_argument("--work-dir", help="Arbeitsverzeichnis (Standard: temporär)")
+    parser.add_argument("--keep", action="store_true", help="Arbeitsverzeichnis nicht löschen")
+    parser.add_argument("--output", help="JSON-Datei für die Ergebnisse (Standard: stdout)")
+    args = parser.parse_args()
+
+    resolutions = [parse_resolution(r) for r in args.resolutions.split(",")]
+    formats = [f.strip().lower().replace("jpg", "jpeg") for f in args.formats.split(",")]
+    unknown = set(formats) - EXTENSIONS.keys()
+    if unknown:
+        parser.error(f"Unbekannte Formate: {', '.join(sorted(unknown))}")
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="benchmark_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        setup_start = time.perf_counter()
+        paths = generate_tree(work_dir, args.categories, args.images, resolutions, formats)
+        fill_database(work_dir, paths, args.boxes)
+        setup_seconds = time.perf_counter() - setup_start
+        categories = sorted({category for category, _, _ in paths})
+
+        results = {
+            "category_load": bench_category_load(work_dir, categories),
+            "image_switch": bench_image_switch(work_dir, paths, args.sample),
+            "box_save": bench_box_save(work_dir, paths, args.sample * 20),
+            "export": bench_export(work_dir, categories[0]),
+            "flask": bench_flask(work_dir, categories, paths, args.requests),
+        }
+        if args.gui:
+            results["gui"] = bench_gui(work_dir, categories, args.sample)
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "setup_seconds": round(setup_seconds, 2),
+                "parameters": {
+                    "categories": args.categories,
+                    "images": args.images,
+                    "resolutions": args.resolutions,
+                    "formats": formats,
+                    "boxes": args.boxes,
+                    "sample": args.sample,
+                    "requests": args.requests,
+                },
+            },
+            "results": results,
+        }
+    finally:
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as datei:
+            datei.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
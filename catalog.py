@@ -0,0 +1,430 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from schema import get_category_id
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
+
+UPSERT_IMAGE_SQL = '''
+    INSERT INTO images (category_id, name, file_name, file_size, mtime_ns, width, height, format)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(category_id, name) DO UPDATE SET
+        file_name = excluded.file_name,
+        file_size = excluded.file_size,
+        mtime_ns = excluded.mtime_ns,
+        width = excluded.width,
+        height = excluded.height,
+        format = excluded.format
+'''
+
+# Noch nicht in Originalbild-Koordinaten umgerechnete Boxen (siehe schema.COORD_SPACE_V5)
+LEGACY_BOXES_SQL = '''
+    SELECT b.id, i.name, b.x1, b.y1, b.x2, b.y2, i.width, i.height
+    FROM boxes b
+    JOIN images i ON i.id = b.image_id
+    JOIN categories c ON c.id = i.category_id
+    WHERE b.coord_space = ? {category_filter}
+'''
+
+# Herkunft alter Boxen -> Funktion (Originalgröße, Canvasgröße) -> ViewTransform der Anzeige
+#   thumbnail  gui.py, gui3.py, gut2.py: auf 800x600 eingepasst und zentriert
+#   gui4       frühere gui4.py: links oben, auf 90% der damaligen Canvasgröße eingepasst
+LEGACY_SOURCES = ("thumbnail", "gui4")
+
+
+def is_image_file(name):
+    """Prüft anhand der Endung, ob eine Datei ein unterstütztes Bild ist."""
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def scan_directory(path):
+    """
+    Listet die Bilddateien eines Verzeichnisses mit Größe und mtime auf.
+
+    os.scandir() liefert den Dateityp bereits aus dem Verzeichniseintrag, es
+    entfällt also das zusätzliche isfile() pro Eintrag.
+
+    Args:
+        path: Pfad zum Verzeichnis
+
+    Returns:
+        Liste von (Dateiname, Größe, mtime in ns)
+    """
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if is_image_file(entry.name) and entry.is_file():
+                stat = entry.stat()
+                files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return files
+
+
+def unique_stems(files):
+    """
+    Behält je Bildname (Dateiname ohne Endung) nur eine Datei.
+
+    Bilder sind über Kategorie und Namen ohne Endung eindeutig, a.jpg und
+    a.png wären also dasselbe Bild. Damit das Ergebnis nicht von der
+    Reihenfolge des Verzeichnisses abhängt, gilt der alphabetisch erste
+    Dateiname.
+
+    Args:
+        files: Liste von (Dateiname, Größe, mtime in ns) wie von scan_directory()
+
+    Returns:
+        (behaltene Einträge, Namen der übersprungenen Dateien)
+    """
+    kept = {}
+    skipped = []
+    for entry in sorted(files):
+        stem = os.path.splitext(entry[0])[0]
+        if stem in kept:
+            skipped.append(entry[0])
+        else:
+            kept[stem] = entry
+    return list(kept.values()), skipped
+
+
+def legacy_view(source, original_size, canvas_size=None):
+    """Gibt die ViewTransform zurück, mit der ein altes Werkzeug (LEGACY_SOURCES) das Bild zeigte."""
+    from tiles import centered_view, fitted_view, thumbnail_size
+    if source == "thumbnail":
+        return centered_view(original_size, thumbnail_size(original_size))
+    if source == "gui4":
+        if not canvas_size:
+            raise ValueError("Für Boxen der früheren gui4.py wird deren Canvasgröße benötigt")
+        return fitted_view(original_size, canvas_size)
+    raise ValueError(f"Unbekannte Herkunft alter Boxen: {source}")
+
+
+def convert_legacy_boxes(conn, coord_space, source, canvas_size=None, category=None, size_of=None):
+    """
+    Rechnet alte Boxen mit bekannter Herkunft in Originalbild-Koordinaten um.
+
+    Die Herkunft wird nicht erraten: 'display'-Boxen stammen sicher aus den
+    Vorschaubild-Werkzeugen, für 'unknown'-Boxen muss sie angegeben werden.
+    Ein Ergebnis, das um mehr als ein Anzeigepixel über das Bild hinausragt,
+    passt nicht zur angenommenen Herkunft; solche Boxen bleiben unverändert
+    und werden als 'unknown' zur Prüfung markiert. Öffnet oder beendet keine
+    Transaktion.
+
+    Args:
+        conn: sqlite3.Connection
+        coord_space: 'display' oder 'unknown'
+        source: Herkunft aus LEGACY_SOURCES
+        canvas_size: Canvasgröße (Breite, Höhe) der früheren gui4.py
+        category: Nur diese Kategorie (None = alle)
+        size_of: Optionale Funktion (Bildname) -> (Breite, Höhe) für Bilder
+            ohne Größe im Katalog
+
+    Returns:
+        (umgerechnete Boxen, abgelehnte Box-IDs); Boxen ohne bekannte Bildgröße
+        bleiben unverändert
+    """
+    if category is None:
+        rows = conn.execute(LEGACY_BOXES_SQL.format(category_filter=""), (coord_space,)).fetchall()
+    else:
+        rows = conn.execute(LEGACY_BOXES_SQL.format(category_filter="AND c.name = ?"),
+                            (coord_space, category)).fetchall()
+    updates = []
+    rejected = []
+    for box_id, image_name, x1, y1, x2, y2, width, height in rows:
+        size = (width, height) if width and height else (size_of(image_name) if size_of else None)
+        if not size:
+            continue
+        view = legacy_view(source, size, canvas_size)
+        x1, y1, x2, y2 = view.box_to_image((x1, y1, x2, y2))
+        # Rundungsspielraum: ein Pixel der damaligen Anzeige
+        slack = max(1, round(1 / view.scale))
+        if x1 < -slack or y1 < -slack or x2 > size[0] + slack or y2 > size[1] + slack:
+            rejected.append(box_id)
+            continue
+        updates.append((max(0, x1), max(0, y1), min(size[0], x2), min(size[1], y2), box_id))
+    conn.executemany(
+        "UPDATE boxes SET x1 = ?, y1 = ?, x2 = ?, y2 = ?, coord_space = 'image' WHERE id = ?", updates
+    )
+    conn.executemany("UPDATE boxes SET coord_space = 'unknown' WHERE id = ?", [(box_id,) for box_id in rejected])
+    return len(updates), rejected
+
+
+def legacy_box_ids(conn, category=None):
+    """Gibt die IDs der Boxen zurück, die noch nicht in Originalbild-Koordinaten vorliegen."""
+    if category is None:
+        rows = conn.execute("SELECT id FROM boxes WHERE coord_space <> 'image'")
+    else:
+        rows = conn.execute(
+            "SELECT b.id FROM categories c JOIN images i ON i.category_id = c.id "
+            "JOIN boxes b ON b.image_id = i.id AND b.coord_space <> 'image' WHERE c.name = ?",
+            (category,)
+        )
+    return {box_id for (box_id,) in rows}
+
+
+def read_image_info(path):
+    """
+    Liest Breite, Höhe und Format aus dem Bildheader, ohne zu dekodieren.
+
+    Returns:
+        Tuple (Breite, Höhe, Format), bei unlesbaren Dateien (None, None, None)
+    """
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            return img.width, img.height, img.format
+    except Exception:
+        return None, None, None
+
+
+class ImageCatalog:
+    """
+    Persistenter Katalog aller Bilder im Bilderordner.
+
+    Für jedes Bild werden Dateiname, Größe, mtime, Abmessungen und Format in
+    der Tabelle images abgelegt. Eine Aktualisierung liest nur Verzeichnisse
+    neu ein, deren mtime sich geändert hat, und liest Bildheader nur für neue
+    oder geänderte Dateien. Die Kategorieauswahl ist danach eine einzelne
+    Indexabfrage.
+    """
+
+    def __init__(self, conn, img_folder, max_workers=8, logger=None):
+        """
+        Args:
+            conn: sqlite3.Connection (nur im erzeugenden Thread verwenden)
+            img_folder: Pfad zum Bilderordner
+            max_workers: Anzahl paralleler Threads beim Einlesen
+            logger: Optionaler Logger
+        """
+        self.conn = conn
+        self.img_folder = img_folder
+        self.max_workers = max_workers
+        self.logger = logger
+        self._root_mtime = None
+
+    def _known_dirs(self):
+        return dict(self.conn.execute(
+            "SELECT c.name, d.mtime_ns FROM catalog_dirs d "
+            "JOIN categories c ON c.id = d.category_id WHERE d.present = 1"
+        ))
+
+    def _list_root(self):
+        dirs = {}
+        with os.scandir(self.img_folder) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    dirs[entry.name] = entry.stat().st_mtime_ns
+        return dirs
+
+    def refresh_categories(self):
+        """
+        Gleicht die Liste der Kategorien mit dem Bilderordner ab.
+
+        Neue Kategorien werden als noch nicht eingelesen eingetragen. Hat sich
+        die mtime des Bilderordners seit dem letzten Aufruf nicht geändert,
+        kostet der Aufruf nur ein stat().
+
+        Returns:
+            Dictionary {Kategorie: mtime in ns} der vorhandenen Verzeichnisse
+            oder None, wenn sich nichts geändert hat
+        """
+        root_mtime = os.stat(self.img_folder).st_mtime_ns
+        if root_mtime == self._root_mtime:
+            return None
+
+        dirs = self._list_root()
+        known = self._known_dirs()
+        with self.conn:
+            for name in dirs.keys() - known.keys():
+                category_id = get_category_id(self.conn, name, create=True)
+                self.conn.execute(
+                    "INSERT INTO catalog_dirs (category_id, mtime_ns, present) VALUES (?, NULL, 1) "
+                    "ON CONFLICT(category_id) DO UPDATE SET mtime_ns = NULL, present = 1",
+                    (category_id,)
+                )
+            for name in known.keys() - dirs.keys():
+                self.conn.execute(
+                    "UPDATE catalog_dirs SET present = 0 "
+                    "WHERE category_id = (SELECT id FROM categories WHERE name = ?)",
+                    (name,)
+                )
+        self._root_mtime = root_mtime
+        return dirs
+
+    def refresh(self, force=False):
+        """
+        Aktualisiert den Katalog inkrementell.
+
+        Verzeichnisse werden parallel eingelesen; die Datenbank wird nur aus
+        dem aufrufenden Thread beschrieben.
+
+        Args:
+            force: Alle Verzeichnisse unabhängig von ihrer mtime neu einlesen
+
+        Returns:
+            Anzahl der neu eingelesenen Verzeichnisse
+        """
+        if force:
+            self._root_mtime = None
+        dirs = self.refresh_categories()
+        if dirs is None:
+            dirs = self._list_root()
+        known = self._known_dirs()
+        changed = [name for name, mtime in dirs.items() if force or known.get(name) != mtime]
+        if not changed:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="catalog") as pool:
+            scans = pool.map(
+                lambda name: (name, scan_directory(os.path.join(self.img_folder, name))), changed
+            )
+            for name, files in scans:
+                self._apply_scan(name, dirs[name], files, pool)
+
+        if self.logger:
+            self.logger.info(f"Bildkatalog: {len(changed)} Verzeichnisse neu eingelesen")
+        return len(changed)
+
+    def refresh_category(self, category):
+        """Liest ein einzelnes Kategorieverzeichnis neu ein."""
+        path = os.path.join(self.img_folder, category)
+        dir_mtime = os.stat(path).st_mtime_ns
+        files = scan_directory(path)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="catalog") as pool:
+            self._apply_scan(category, dir_mtime, files, pool)
+
+    def _apply_scan(self, category, dir_mtime, files, pool):
+        """Schreibt das Ergebnis eines Verzeichnis-Scans in einer Transaktion."""
+        files, skipped = unique_stems(files)
+        if skipped and self.logger:
+            self.logger.warning(
+                f"Bildkatalog: {len(skipped)} Dateien in '{category}' übersprungen, da ein anderes "
+                f"Bild gleich heißt: {', '.join(skipped[:10])}"
+            )
+        category_id = get_category_id(self.conn, category, create=True)
+        existing = {
+            file_name: (image_id, file_size, mtime_ns)
+            for image_id, file_name, file_size, mtime_ns in self.conn.execute(
+                "SELECT id, file_name, file_size, mtime_ns FROM images "
+                "WHERE category_id = ? AND file_name IS NOT NULL",
+                (category_id,)
+            )
+        }
+
+        # Header nur für neue oder geänderte Dateien lesen
+        changed = [
+            (file_name, file_size, mtime_ns) for file_name, file_size, mtime_ns in files
+            if existing.get(file_name, (None,))[1:] != (file_size, mtime_ns)
+        ]
+        category_path = os.path.join(self.img_folder, category)
+        infos = pool.map(read_image_info, [os.path.join(category_path, f[0]) for f in changed])
+        rows = [
+            (category_id, os.path.splitext(file_name)[0], file_name, file_size, mtime_ns, *info)
+            for (file_name, file_size, mtime_ns), info in zip(changed, infos)
+        ]
+
+        # Gibt es den Namen noch mit anderer Endung, hat das Upsert den Datensatz übernommen
+        present = {os.path.splitext(file_name)[0] for file_name, _, _ in files}
+        removed = [image_id for file_name, (image_id, _, _) in existing.items()
+                   if os.path.splitext(file_name)[0] not in present]
+
+        with self.conn:
+            self.conn.executemany(UPSERT_IMAGE_SQL, rows)
+            if removed:
+                self.remove_images(removed)
+            self.conn.execute(
+                "INSERT INTO catalog_dirs (category_id, mtime_ns, present) VALUES (?, ?, 1) "
+                "ON CONFLICT(category_id) DO UPDATE SET mtime_ns = excluded.mtime_ns, present = 1",
+                (category_id, dir_mtime)
+            )
+
+    def remove_images(self, image_ids):
+        """
+        Entfernt Bilder aus dem Katalog.
+
+        Bilder mit Boxen bleiben als Datensatz erhalten, verlieren aber ihre
+        Dateiangaben, damit die Annotationen nicht verloren gehen.
+        """
+        params = [(image_id,) for image_id in image_ids]
+        self.conn.executemany(
+            "DELETE FROM images WHERE id = ? AND NOT EXISTS "
+            "(SELECT 1 FROM boxes WHERE boxes.image_id = images.id)",
+            params
+        )
+        self.conn.executemany(
+            "UPDATE images SET file_name = NULL, file_size = NULL, mtime_ns = NULL "
+            "WHERE id = ?",
+            params
+        )
+
+    def ensure_category(self, category):
+        """
+        Liest eine Kategorie neu ein, falls sie fehlt oder sich ihre mtime geändert hat.
+
+        Im Normalfall kostet der Aufruf ein stat() und eine Indexabfrage.
+
+        Returns:
+            True, wenn das Verzeichnis neu eingelesen wurde
+        """
+        dir_mtime = os.stat(os.path.join(self.img_folder, category)).st_mtime_ns
+        row = self.conn.execute(
+            "SELECT d.mtime_ns FROM catalog_dirs d JOIN categories c ON c.id = d.category_id "
+            "WHERE c.name = ? AND d.present = 1",
+            (category,)
+        ).fetchone()
+        if row is not None and row[0] == dir_mtime:
+            return False
+        self.refresh_category(category)
+        return True
+
+    def categories(self):
+        """Gibt die Namen aller vorhandenen Kategorien sortiert zurück."""
+        return [name for (name,) in self.conn.execute(
+            "SELECT c.name FROM catalog_dirs d JOIN categories c ON c.id = d.category_id "
+            "WHERE d.present = 1 ORDER BY c.name"
+        )]
+
+    def file_names(self, category):
+        """
+        Gibt die Dateinamen aller Bilder einer Kategorie sortiert zurück.
+
+        Die Abfrage liest ausschließlich den Index idx_images_catalog.
+        """
+        return [file_name for (file_name,) in self.conn.execute(
+            "SELECT i.file_name FROM categories c JOIN images i ON i.category_id = c.id "
+            "WHERE c.name = ? AND i.file_name IS NOT NULL ORDER BY i.file_name",
+            (category,)
+        )]
+
+    def image_paths(self, category):
+        """Gibt die Pfade aller Bilder einer Kategorie sortiert zurück."""
+        category_path = os.path.join(self.img_folder, category)
+        return [os.path.join(category_path, file_name) for file_name in self.file_names(category)]
+
+    def annotated_names(self, category, image_names):
+        """
+        Ermittelt, welche der angegebenen Bilder mindestens eine Box haben.
+
+        Args:
+            category: Name der Kategorie
+            image_names: Bildnamen ohne Endung, höchstens einige hundert
+
+        Returns:
+            Menge der Bildnamen mit Boxen
+        """
+        if not image_names:
+            return set()
+        placeholders = ",".join("?" * len(image_names))
+        return {name for (name,) in self.conn.execute(
+            "SELECT i.name FROM categories c JOIN images i ON i.category_id = c.id "
+            f"WHERE c.name = ? AND i.name IN ({placeholders}) "
+            "AND EXISTS (SELECT 1 FROM boxes b WHERE b.image_id = i.id)",
+            (category, *image_names)
+        )}
+
+    def image_size(self, category, image_name):
+        """Gibt (Breite, Höhe) eines Bildes aus dem Katalog zurück oder None."""
+        row = self.conn.execute(
+            "SELECT i.width, i.height FROM categories c JOIN images i ON i.category_id = c.id "
+            "WHERE c.name = ? AND i.name = ?",
+            (category, image_name)
+        ).fetchone()
+        return (row[0], row[1]) if row and row[0] else None
@@ -0,0 +1,290 @@
+"""
+Kommandozeilenwerkzeug für Build-Server ohne Display.
+
+Nutzt dieselbe Speicher-, Katalog- und Exportlogik wie gui4.py, importiert
+aber kein tkinter. Module werden erst im jeweiligen Unterbefehl geladen,
+damit einfache Aufrufe schnell starten. Ergebnisse werden als JSON auf
+stdout ausgegeben, Fortschritt auf stderr.
+
+Aufruf:
+    python cli.py scan --img-folder img
+    python cli.py import boxen.csv --format csv
+    python cli.py export --category Hunde --format coco
+    python cli.py validate --report qa_bericht.csv --fail-on-issues
+    python cli.py stats --category Hunde
+    python cli.py warm --category Hunde
+    python cli.py migrate
+    python cli.py migrate --legacy-source gui4 --legacy-canvas 1200x800
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+
+def emit(data):
+    json.dump(data, sys.stdout, indent=2, ensure_ascii=False)
+    sys.stdout.write("\n")
+
+
+def report_progress(label):
+    """Gibt eine Fortschrittsfunktion zurück, die auf stderr schreibt."""
+    def progress(done, total=None):
+        suffix = f"/{total}" if total else ""
+        print(f"{label}: {done}{suffix}", file=sys.stderr)
+    return progress
+
+
+def cmd_scan(args):
+    """Aktualisiert den Bildkatalog aus dem Bilderordner."""
+    from catalog import ImageCatalog
+    from schema import ensure_schema
+    from storage import connect
+
+    conn = connect(args.db)
+    try:
+        ensure_schema(conn)
+        catalog = ImageCatalog(conn, args.img_folder)
+        changed = catalog.refresh(force=args.force)
+        categories = {name: len(catalog.file_names(name)) for name in catalog.categories()}
+    finally:
+        conn.close()
+    emit({"rescanned_directories": changed, "categories": categories})
+    return 0
+
+
+def cmd_import(args):
+    """Importiert Boxen aus einer Datei oder einem Verzeichnis."""
+    from importer import import_file
+
+    options = {"img_folder": args.img_folder} if args.format == "yolo" else {}
+    result = import_file(args.db, args.source, args.format, category=args.category,
+                         progress=report_progress("Gelesen"), defer_index=args.defer_index, **options)
+    emit(result)
+    return 0
+
+
+def cmd_export(args):
+    """Exportiert eine oder alle Kategorien."""
+    from exporter import default_output, export_category
+    from schema import ensure_schema
+    from storage import connect
+
+    conn = connect(args.db)
+    try:
+        ensure_schema(conn)
+        if args.category:
+            categories = [args.category]
+        else:
+            categories = [name for (name,) in conn.execute(
+                "SELECT c.name FROM categories c WHERE EXISTS "
+                "(SELECT 1 FROM images i JOIN boxes b ON b.image_id = i.id WHERE i.category_id = c.id) "
+                "ORDER BY c.name"
+            )]
+    finally:
+        conn.close()
+
+    results = []
+    for category in categories:
+        output = default_output(category, args.format)
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            output = os.path.join(args.output_dir, output)
+        results.append(export_category(
+            args.db, args.img_folder, category, args.format, output=output,
+            progress=report_progress(f"Export {category}"), resume=not args.restart
+        ))
+    emit(results)
+    return 0
+
+
+def cmd_validate(args):
+    """Prüft die Boxen auf Duplikate und ungültige Koordinaten."""
+    try:
+        from qa import run_qa
+    except ImportError as e:
+        print(f"Die Prüfung benötigt NumPy: {e}", file=sys.stderr)
+        return 2
+
+    report = run_qa(args.db, args.category, args.iou, args.max_aspect, args.min_size,
+                    progress=report_progress("Geprüft"))
+    if args.report:
+        report.write_csv(args.report)
+    emit(report.summary())
+    return 1 if args.fail_on_issues and any(report.counts().values()) else 0
+
+
+def cmd_stats(args):
+    """Gibt den Annotationsstand aus."""
+    from schema import ensure_schema
+    from stats import dataset_stats, stats_text
+    from storage import connect
+
+    conn = connect(args.db)
+    try:
+        ensure_schema(conn)
+        stats = dataset_stats(conn, args.category, args.days)
+    finally:
+        conn.close()
+    if args.text:
+        print(stats_text(stats))
+    else:
+        emit(stats)
+    return 0
+
+
+def cmd_warm(args):
+    """Füllt den Pixel-Cache für eine oder alle Kategorien vor."""
+    from catalog import ImageCatalog
+    from pixel_cache import PixelCache
+    from schema import ensure_schema
+    from storage import connect
+
+    conn = connect(args.db)
+    try:
+        ensure_schema(conn)
+        catalog = ImageCatalog(conn, args.img_folder)
+        catalog.refresh()
+        categories = [args.category] if args.category else catalog.categories()
+        image_paths = [path for category in categories for path in catalog.image_paths(category)]
+    finally:
+        conn.close()
+
+    cache = PixelCache(args.cache_dir, max_bytes=args.budget_mb * 1024 * 1024)
+    canvas_size = args.canvas or cache.last_canvas_size()
+    emit(cache.warm(image_paths, canvas_size, max_workers=args.workers, progress=report_progress("Vorgewärmt")))
+    return 0
+
+
+def parse_size(text):
+    """Liest eine Größe im Format BREITExHÖHE."""
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Ungültige Größe '{text}', erwartet z.B. 800x600")
+    return (width, height)
+
+
+def cmd_migrate(args):
+    """
+    Bringt das Datenbankschema auf den aktuellen Stand, übernimmt alte
+    Objektdaten und rechnet Boxen der alten Werkzeuge um.
+
+    Boxen aus gui3.py/gut2.py ('display') werden immer umgerechnet, Boxen
+    unklarer Herkunft ('unknown') nur mit --legacy-source.
+    """
+    from annotation_log import import_legacy_files
+    from catalog import ImageCatalog, convert_legacy_boxes
+    from schema import SCHEMA_VERSION, ensure_schema
+    from storage import connect
+
+    if args.legacy_source == "gui4" and not args.legacy_canvas:
+        raise ValueError("--legacy-source gui4 benötigt --legacy-canvas")
+    conn = connect(args.db)
+    try:
+        before = conn.execute("PRAGMA user_version").fetchone()[0]
+        ensure_schema(conn)
+        after = conn.execute("PRAGMA user_version").fetchone()[0]
+        imported = import_legacy_files(conn, args.objects_log, args.objects_json)
+
+        # Die Umrechnung braucht die Bildgrößen aus dem Katalog
+        if os.path.isdir(args.img_folder):
+            ImageCatalog(conn, args.img_folder).refresh()
+        with conn:
+            converted, rejected = convert_legacy_boxes(conn, "display", "thumbnail")
+            if args.legacy_source:
+                more, more_rejected = convert_legacy_boxes(conn, "unknown", args.legacy_source,
+                                                           canvas_size=args.legacy_canvas)
+                converted += more
+                rejected += more_rejected
+        remaining = dict(conn.execute(
+            "SELECT coord_space, COUNT(*) FROM boxes WHERE coord_space <> 'image' GROUP BY coord_space"
+        ).fetchall())
+    finally:
+        conn.close()
+    emit({"database": args.db, "from_version": before, "to_version": after, "current": SCHEMA_VERSION,
+          "imported_objects": imported,
+          "legacy_boxes": {"converted": converted, "rejected": rejected[:100], "remaining": remaining}})
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bounding-Box-Werkzeuge ohne Oberfläche")
+    parser.add_argument("--db", default="bounding_boxes.db", help="Pfad zur Datenbank")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="Bildkatalog aktualisieren")
+    scan.add_argument("--img-folder", default="img", help="Bilderordner")
+    scan.add_argument("--force", action="store_true", help="Alle Verzeichnisse neu einlesen")
+    scan.set_defaults(func=cmd_scan)
+
+    # Formate wie importer.IMPORT_FORMATS und exporter.EXPORT_FORMATS; nicht importiert, um den Start kurz zu halten
+    import_ = commands.add_parser("import", help="Boxen importieren")
+    import_.add_argument("source", help="Quelldatei oder -verzeichnis")
+    import_.add_argument("--format", default="csv", choices=("csv", "coco", "yolo", "voc"))
+    import_.add_argument("--category", help="Zielkategorie (sonst aus der Quelle)")
+    import_.add_argument("--img-folder", default="img", help="Bilderordner (für die Bildgrößen bei YOLO)")
+    # Ohne Angabe entscheidet der Importer nach dem Verhältnis neuer zu vorhandenen Boxen
+    import_.add_argument("--keep-index", dest="defer_index", action="store_false", default=None,
+                         help="Boxindex nie neu aufbauen, sondern beim Einfügen nachführen")
+    import_.add_argument("--rebuild-index", dest="defer_index", action="store_true",
+                         help="Boxindex immer nach dem Einfügen neu aufbauen")
+    import_.set_defaults(func=cmd_import)
+
+    export = commands.add_parser("export", help="Boxen exportieren")
+    export.add_argument("--category", help="Nur diese Kategorie (Standard: alle mit Boxen)")
+    export.add_argument("--format", default="csv", choices=("csv", "coco", "yolo", "voc"))
+    export.add_argument("--img-folder", default="img", help="Bilderordner (für Dateinamen und Größen)")
+    export.add_argument("--output-dir", help="Zielverzeichnis")
+    export.add_argument("--restart", action="store_true", help="Unterbrochenen Export nicht fortsetzen")
+    export.set_defaults(func=cmd_export)
+
+    validate = commands.add_parser("validate", help="Boxen prüfen")
+    validate.add_argument("--category", help="Nur diese Kategorie prüfen")
+    validate.add_argument("--iou", type=float, default=0.9, help="IoU-Schwelle für Duplikate")
+    validate.add_argument("--max-aspect", type=float, default=10.0, help="Höchstes Seitenverhältnis")
+    validate.add_argument("--min-size", type=int, default=2, help="Mindestbreite und -höhe in Pixeln")
+    validate.add_argument("--report", help="CSV-Datei für alle Befunde")
+    validate.add_argument("--fail-on-issues", action="store_true", help="Exit-Code 1 bei Befunden")
+    validate.set_defaults(func=cmd_validate)
+
+    stats = commands.add_parser("stats", help="Annotationsstand ausgeben")
+    stats.add_argument("--category", help="Nur diese Kategorie")
+    stats.add_argument("--days", type=int, default=30, help="Zeitraum der Tagesstatistik")
+    stats.add_argument("--text", action="store_true", help="Als Text statt JSON ausgeben")
+    stats.set_defaults(func=cmd_stats)
+
+    warm = commands.add_parser("warm", help="Pixel-Cache für die Oberfläche vorwärmen")
+    warm.add_argument("--category", help="Nur diese Kategorie (Standard: alle)")
+    warm.add_argument("--img-folder", default="img", help="Bilderordner")
+    warm.add_argument("--canvas", type=parse_size,
+                      help="Canvasgröße BREITExHÖHE (Standard: zuletzt in der Oberfläche genutzt)")
+    warm.add_argument("--cache-dir", default=os.path.join(".cache", "pixel"), help="Verzeichnis des Pixel-Caches")
+    warm.add_argument("--budget-mb", type=int, default=2048, help="Plattenbudget des Pixel-Caches in MB")
+    warm.add_argument("--workers", type=int, help="Anzahl paralleler Dekodierer")
+    warm.set_defaults(func=cmd_warm)
+
+    migrate = commands.add_parser("migrate", help="Datenbankschema aktualisieren, alte Daten übernehmen und umrechnen")
+    migrate.add_argument("--objects-log", default="objekte.jsonl", help="Altes Objektlog des Web-Backends")
+    migrate.add_argument("--objects-json", default="objekte.json", help="Alte Objektdatei des Web-Backends")
+    migrate.add_argument("--img-folder", default="img", help="Bilderordner (für die Bildgrößen)")
+    migrate.add_argument("--legacy-source", choices=("thumbnail", "gui4"),
+                         help="Herkunft der Boxen unklarer Herkunft: thumbnail (gui.py) oder gui4 (frühere gui4.py)")
+    migrate.add_argument("--legacy-canvas", type=parse_size,
+                         help="Canvasgröße BREITExHÖHE der früheren gui4.py (für --legacy-source gui4)")
+    migrate.set_defaults(func=cmd_migrate)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import timer
+
+# Format -> (PIL-Format, MIME-Typ, Dateiendung)
+FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+    "webp": ("WEBP", "image/webp", ".webp"),
+    "png": ("PNG", "image/png", ".png"),
+}
+
+# Grenzen für angefragte Abmessungen und Qualität
+MAX_DIMENSION = 4096
+DEFAULT_QUALITY = 85
+
+
+def derivative_key(source_path, mtime_ns, width, height, fmt, quality):
+    """Bildet den Cache-Schlüssel aus Quelle, mtime und Parametern (dient auch als ETag)."""
+    raw = f"{os.path.abspath(source_path)}|{mtime_ns}|{width}x{height}|{fmt}|{quality}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def render_derivative(source_path, target_path, width, height, fmt, quality):
+    """
+    Verkleinert ein Bild auf höchstens width x height und speichert es im Zielformat.
+
+    JPEGs werden per draft() bereits beim Dekodieren verkleinert. Das Ergebnis
+    wird zuerst in eine Temp-Datei geschrieben und dann atomar umbenannt, damit
+    parallele Leser nie eine halbe Datei sehen.
+    """
+    from PIL import Image
+
+    pil_format = FORMATS[fmt][0]
+    with Image.open(source_path) as img:
+        img.draft("RGB", (width, height))
+        img.thumbnail((width, height), Image.LANCZOS)
+        if pil_format == "JPEG" and img.mode != "RGB":
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA")
+
+        tmp_path = f"{target_path}.{threading.get_ident()}.tmp"
+        options = {"quality": quality} if pil_format in ("JPEG", "WEBP") else {"optimize": True}
+        try:
+            img.save(tmp_path, pil_format, **options)
+        except BaseException:
+            # Eine halb geschriebene Temp-Datei würde sonst liegen bleiben
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    os.replace(tmp_path, target_path)
+
+
+def cache_entries(cache_dir):
+    """
+    Liefert (Pfad, Größe, mtime) aller Cache-Einträge eines Verzeichnisses.
+
+    Einträge liegen in Unterverzeichnissen (key[:2]); Dateien direkt im
+    Cache-Verzeichnis sind Metadaten (z.B. canvas.json des Pixel-Caches) und
+    werden weder mitgezählt noch verdrängt.
+    """
+    for root, _, files in os.walk(cache_dir):
+        if root == cache_dir:
+            continue
+        for name in files:
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+
+def trim_cache_dir(cache_dir, max_bytes):
+    """
+    Löscht die am längsten nicht genutzten Dateien eines Cache-Verzeichnisses.
+
+    Die mtime dient als Zeitpunkt der letzten Nutzung (die Caches setzen sie
+    bei jedem Treffer per os.utime()). Es wird auf 90% des Budgets verkleinert,
+    damit nicht bei jeder neuen Datei erneut aufgeräumt wird. Dateien, die sich
+    nicht löschen lassen (unter Windows z.B. noch gemappte), bleiben stehen.
+
+    Returns:
+        (verbleibende Bytes, Anzahl gelöschter Dateien)
+    """
+    entries = sorted(cache_entries(cache_dir), key=lambda entry: entry[2])
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for path, size, _ in entries:
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return total, removed
+
+
+class DerivativeCache:
+    """
+    Festplatten-Cache für verkleinerte, neu kodierte Bildversionen.
+
+    Die Dateien liegen unter cache_dir, benannt nach einem Hash aus Quellpfad,
+    mtime und Parametern; eine geänderte Quelle erzeugt so automatisch einen
+    neuen Eintrag. Erzeugt wird in einem Thread-Pool, gleichzeitige Anfragen
+    nach derselben Version warten auf denselben Auftrag. Überschreitet der
+    Cache max_bytes, werden die am längsten nicht genutzten Dateien gelöscht.
+    """
+
+    def __init__(self, cache_dir, max_workers=None, max_bytes=2 * 1024 ** 3, logger=None):
+        """
+        Args:
+            cache_dir: Verzeichnis für die erzeugten Dateien
+            max_workers: Größe des Thread-Pools (Standard: CPU-Anzahl, höchstens 4)
+            max_bytes: Obergrenze für die Größe des Cache-Verzeichnisses
+            logger: Optionaler Logger
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(4, os.cpu_count() or 1),
+            thread_name_prefix="derivat"
+        )
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._bytes = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, key, fmt):
+        return os.path.join(self.cache_dir, key[:2], key + FORMATS[fmt][2])
+
+    def get(self, source_path, mtime_ns, width, height, fmt="jpeg", quality=DEFAULT_QUALITY):
+        """
+        Gibt den Pfad der passenden Version zurück und erzeugt sie bei Bedarf.
+
+        Args:
+            source_path: Pfad zum Originalbild
+            mtime_ns: mtime des Originals (Teil des Schlüssels)
+            width, height: Maximale Abmessungen
+            fmt: Schlüssel aus FORMATS
+            quality: Qualität für JPEG und WebP
+
+        Returns:
+            Pfad zur Datei im Cache
+        """
+        key = derivative_key(source_path, mtime_ns, width, height, fmt, quality)
+        target = self.path_for(key, fmt)
+        try:
+            # Zugriffszeit für die Verdrängung merken
+            os.utime(target)
+            return target
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._executor.submit(
+                    self._render, key, source_path, target, width, height, fmt, quality
+                )
+                self._pending[key] = future
+        return future.result()
+
+    def _render(self, key, source_path, target, width, height, fmt, quality):
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with timer("derivative_render_seconds", format=fmt):
+                render_derivative(source_path, target, width, height, fmt, quality)
+            self._account(os.path.getsize(target))
+            return target
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _account(self, nbytes):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in cache_entries(self.cache_dir))
+            else:
+                self._bytes += nbytes
+            if self._bytes <= self.max_bytes:
+                return
+            self._bytes, removed = trim_cache_dir(self.cache_dir, self.max_bytes)
+        if self.logger:
+            self.logger.info(f"Derivat-Cache bereinigt: {removed} Dateien entfernt")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,510 @@
+import csv
+import json
+import os
+import threading
+import time
+from xml.sax.saxutils import escape
+
+from metrics import observe
+from schema import ensure_schema
+from storage import connect
+
+EXPORT_FORMATS = ("csv", "coco", "yolo", "voc")
+
+# Anzahl der Zeilen, die pro fetchmany() aus der Datenbank gelesen werden
+CHUNK_SIZE = 10000
+
+# Nach so vielen Bildern wird der Fortschritt für die Wiederaufnahme gesichert
+CHECKPOINT_EVERY = 500
+
+BOX_QUERY = '''
+    SELECT i.id, i.name, i.file_name, i.width, i.height, b.id, l.name, b.x1, b.y1, b.x2, b.y2
+    FROM categories c
+    JOIN images i ON i.category_id = c.id
+    JOIN boxes b ON b.image_id = i.id
+    LEFT JOIN labels l ON l.id = b.label_id
+    WHERE c.name = ? AND i.name > ?
+    ORDER BY i.name, b.id
+'''
+
+COUNT_QUERY = '''
+    SELECT COUNT(*)
+    FROM categories c
+    JOIN images i ON i.category_id = c.id
+    JOIN boxes b ON b.image_id = i.id
+    WHERE c.name = ? AND i.name > ?
+'''
+
+# Boxen, die noch nicht in Originalbild-Koordinaten vorliegen (über den Teilindex idx_boxes_legacy)
+LEGACY_QUERY = '''
+    SELECT b.id
+    FROM categories c
+    JOIN images i ON i.category_id = c.id
+    JOIN boxes b ON b.image_id = i.id
+    WHERE c.name = ? AND i.name > ? AND b.coord_space <> 'image'
+'''
+
+LABEL_QUERY = '''
+    SELECT DISTINCT l.id, l.name
+    FROM categories c
+    JOIN images i ON i.category_id = c.id
+    JOIN boxes b ON b.image_id = i.id
+    JOIN labels l ON l.id = b.label_id
+    WHERE c.name = ?
+    ORDER BY l.name
+'''
+
+
+class ExportCancelled(Exception):
+    """Wird ausgelöst, wenn ein Export abgebrochen wurde; er bleibt fortsetzbar."""
+
+
+def iter_image_boxes(conn, category, after="", exclude=frozenset()):
+    """
+    Liefert die Boxen einer Kategorie bildweise, ohne alle Zeilen zu laden.
+
+    Args:
+        conn: sqlite3.Connection
+        category: Name der Kategorie
+        after: Nur Bilder mit größerem Namen liefern (für die Wiederaufnahme)
+        exclude: Box-IDs, die ausgelassen werden; Bilder ohne übrige Boxen entfallen
+
+    Yields:
+        (Bild-ID, Bildname, Dateiname, Größe, Liste von (Box-ID, Label, x1, y1, x2, y2));
+        Dateiname und Größe stammen aus dem Bildkatalog und können None sein
+    """
+    cursor = conn.execute(BOX_QUERY, (category, after))
+    current = None
+    boxes = []
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            break
+        for image_id, image_name, file_name, width, height, box_id, label, x1, y1, x2, y2 in rows:
+            if box_id in exclude:
+                continue
+            if current is not None and current[0] != image_id:
+                yield (*current, boxes)
+                boxes = []
+            current = (image_id, image_name, file_name, (width, height) if width else None)
+            boxes.append((box_id, label or category, x1, y1, x2, y2))
+    if current is not None:
+        yield (*current, boxes)
+
+
+class ImageFileLookup:
+    """
+    Ordnet Bildnamen (ohne Endung) ihren Dateien und Abmessungen zu.
+
+    Rückfall für Bilder, die noch nicht im Bildkatalog stehen. Das
+    Verzeichnis wird einmal gelesen; die Bildgröße stammt aus dem Header,
+    das Bild wird dafür nicht dekodiert.
+    """
+
+    def __init__(self, category_path):
+        self.category_path = category_path
+        self._files = None
+
+    def filename(self, image_name):
+        if self._files is None:
+            self._files = {}
+            try:
+                with os.scandir(self.category_path) as entries:
+                    for entry in entries:
+                        self._files.setdefault(os.path.splitext(entry.name)[0], entry.name)
+            except OSError:
+                pass
+        return self._files.get(image_name, image_name)
+
+    def size(self, image_name):
+        from PIL import Image
+        try:
+            with Image.open(os.path.join(self.category_path, self.filename(image_name))) as img:
+                return img.size
+        except OSError:
+            return None
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class CsvWriter:
+    """Schreibt alle Boxen in eine CSV-Datei (bisheriges Exportformat)."""
+
+    def __init__(self, output, labels):
+        self.path = output + ".csv" if not output.endswith(".csv") else output
+        self.file = None
+        self.writer = None
+
+    def begin(self, state):
+        if state:
+            # Verwirft alles, was nach dem letzten Sicherungspunkt geschrieben wurde
+            self.file = open(self.path, "r+", newline="")
+            self.file.truncate(state["offset"])
+            self.file.seek(state["offset"])
+        else:
+            self.file = open(self.path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        if not state:
+            self.writer.writerow(["Image ID", "Kategorie", "X1", "Y1", "X2", "Y2"])
+
+    def write_image(self, category, image_id, image_name, filename, size, boxes):
+        self.writer.writerows(
+            (image_name, category, x1, y1, x2, y2)
+            for _, _, x1, y1, x2, y2 in boxes
+        )
+
+    def state(self):
+        self.file.flush()
+        return {"offset": self.file.tell()}
+
+    def finish(self):
+        self.file.close()
+
+    def close(self):
+        if self.file and not self.file.closed:
+            self.file.close()
+
+
+class CocoWriter:
+    """
+    Schreibt eine COCO-JSON-Datei inkrementell.
+
+    Bilder werden direkt in die Zieldatei geschrieben, Annotationen in eine
+    Nebendatei, die am Ende angehängt wird. Als IDs dienen die stabilen
+    Datenbank-IDs, sodass eine Wiederaufnahme keine Zähler benötigt.
+    """
+
+    def __init__(self, output, labels):
+        self.path = output if output.endswith(".json") else output + ".json"
+        self.annotations_path = self.path + ".annotations.part"
+        self.labels = labels
+        self.label_ids = {name: label_id for label_id, name in labels}
+        self.images_file = None
+        self.annotations_file = None
+        self.images_written = 0
+        self.annotations_written = 0
+
+    def begin(self, state):
+        if state:
+            self.images_file = open(self.path, "r+")
+            self.images_file.truncate(state["images_offset"])
+            self.images_file.seek(state["images_offset"])
+            self.annotations_file = open(self.annotations_path, "r+")
+            self.annotations_file.truncate(state["annotations_offset"])
+            self.annotations_file.seek(state["annotations_offset"])
+            self.images_written = state["images_written"]
+            self.annotations_written = state["annotations_written"]
+        else:
+            self.images_file = open(self.path, "w")
+            self.annotations_file = open(self.annotations_path, "w")
+            self.images_file.write('{"images": [')
+
+    def write_image(self, category, image_id, image_name, filename, size, boxes):
+        width, height = size or (None, None)
+        image = {"id": image_id, "file_name": f"{category}/{filename}", "width": width, "height": height}
+        self.images_file.write(("," if self.images_written else "") + json.dumps(image))
+        self.images_written += 1
+
+        for box_id, label, x1, y1, x2, y2 in boxes:
+            annotation = {
+                "id": box_id,
+                "image_id": image_id,
+                "category_id": self.label_ids.get(label),
+                "bbox": [x1, y1, x2 - x1, y2 - y1],
+                "area": (x2 - x1) * (y2 - y1),
+                "iscrowd": 0,
+            }
+            self.annotations_file.write(("," if self.annotations_written else "") + json.dumps(annotation))
+            self.annotations_written += 1
+
+    def state(self):
+        self.images_file.flush()
+        self.annotations_file.flush()
+        return {
+            "images_offset": self.images_file.tell(),
+            "annotations_offset": self.annotations_file.tell(),
+            "images_written": self.images_written,
+            "annotations_written": self.annotations_written,
+        }
+
+    def finish(self):
+        self.images_file.write('], "annotations": [')
+        self.annotations_file.close()
+        with open(self.annotations_path) as part:
+            while True:
+                block = part.read(1024 * 1024)
+                if not block:
+                    break
+                self.images_file.write(block)
+        categories = [{"id": label_id, "name": name} for label_id, name in self.labels]
+        self.images_file.write('], "categories": ' + json.dumps(categories) + "}")
+        self.images_file.close()
+        os.remove(self.annotations_path)
+
+    def close(self):
+        for f in (self.images_file, self.annotations_file):
+            if f and not f.closed:
+                f.close()
+
+
+class YoloWriter:
+    """
+    Schreibt eine YOLO-Textdatei pro Bild und eine classes.txt.
+
+    Bilder, deren Größe unbekannt ist, werden übersprungen, da YOLO
+    normierte Koordinaten verlangt.
+    """
+
+    def __init__(self, output, labels):
+        self.directory = output
+        self.class_index = {name: index for index, (_, name) in enumerate(labels)}
+        self.labels = labels
+        self.skipped = 0
+
+    def begin(self, state):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "classes.txt"), "w") as f:
+            f.writelines(f"{name}\n" for _, name in self.labels)
+
+    def write_image(self, category, image_id, image_name, filename, size, boxes):
+        if not size:
+            self.skipped += 1
+            return
+        width, height = size
+        lines = []
+        for _, label, x1, y1, x2, y2 in boxes:
+            lines.append(
+                f"{self.class_index.get(label, 0)} "
+                f"{(x1 + x2) / 2 / width:.6f} {(y1 + y2) / 2 / height:.6f} "
+                f"{(x2 - x1) / width:.6f} {(y2 - y1) / height:.6f}\n"
+            )
+        with open(os.path.join(self.directory, image_name + ".txt"), "w") as f:
+            f.writelines(lines)
+
+    def state(self):
+        return {}
+
+    def finish(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class VocWriter:
+    """Schreibt eine Pascal-VOC-XML-Datei pro Bild."""
+
+    def __init__(self, output, labels):
+        self.directory = output
+
+    def begin(self, state):
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write_image(self, category, image_id, image_name, filename, size, boxes):
+        width, height = size or (0, 0)
+        parts = [
+            "<annotation>\n",
+            f"  <folder>{escape(category)}</folder>\n",
+            f"  <filename>{escape(filename)}</filename>\n",
+            f"  <size><width>{width}</width><height>{height}</height><depth>3</depth></size>\n",
+        ]
+        for _, label, x1, y1, x2, y2 in boxes:
+            parts.append(
+                f"  <object><name>{escape(label)}</name><difficult>0</difficult>"
+                f"<bndbox><xmin>{x1}</xmin><ymin>{y1}</ymin><xmax>{x2}</xmax><ymax>{y2}</ymax></bndbox>"
+                f"</object>\n"
+            )
+        parts.append("</annotation>\n")
+        with open(os.path.join(self.directory, image_name + ".xml"), "w") as f:
+            f.writelines(parts)
+
+    def state(self):
+        return {}
+
+    def finish(self):
+        pass
+
+    def close(self):
+        pass
+
+
+WRITERS = {
+    "csv": CsvWriter,
+    "coco": CocoWriter,
+    "yolo": YoloWriter,
+    "voc": VocWriter,
+}
+
+
+def default_output(category, fmt):
+    """Gibt den Standard-Zielpfad für eine Kategorie und ein Format zurück."""
+    if fmt == "csv":
+        return f"{category}_bounding_boxes.csv"
+    if fmt == "coco":
+        return f"{category}_coco.json"
+    return f"{category}_{fmt}"
+
+
+def checkpoint_path(output):
+    """Pfad der Fortschrittsdatei, über die ein Export fortgesetzt wird."""
+    return output.rstrip("/\\") + ".export-progress.json"
+
+
+def export_category(db_path, img_folder, category, fmt, output=None,
+                    progress=None, cancel_event=None, resume=True):
+    """
+    Exportiert die Boxen einer Kategorie im gewählten Format.
+
+    Die Daten werden blockweise aus der Datenbank gelesen und sofort
+    geschrieben. Alle CHECKPOINT_EVERY Bilder wird der Fortschritt gesichert;
+    ein abgebrochener Export setzt beim nächsten Aufruf dort wieder an.
+
+    Args:
+        db_path: Pfad zur Datenbank
+        img_folder: Bilderordner (für Dateinamen und Bildgrößen)
+        category: Name der Kategorie
+        fmt: Eines von EXPORT_FORMATS
+        output: Zielpfad (Datei oder Verzeichnis), sonst default_output()
+        progress: Optionale Funktion (erledigte Boxen, Gesamtzahl)
+        cancel_event: Optionales threading.Event zum Abbrechen
+        resume: Einen unterbrochenen Export fortsetzen, falls möglich
+
+    Returns:
+        Dictionary mit Pfad, Anzahl Bilder/Boxen, Dauer, Durchsatz und der Anzahl
+        ausgelassener, noch nicht umgerechneter Boxen alter Werkzeuge
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unbekanntes Exportformat: {fmt}")
+    output = output or default_output(category, fmt)
+    progress_path = checkpoint_path(output)
+
+    checkpoint = None
+    if resume and os.path.exists(progress_path):
+        with open(progress_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("format") != fmt or checkpoint.get("category") != category:
+            checkpoint = None
+
+    conn = connect(db_path)
+    writer = None
+    try:
+        ensure_schema(conn)
+        lookup = ImageFileLookup(os.path.join(img_folder, category))
+
+        labels = checkpoint["labels"] if checkpoint else \
+            [tuple(row) for row in conn.execute(LABEL_QUERY, (category,))]
+        after = checkpoint["last_image"] if checkpoint else ""
+        boxes_done = checkpoint["boxes_done"] if checkpoint else 0
+        images_done = checkpoint["images_done"] if checkpoint else 0
+        # Boxen der alten Werkzeuge rechnet erst "cli.py migrate" um; bis dahin auslassen
+        legacy = {box_id for (box_id,) in conn.execute(LEGACY_QUERY, (category, after))}
+        total = boxes_done + conn.execute(COUNT_QUERY, (category, after)).fetchone()[0] - len(legacy)
+        if total == 0:
+            # Ohne Boxen weder leere Ausgabedateien noch einen Checkpoint anlegen
+            return {
+                "output": None,
+                "format": fmt,
+                "images": 0,
+                "boxes": 0,
+                "seconds": 0.0,
+                "boxes_per_second": 0.0,
+                "resumed": False,
+                "skipped_images": 0,
+                "unconverted_boxes": len(legacy),
+            }
+
+        writer = WRITERS[fmt](output, labels)
+        writer.begin(checkpoint["writer"] if checkpoint else None)
+
+        start = time.perf_counter()
+        new_boxes = 0
+        since_checkpoint = 0
+        last_image = after
+        for image_id, image_name, file_name, size, boxes in iter_image_boxes(conn, category, after, legacy):
+            if size is None and fmt != "csv":
+                size = lookup.size(image_name)
+            writer.write_image(category, image_id, image_name, file_name or lookup.filename(image_name), size, boxes)
+            images_done += 1
+            boxes_done += len(boxes)
+            new_boxes += len(boxes)
+            last_image = image_name
+            since_checkpoint += 1
+
+            if since_checkpoint >= CHECKPOINT_EVERY:
+                since_checkpoint = 0
+                _write_json_atomic(progress_path, {
+                    "format": fmt, "category": category, "labels": labels,
+                    "last_image": last_image, "boxes_done": boxes_done,
+                    "images_done": images_done, "writer": writer.state(),
+                })
+                if progress:
+                    progress(boxes_done, total)
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled(f"Export nach {images_done} Bildern abgebrochen")
+
+        writer.finish()
+        elapsed = time.perf_counter() - start
+        observe("export_seconds", elapsed, format=fmt)
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        if progress:
+            progress(boxes_done, total)
+
+        return {
+            "output": output,
+            "format": fmt,
+            "images": images_done,
+            "boxes": boxes_done,
+            "seconds": elapsed,
+            "boxes_per_second": new_boxes / elapsed if elapsed > 0 else 0.0,
+            "resumed": checkpoint is not None,
+            "skipped_images": getattr(writer, "skipped", 0),
+            "unconverted_boxes": len(legacy),
+        }
+    finally:
+        if writer:
+            writer.close()
+        conn.close()
+
+
+class ExportJob(threading.Thread):
+    """
+    Führt einen Export in einem Hintergrund-Thread aus.
+
+    Fortschritt und Ergebnis werden in eine Queue gelegt, die die Oberfläche
+    im Tk-Hauptthread abfragt.
+    """
+
+    def __init__(self, events, *args, **kwargs):
+        """
+        Args:
+            events: queue.Queue für ("progress", erledigt, gesamt),
+                ("done", Ergebnis) oder ("error", Ausnahme)
+            *args, **kwargs: Argumente für export_category()
+        """
+        super().__init__(daemon=True, name="export")
+        self.events = events
+        self.cancel_event = threading.Event()
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        try:
+            result = export_category(
+                *self.args,
+                progress=lambda done, total: self.events.put(("progress", done, total)),
+                cancel_event=self.cancel_event,
+                **self.kwargs
+            )
+            self.events.put(("done", result))
+        except Exception as e:
+            self.events.put(("error", e))
+
+    def cancel(self):
+        """Bricht den Export am nächsten Sicherungspunkt ab."""
+        self.cancel_event.set()
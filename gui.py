@@ -5,26 +5,19 @@ import os
 import json
 import sqlite3 
 import random
+from catalog import ImageCatalog
+from schema import ensure_schema, insert_box
+from storage import connect
+from tiles import centered_view
 
 # Datenbank-Setup
 # Initialisierung der SQLite-Datenbank für die Speicherung der Bounding Boxes
 db_path = 'bounding_boxes.db'
-conn = sqlite3.connect(db_path)
+conn = connect(db_path)
 cursor = conn.cursor()
 
-# Erstellen der Tabelle 'boxes', wenn sie nicht existiert. Jede Box wird eindeutig durch ihre Image-ID und Kategorie identifiziert.
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS boxes (
-    id INTEGER PRIMARY KEY,
-    image_id TEXT NOT NULL,
-    category TEXT NOT NULL,
-    x1 INTEGER NOT NULL,
-    y1 INTEGER NOT NULL,
-    x2 INTEGER NOT NULL,
-    y2 INTEGER NOT NULL,
-    UNIQUE(image_id, category)
-)
-''')
+# Erstellt das Schema bzw. migriert eine alte Datenbank (mehrere Boxen pro Bild möglich).
+ensure_schema(conn)
 conn.commit()
 
 
@@ -53,13 +46,18 @@ class BoundingBoxApp:
         # Variablen für die aktuelle Zeichnung.
         self.start_x, self.start_y, self.rect_id = None, None, None
         
+        # Abbildung zwischen Originalbild- und Canvas-Koordinaten des angezeigten Bildes
+        self.view = None
+        
         self.load_categories()  # Lädt die Kategorien aus den Bildordnern.
 
     # Lädt die Bildkategorien aus den Ordnernamen und fügt sie der Listbox hinzu.
 
     def load_categories(self):
         try:
-            categories = [name for name in os.listdir(self.img_folder) if os.path.isdir(os.path.join(self.img_folder, name))]
+            catalog = ImageCatalog(conn, self.img_folder)
+            catalog.refresh_categories()
+            categories = catalog.categories()
             for category in categories:
                 self.kategorien_listbox.insert(tk.END, category)
         except Exception as e:
@@ -75,11 +73,12 @@ class BoundingBoxApp:
         self.canvas.coords(self.rect_id, self.start_x, self.start_y, event.x, event.y)
 
     def save_bounding_box(self, image_id, category, bbox):
+        if self.view is None:
+            messagebox.showinfo("Info", "Kein Bild angezeigt.")
+            return
         try:
-            cursor.execute('''
-                INSERT INTO boxes (image_id, category, x1, y1, x2, y2)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (image_id, category, bbox[0], bbox[1], bbox[2], bbox[3]))
+            # Gespeichert wird in Koordinaten des Originalbildes, wie in gui4.py
+            insert_box(conn, category, image_id, self.view.box_to_image(bbox))
             conn.commit()
         except sqlite3.IntegrityError:
             print(f"Eintrag für Image-ID {image_id} in Kategorie {category} existiert bereits.")
@@ -117,7 +116,9 @@ class BoundingBoxApp:
         """Lädt ein einzelnes Bild und gibt das PhotoImage-Objekt zurück."""
         try:
             img = Image.open(image_path)
+            original_size = img.size
             img.thumbnail((800, 600), Image.ANTIALIAS)
+            self.view = centered_view(original_size, img.size)
             return ImageTk.PhotoImage(img)
         except Exception as e:
             messagebox.showerror("Fehler", f"Das Bild konnte nicht geladen werden: {e}")
@@ -150,9 +151,9 @@ class BoundingBoxApp:
             return
         selected_category = self.kategorien_listbox.get(selected_category_index[0])
 
-        image_paths = [os.path.join(self.img_folder, selected_category, f)
-                       for f in os.listdir(os.path.join(self.img_folder, selected_category))
-                       if os.path.isfile(os.path.join(self.img_folder, selected_category, f))]
+        catalog = ImageCatalog(conn, self.img_folder)
+        catalog.ensure_category(selected_category)
+        image_paths = catalog.image_paths(selected_category)
 
         total_images = len(image_paths)
         validation_set_size = int(total_images * 0.2)
@@ -179,7 +180,10 @@ class BoundingBoxApp:
     
     def is_image_processed(self, image_id, category):
         # Überprüfung, ob das Bild bereits verarbeitet wurde
-        cursor.execute("SELECT 1 FROM boxes WHERE image_id = ? AND category = ?", (image_id, category))
+        cursor.execute("""SELECT 1 FROM categories c
+                          JOIN images i ON i.category_id = c.id
+                          JOIN boxes b ON b.image_id = i.id
+                          WHERE c.name = ? AND i.name = ? LIMIT 1""", (category, image_id))
         return cursor.fetchone() is not None
 
 
@@ -4,6 +4,10 @@ from PIL import Image, ImageTk
 import os
 import sqlite3
 import random
+from catalog import ImageCatalog
+from schema import ensure_schema, insert_box
+from storage import connect
+from tiles import centered_view
 
 class BoundingBoxApp:
     def __init__(self, master, img_folder):
@@ -15,24 +19,16 @@ class BoundingBoxApp:
         self.current_image_path = None
         self.images = []
         self.start_x, self.start_y, self.rect_id = None, None, None
+        # Abbildung zwischen Originalbild- und Canvas-Koordinaten des angezeigten Bildes
+        self.view = None
         self.init_db()
         self.setup_ui()
 
     def init_db(self):
-        self.conn = sqlite3.connect(self.database_path)
+        self.conn = connect(self.database_path)
         self.cursor = self.conn.cursor()
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS boxes (
-                id INTEGER PRIMARY KEY,
-                image_id TEXT NOT NULL,
-                category TEXT NOT NULL,
-                x1 INTEGER NOT NULL,
-                y1 INTEGER NOT NULL,
-                x2 INTEGER NOT NULL,
-                y2 INTEGER NOT NULL,
-                UNIQUE(image_id, category)
-            )
-        ''')
+        ensure_schema(self.conn)
+        self.catalog = ImageCatalog(self.conn, self.img_folder)
         self.conn.commit()
 
     def setup_ui(self):
@@ -48,14 +44,15 @@ class BoundingBoxApp:
         self.canvas.bind('<ButtonRelease-1>', self.on_canvas_release)
 
     def load_categories(self):
-        categories = [name for name in os.listdir(self.img_folder) if os.path.isdir(os.path.join(self.img_folder, name))]
+        self.catalog.refresh_categories()
+        categories = self.catalog.categories()
         for category in categories:
             self.kategorien_listbox.insert(tk.END, category)
     def load_images(self, image_path):
             try:
                 
-                category_path = os.path.join(self.img_folder, self.current_category)
-                self.images = [os.path.join(category_path, img) for img in os.listdir(category_path) if os.path.isfile(os.path.join(category_path, img))]
+                self.catalog.ensure_category(self.current_category)
+                self.images = self.catalog.image_paths(self.current_category)
                 self.current_image_index = 0
                 self.display_next_image()
         
@@ -63,6 +60,17 @@ class BoundingBoxApp:
             except Exception as e:
                 messagebox.showerror("Fehler", f"Das Bild konnte nicht geladen werden: {e}")
                 return None
+    def load_image(self, image_path):
+        try:
+            img = Image.open(image_path)
+            original_size = img.size
+            img.thumbnail((800, 600), Image.ANTIALIAS)
+            self.view = centered_view(original_size, img.size)
+            return ImageTk.PhotoImage(img)
+        except Exception as e:
+            messagebox.showerror("Fehler", f"Das Bild konnte nicht geladen werden: {e}")
+            return None
+
     def on_category_select(self, event):
         selection = self.kategorien_listbox.curselection()
         if selection:
@@ -74,7 +82,7 @@ class BoundingBoxApp:
     def display_next_image(self):
         if self.current_image_index < len(self.images):
             self.current_image_path = self.images[self.current_image_index]
-            self.photo_img = self.load_images(self.current_image_path)
+            self.photo_img = self.load_image(self.current_image_path)
             if self.photo_img:
                 self.canvas.create_image(400, 300, image=self.photo_img, anchor=tk.CENTER)
                 self.current_image_index += 1
@@ -94,16 +102,16 @@ class BoundingBoxApp:
         end_x, end_y = event.x, event.y
         if self.rect_id:
             bbox = (self.start_x, self.start_y, end_x, end_y)
-            image_id = os.path.basename(self.current_image_path)
+            image_id = os.path.splitext(os.path.basename(self.current_image_path))[0]
             self.save_bounding_box(image_id, self.current_category, bbox)
             self.rect_id = None  # Reset rectangle ID after drawing
 
     def save_bounding_box(self, image_id, category, bbox):
+        if self.view is None:
+            return
         try:
-            self.cursor.execute('''
-                INSERT INTO boxes (image_id, category, x1, y1, x2, y2)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (image_id, category, *bbox))
+            # Gespeichert wird in Koordinaten des Originalbildes, wie in gui4.py
+            insert_box(self.conn, category, image_id, self.view.box_to_image(bbox))
             self.conn.commit()
         except sqlite3.IntegrityError:
             messagebox.showerror("Fehler", "Bounding Box bereits vorhanden für dieses Bild in dieser Kategorie.")
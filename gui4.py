@@ -2,26 +2,56 @@ import tkinter as tk
 from tkinter import Listbox, messagebox, ttk
 from PIL import Image, ImageTk
 import os
+import bisect
+import queue
 import sqlite3
-import csv
+import threading
 import logging
+from image_cache import ImageCache
+from prefetch import ImagePrefetcher
+from pixel_cache import PixelCache
+from derivatives import DerivativeCache
+from thumbnails import ThumbnailGrid
+from virtual_list import VirtualList
+from tiles import TilePyramid, ViewTransform, pil_image_nbytes
+from storage import BoxWriter, ConnectionPool
+from overlay import BoxOverlay
+from stats import category_progress, dataset_stats, stats_text
+from metrics import REGISTRY, timer
+from catalog import ImageCatalog
+from watcher import CATEGORY_ADDED, CATEGORY_REMOVED, IMAGE_ADDED, IMAGE_REMOVED, FolderWatcher
+from exporter import EXPORT_FORMATS, ExportCancelled, ExportJob, checkpoint_path, default_output
 
 class BoundingBoxApp:
-    def __init__(self, root, img_folder):
+    def __init__(self, root, img_folder, cache_budget_mb=256, pixel_cache_budget_mb=2048,
+                 flush_interval_ms=2000, flush_threshold=50,
+                 metrics_path='bounding_box_metrics.json', metrics_interval_ms=60000):
         """
         Initialisiert die Bounding Box App.
         
         Args:
             root: Das Tkinter Root-Widget
             img_folder: Pfad zum Ordner mit den Bildern
+            cache_budget_mb: Speicherbudget des Bild-Caches in MB
+            pixel_cache_budget_mb: Plattenbudget des persistenten Pixel-Caches in MB
+            flush_interval_ms: Maximale Zeit, die Box-Änderungen ungespeichert bleiben
+            flush_threshold: Anzahl vorgemerkter Box-Änderungen, ab der sofort gespeichert wird
+            metrics_path: Datei, in die die Laufzeitmessungen regelmäßig geschrieben werden
+            metrics_interval_ms: Abstand zwischen zwei Schreibvorgängen der Messungen
         """
         self.root = root
         self.img_folder = img_folder
         self.db_path = 'bounding_boxes.db'
         
         # Datenbank-Variablen
+        self.db = None
         self.conn = None
         self.cursor = None
+        self.box_writer = None
+        self.catalog = None
+        self.flush_interval_ms = flush_interval_ms
+        self.flush_threshold = flush_threshold
+        self.flush_job = None
         
         # Bild-Variablen
         self.photo_img = None
@@ -29,25 +59,87 @@ class BoundingBoxApp:
         self.current_image_index = 0
         self.current_image_position = None
         self.images = []
-        self.image_cache = {}
+        self.image_cache = ImageCache(max_bytes=cache_budget_mb * 1024 * 1024)
+        
+        # Dekodierte Bilder in Anzeigegröße, auch über Neustarts hinweg
+        self.pixel_cache = PixelCache(os.path.join(".cache", "pixel"),
+                                      max_bytes=pixel_cache_budget_mb * 1024 * 1024)
+        
+        # Vorschaubilder der Übersicht, gemeinsam mit dem Webserver (main.py) genutzt
+        self.thumbnail_cache = DerivativeCache(os.path.join(".cache", "derivate"))
+        self.thumbnail_window = None
+        self.thumbnail_grid = None
+        
+        # Vorladen der Nachbarbilder im Hintergrund
+        self.prefetcher = ImagePrefetcher(ahead=3, behind=1, decoder=self.pixel_cache.decode)
+        
+        # Abbildung zwischen Originalbild- und Canvas-Koordinaten
+        self.view = None
+        
+        # Zoom-Modus mit Kachelpyramide für große Bilder
+        self.zoom_mode = False
+        self.pyramid = None
+        self.pan_last = None
+        self.tile_photos = []
+        self.level_cache = ImageCache(max_bytes=512 * 1024 * 1024, sizeof=pil_image_nbytes)
+        self.tile_cache = ImageCache(max_bytes=64 * 1024 * 1024, sizeof=pil_image_nbytes)
+        self.tile_photo_cache = ImageCache(max_bytes=128 * 1024 * 1024)
         
         # Bounding Box-Variablen
         self.start_x, self.start_y = None, None
         self.end_x, self.end_y = None, None
         self.rect_id = None
         self.last_box_id = None
+        self.image_box_ids = []
+        self.overlay = None
+        
+        # Verschieben oder Größenändern einer vorhandenen Box
+        self.edit = None
         
         # Kategorie-Variable
         self.current_category = None
         
+        # Export im Hintergrund
+        self.export_job = None
+        self.export_events = None
+        
+        # Qualitätsprüfung im Hintergrund und Prüfliste der Befunde
+        self.qa_job = None
+        self.qa_events = None
+        self.qa_window = None
+        self.review_items = []
+        
+        # Laufzeitmessungen
+        self.metrics_path = metrics_path
+        self.metrics_interval_ms = metrics_interval_ms
+        self.metrics_window = None
+        self.metrics_job = None
+        
+        # Statistik-Panel
+        self.stats_window = None
+        self.stats_job = None
+        
+        # Überwachung des Bilderordners
+        self.watcher = None
+        self.watcher_events = queue.Queue()
+        
         # Setup
+        self.setup_logging()
+        self.pixel_cache.logger = self.logger
+        self.thumbnail_cache.logger = self.logger
         self.setup_database()
         self.setup_ui()
-        self.setup_logging()
         self.load_categories()
+        self.start_watcher()
         
         # Event-Binding
         self.setup_event_bindings()
+        
+        # Periodisches Schreiben vorgemerkter Box-Änderungen
+        self.flush_job = self.root.after(self.flush_interval_ms, self.schedule_flush)
+        
+        # Periodisches Schreiben der Laufzeitmessungen
+        self.root.after(self.metrics_interval_ms, self.schedule_metrics_dump)
     
     def setup_logging(self):
         """Konfiguriert das Logging für die Anwendung."""
@@ -62,21 +154,12 @@ class BoundingBoxApp:
     def setup_database(self):
         """Initialisiert die Datenbankverbindung und Tabellen."""
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            # Eine Verbindung pro Thread; das Schema wird beim Anlegen geprüft
+            self.db = ConnectionPool(self.db_path, logger=self.logger)
+            self.conn = self.db.connection()
             self.cursor = self.conn.cursor()
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS boxes (
-                    id INTEGER PRIMARY KEY,
-                    image_id TEXT NOT NULL,
-                    category TEXT NOT NULL,
-                    x1 INTEGER NOT NULL,
-                    y1 INTEGER NOT NULL,
-                    x2 INTEGER NOT NULL,
-                    y2 INTEGER NOT NULL,
-                    UNIQUE(image_id, category)
-                )
-            ''')
-            self.conn.commit()
+            self.box_writer = BoxWriter(self.conn, flush_threshold=self.flush_threshold, logger=self.logger)
+            self.catalog = ImageCatalog(self.conn, self.img_folder, logger=self.logger)
             self.logger.info("Datenbankverbindung erfolgreich hergestellt")
         except sqlite3.Error as e:
             self.logger.error(f"Fehler beim Einrichten der Datenbank: {e}")
@@ -95,12 +178,9 @@ class BoundingBoxApp:
         left_frame = tk.LabelFrame(main_frame, text="Kategorien")
         left_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=False, padx=5, pady=5)
         
-        # Listbox für Kategorien
-        self.kategorien_listbox = Listbox(left_frame, exportselection=False, width=20)
-        scrollbar = tk.Scrollbar(left_frame, orient="vertical", command=self.kategorien_listbox.yview)
-        self.kategorien_listbox.config(yscrollcommand=scrollbar.set)
-        self.kategorien_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill="y")
+        # Durchsuchbare Kategorienliste; zeichnet nur die sichtbaren Zeilen
+        self.kategorien_list = VirtualList(left_frame, on_select=self.on_category_select, width=20)
+        self.kategorien_list.pack(fill=tk.BOTH, expand=True)
         
         # Mittlerer Bereich für Bildanzeige
         center_frame = tk.LabelFrame(main_frame, text="Bildanzeige")
@@ -110,6 +190,9 @@ class BoundingBoxApp:
         self.canvas = tk.Canvas(center_frame, bg='white')
         self.canvas.pack(fill=tk.BOTH, expand=True)
         
+        # Die Rechtecke der Boxen bleiben über Bildwechsel hinweg erhalten
+        self.overlay = BoxOverlay(self.canvas)
+        
         # Rechter Bereich für Steuerelemente
         right_frame = tk.LabelFrame(main_frame, text="Steuerung")
         right_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=False, padx=5, pady=5)
@@ -132,8 +215,27 @@ class BoundingBoxApp:
         self.erase_button = tk.Button(right_frame, text="Letzte Box löschen", command=self.delete_last_bounding_box)
         self.erase_button.pack(fill=tk.X, padx=5, pady=5)
         
-        self.export_button = tk.Button(right_frame, text="Bounding Boxes exportieren", command=self.export_bounding_boxes)
-        self.export_button.pack(fill=tk.X, padx=5, pady=5)
+        self.zoom_button = tk.Button(right_frame, text="Zoom-Modus", relief=tk.RAISED, command=self.toggle_zoom_mode)
+        self.zoom_button.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.grid_button = tk.Button(right_frame, text="Übersicht", command=self.toggle_thumbnail_grid)
+        self.grid_button.pack(fill=tk.X, padx=5, pady=5)
+        
+        export_frame = tk.Frame(right_frame)
+        export_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.export_format = tk.StringVar(value=EXPORT_FORMATS[0])
+        self.export_format_menu = tk.OptionMenu(export_frame, self.export_format, *EXPORT_FORMATS)
+        self.export_format_menu.pack(side=tk.RIGHT)
+        
+        self.export_button = tk.Button(export_frame, text="Bounding Boxes exportieren", command=self.export_bounding_boxes)
+        self.export_button.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        self.qa_button = tk.Button(right_frame, text="Qualität prüfen", command=self.run_quality_check)
+        self.qa_button.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.stats_button = tk.Button(right_frame, text="Statistik", command=self.toggle_stats_panel)
+        self.stats_button.pack(fill=tk.X, padx=5, pady=5)
         
         self.help_button = tk.Button(right_frame, text="Hilfe", command=self.show_help)
         self.help_button.pack(fill=tk.X, padx=5, pady=5)
@@ -145,12 +247,28 @@ class BoundingBoxApp:
         self.progress = ttk.Progressbar(right_frame, orient="horizontal", length=200, mode="determinate")
         self.progress.pack(fill=tk.X, padx=5, pady=(0, 10))
         
+        # Annotationsstand der Kategorie (unabhängig von der Position in der Bildliste)
+        self.category_stats_label = tk.Label(right_frame, text="", anchor=tk.W)
+        self.category_stats_label.pack(fill=tk.X, padx=5)
+        
         # Status-Bereich
         self.status_frame = tk.LabelFrame(right_frame, text="Status")
         self.status_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         self.status_text = tk.Text(self.status_frame, height=5, width=25, wrap=tk.WORD, state=tk.DISABLED)
         self.status_text.pack(fill=tk.BOTH, expand=True)
+        
+        # Trefferquote des Vorladens
+        self.prefetch_label = tk.Label(self.status_frame, text=self.prefetcher.stats_text(), anchor=tk.W)
+        self.prefetch_label.pack(fill=tk.X)
+        
+        # Belegung des Bild-Caches
+        self.cache_label = tk.Label(self.status_frame, text=self.image_cache.stats_text(), anchor=tk.W)
+        self.cache_label.pack(fill=tk.X)
+        
+        # Kosten des gebündelten Speicherns
+        self.writer_label = tk.Label(self.status_frame, text="Speichern: 0 ausstehend", anchor=tk.W)
+        self.writer_label.pack(fill=tk.X)
     
     def setup_event_bindings(self):
         """Richtet alle Event-Bindings für die Anwendung ein."""
@@ -159,13 +277,45 @@ class BoundingBoxApp:
         self.canvas.bind('<B1-Motion>', self.on_canvas_drag)
         self.canvas.bind('<ButtonRelease-1>', self.on_canvas_release)
         
-        # Listbox-Events für die Kategorieauswahl
-        self.kategorien_listbox.bind('<<ListboxSelect>>', self.on_category_select)
+        # Canvas-Events für Zoomen (Mausrad) und Verschieben (rechte Maustaste)
+        self.canvas.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.canvas.bind('<Button-4>', self.on_mouse_wheel)
+        self.canvas.bind('<Button-5>', self.on_mouse_wheel)
+        self.canvas.bind('<ButtonPress-3>', self.on_pan_start)
+        self.canvas.bind('<B3-Motion>', self.on_pan_drag)
         
         # Tastatur-Shortcuts
         self.root.bind('<Right>', lambda event: self.next_image())
         self.root.bind('<Left>', lambda event: self.previous_image())
         self.root.bind('<Delete>', lambda event: self.delete_last_bounding_box())
+        self.root.bind('<Escape>', lambda event: self.select_box(None))
+        self.root.bind('z', lambda event: self.toggle_zoom_mode())
+        self.root.bind('g', lambda event: self.toggle_thumbnail_grid())
+        self.root.bind('<F12>', lambda event: self.toggle_metrics_panel())
+        self.root.bind('<F11>', lambda event: self.toggle_stats_panel())
+        
+        # Beenden der Anwendung
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def on_close(self):
+        """Gibt Hintergrundressourcen frei und schließt das Fenster."""
+        self.prefetcher.shutdown()
+        if self.thumbnail_grid:
+            self.thumbnail_grid.shutdown()
+        self.thumbnail_cache.shutdown()
+        if self.watcher:
+            self.watcher.stop()
+        if self.export_job and self.export_job.is_alive():
+            # Der Export bleibt über seine Fortschrittsdatei fortsetzbar
+            self.export_job.cancel()
+            self.export_job.join(timeout=5)
+        if self.flush_job:
+            self.root.after_cancel(self.flush_job)
+        if self.conn:
+            self.flush_bounding_boxes()
+            self.db.close_all()
+        self.dump_metrics()
+        self.root.destroy()
     
     def update_status(self, message):
         """Aktualisiert das Status-Text-Widget mit einer neuen Nachricht."""
@@ -177,24 +327,153 @@ class BoundingBoxApp:
         self.logger.info(message)
     
     def load_categories(self):
-        """Lädt die Kategorien aus dem Bilderordner und fügt sie der Listbox hinzu."""
+        """Lädt die Kategorien aus dem Bildkatalog in die Kategorienliste."""
         try:
-            # Listet alle Einträge im Bilderordner auf, die Verzeichnisse sind
-            categories = [name for name in os.listdir(self.img_folder) 
-                         if os.path.isdir(os.path.join(self.img_folder, name))]
-            
-            # Löscht alte Einträge
-            self.kategorien_listbox.delete(0, tk.END)
+            # Gleicht nur die oberste Ebene des Bilderordners ab
+            with timer("db_query_seconds", query="load_categories"):
+                self.catalog.refresh_categories()
+                categories = self.catalog.categories()
             
-            # Fügt neue Kategorien hinzu
-            for category in categories:
-                self.kategorien_listbox.insert(tk.END, category)
+            # Die Liste übernimmt nur die Namen; Zeilen entstehen erst beim Zeichnen
+            self.kategorien_list.set_items(categories)
             
             self.update_status(f"{len(categories)} Kategorien geladen")
+            
+            # Geänderte Verzeichnisse werden im Hintergrund neu eingelesen
+            self.start_catalog_refresh()
         except Exception as e:
             self.logger.error(f"Fehler beim Laden der Kategorien: {e}")
             messagebox.showerror("Fehler", f"Fehler beim Laden der Kategorien: {e}")
     
+    def start_catalog_refresh(self):
+        """Aktualisiert den Bildkatalog in einem Hintergrund-Thread mit eigener Verbindung."""
+        self.catalog_events = queue.Queue()
+        
+        def run():
+            try:
+                try:
+                    scanned = ImageCatalog(self.db.connection(), self.img_folder, logger=self.logger).refresh()
+                finally:
+                    self.db.release()
+                self.catalog_events.put(("done", scanned))
+            except Exception as e:
+                self.catalog_events.put(("error", e))
+        
+        threading.Thread(target=run, daemon=True, name="catalog").start()
+        self.root.after(200, self.poll_catalog_refresh)
+    
+    def poll_catalog_refresh(self):
+        """Meldet das Ende der Katalogaktualisierung im Tk-Hauptthread."""
+        try:
+            kind, result = self.catalog_events.get_nowait()
+        except queue.Empty:
+            self.root.after(200, self.poll_catalog_refresh)
+            return
+        
+        if kind == "error":
+            self.logger.error(f"Fehler beim Aktualisieren des Bildkatalogs: {result}")
+        elif result:
+            self.update_status(f"Bildkatalog aktualisiert ({result} Verzeichnisse eingelesen)")
+    
+    def start_watcher(self):
+        """Startet die Überwachung des Bilderordners im Hintergrund."""
+        self.watcher = FolderWatcher(self.img_folder, self.watcher_events, logger=self.logger)
+        self.watcher.start()
+        self.root.after(500, self.poll_watcher)
+    
+    def poll_watcher(self, max_events=5000):
+        """Übernimmt gesammelte Dateisystemereignisse im Tk-Hauptthread."""
+        events = []
+        try:
+            while len(events) < max_events:
+                events.append(self.watcher_events.get_nowait())
+        except queue.Empty:
+            pass
+        
+        if events:
+            try:
+                self.apply_watch_events(events)
+            except Exception as e:
+                self.logger.error(f"Fehler beim Übernehmen von Ordneränderungen: {e}")
+        self.root.after(500, self.poll_watcher)
+    
+    def apply_watch_events(self, events):
+        """
+        Übernimmt Änderungen im Bilderordner, ohne ihn vollständig neu einzulesen.
+        
+        Args:
+            events: Liste von (Art, Kategorie, Dateiname) aus dem FolderWatcher
+        """
+        touched = set()
+        added = removed = 0
+        current_removed = current_modified = False
+        
+        for kind, category, name in events:
+            if kind == CATEGORY_ADDED:
+                self.kategorien_list.insert(category)
+                touched.add(category)
+                continue
+            if kind == CATEGORY_REMOVED:
+                self.kategorien_list.remove(category)
+                continue
+            
+            path = os.path.join(self.img_folder, category, name)
+            touched.add(category)
+            if kind != IMAGE_ADDED:
+                # Veraltete Anzeige- und Kachelversionen verwerfen
+                for cache in (self.image_cache, self.level_cache, self.tile_cache, self.tile_photo_cache):
+                    cache.invalidate(path)
+                if self.thumbnail_grid and category == self.current_category:
+                    self.thumbnail_grid.invalidate(path)
+            if category != self.current_category:
+                continue
+            if kind not in (IMAGE_ADDED, IMAGE_REMOVED):
+                current_modified = current_modified or path == self.current_image_path
+                continue
+            
+            # self.images ist sortiert; der aktuelle Index zeigt weiter auf dasselbe Bild
+            index = bisect.bisect_left(self.images, path)
+            found = index < len(self.images) and self.images[index] == path
+            if kind == IMAGE_ADDED and not found:
+                self.images.insert(index, path)
+                if self.current_image_path and index <= self.current_image_index:
+                    self.current_image_index += 1
+                added += 1
+            elif kind == IMAGE_REMOVED and found:
+                del self.images[index]
+                if path == self.current_image_path:
+                    current_removed = True
+                elif index < self.current_image_index:
+                    self.current_image_index -= 1
+                removed += 1
+        
+        # Nur die betroffenen Verzeichnisse im Katalog nachführen
+        for category in touched:
+            try:
+                self.catalog.refresh_category(category)
+            except FileNotFoundError:
+                pass
+        
+        if added or removed:
+            self.progress["maximum"] = max(len(self.images), 1)
+            if self.thumbnail_grid:
+                self.thumbnail_grid.refresh()
+            self.update_status(f"Kategorie '{self.current_category}': {added} Bilder hinzugefügt, {removed} entfernt")
+            if current_removed:
+                self.current_image_path = None
+                if self.images:
+                    self.current_image_index = min(self.current_image_index, len(self.images) - 1)
+                    self.load_and_display_image(self.images[self.current_image_index])
+                else:
+                    self.reset_canvas()
+            elif self.images and self.current_image_path is None:
+                # Erstes Bild einer bisher leeren Kategorie anzeigen
+                self.current_image_index = 0
+                self.load_and_display_image(self.images[0])
+        elif current_modified:
+            # Das angezeigte Bild wurde überschrieben
+            self.load_and_display_image(self.current_image_path)
+    
     def auto_load_image_from_category(self, category_name):
         """
         Lädt automatisch Bilder aus einer bestimmten Kategorie.
@@ -203,12 +482,8 @@ class BoundingBoxApp:
             category_name: Name der zu ladenden Kategorie
         """
         try:
-            categories = self.kategorien_listbox.get(0, tk.END)
-            if category_name in categories:
-                category_index = categories.index(category_name)
-                self.kategorien_listbox.selection_clear(0, tk.END)
-                self.kategorien_listbox.selection_set(category_index)
-                self.on_category_select(None)  # Simuliere eine Kategorieauswahl
+            if category_name in self.kategorien_list:
+                self.kategorien_list.select(category_name, notify=True)
                 self.update_status(f"Kategorie '{category_name}' automatisch geladen")
             else:
                 self.logger.warning(f"Kategorie '{category_name}' nicht gefunden")
@@ -217,11 +492,13 @@ class BoundingBoxApp:
             self.logger.error(f"Fehler beim automatischen Laden der Kategorie: {e}")
             messagebox.showerror("Fehler", f"Fehler beim automatischen Laden: {e}")
     
-    def on_category_select(self, event):
-        """Wird aufgerufen, wenn eine Kategorie in der Listbox ausgewählt wird."""
-        selection = self.kategorien_listbox.curselection()
-        if selection:
-            self.current_category = self.kategorien_listbox.get(selection[0])
+    def on_category_select(self, category):
+        """Wird aufgerufen, wenn eine Kategorie in der Kategorienliste ausgewählt wird."""
+        if category:
+            self.current_category = category
+            self.flush_bounding_boxes()
+            # Vorladeaufträge der alten Kategorie sind nicht mehr relevant
+            self.prefetcher.cancel()
             self.load_images()
             self.update_status(f"Kategorie '{self.current_category}' ausgewählt")
     
@@ -232,20 +509,19 @@ class BoundingBoxApp:
             return
         
         try:
-            # Erstellt den Pfad zum Verzeichnis der ausgewählten Kategorie
-            category_path = os.path.join(self.img_folder, self.current_category)
-            
-            # Sammelt alle Bildpfade in diesem Verzeichnis
-            allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
-            self.images = [
-                os.path.join(category_path, img) 
-                for img in os.listdir(category_path) 
-                if os.path.isfile(os.path.join(category_path, img)) and
-                any(img.lower().endswith(ext) for ext in allowed_extensions)
-            ]
+            with timer("db_query_seconds", query="load_images"):
+                # Liest das Verzeichnis nur neu ein, wenn sich seine mtime geändert hat
+                self.catalog.ensure_category(self.current_category)
+                
+                # Holt alle Bildpfade der Kategorie mit einer Indexabfrage
+                self.images = self.catalog.image_paths(self.current_category)
             
             # Setzt den Index des aktuellen Bildes zurück
             self.current_image_index = 0
+            self.update_category_stats()
+            if self.thumbnail_grid:
+                self.thumbnail_window.title(f"Übersicht: {self.current_category} ({len(self.images)} Bilder)")
+                self.thumbnail_grid.set_images(self.images)
             
             if self.images:
                 # Aktualisiert den Fortschrittsbalken
@@ -257,11 +533,16 @@ class BoundingBoxApp:
                 self.update_status(f"{len(self.images)} Bilder in Kategorie '{self.current_category}' gefunden")
             else:
                 self.reset_canvas()
+                self.current_image_path = None
                 self.update_status(f"Keine Bilder in Kategorie '{self.current_category}' gefunden")
         except Exception as e:
             self.logger.error(f"Fehler beim Laden der Bilder: {e}")
             messagebox.showerror("Fehler", f"Fehler beim Laden der Bilder: {e}")
     
+    def get_canvas_size(self):
+        """Gibt die aktuelle Canvasgröße zurück, mit Standardwerten vor dem ersten Zeichnen."""
+        return (self.canvas.winfo_width() or 800, self.canvas.winfo_height() or 600)
+    
     def load_image(self, image_path):
         """
         Lädt ein Bild aus dem Dateisystem oder Cache.
@@ -272,27 +553,23 @@ class BoundingBoxApp:
         Returns:
             PhotoImage-Objekt oder None bei Fehler
         """
-        # Prüft, ob das Bild bereits im Cache ist
-        if image_path in self.image_cache:
-            return self.image_cache[image_path]
+        # Prüft, ob das Bild in dieser Anzeigegröße bereits im Cache ist
+        canvas_size = self.get_canvas_size()
+        photo_img = self.image_cache.get(image_path, canvas_size)
+        if photo_img is not None:
+            return photo_img
         
         try:
-            img = Image.open(image_path)
-            # Behält das Seitenverhältnis bei, wenn das Bild verkleinert wird
-            canvas_width = self.canvas.winfo_width() or 800
-            canvas_height = self.canvas.winfo_height() or 600
-            
-            # Berechnet die maximale Größe für das Bild
-            img_width, img_height = img.size
-            ratio = min(canvas_width / img_width, canvas_height / img_height)
-            new_width = int(img_width * ratio * 0.9)  # 90% der verfügbaren Breite
-            new_height = int(img_height * ratio * 0.9)  # 90% der verfügbaren Höhe
-            
-            if ratio < 1:  # Nur verkleinern, nicht vergrößern
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-            
-            photo_img = ImageTk.PhotoImage(img)
-            self.image_cache[image_path] = photo_img
+            # Bevorzugt das im Hintergrund vorgeladene Bild
+            img = self.prefetcher.take(image_path, canvas_size)
+            if img is None:
+                img = self.pixel_cache.decode(image_path, canvas_size)
+            self.pixel_cache.remember_canvas_size(canvas_size)
+            
+            with timer("photoimage_seconds"):
+                photo_img = ImageTk.PhotoImage(img)
+            photo_img.original_size = img.info.get("original_size", img.size)
+            self.image_cache.put(image_path, canvas_size, photo_img)
             return photo_img
         except Exception as e:
             self.logger.error(f"Fehler beim Laden des Bildes '{image_path}': {e}")
@@ -307,25 +584,40 @@ class BoundingBoxApp:
         """
         self.reset_canvas()
         
+        # Schreibt die Boxen des vorherigen Bildes, bevor neue gelesen werden
+        self.flush_bounding_boxes()
+        if self.box_writer:
+            self.box_writer.clear_resolved()
+        
         try:
-            self.photo_img = self.load_image(image_path)
-            if not self.photo_img:
-                self.update_status(f"Fehler beim Laden des Bildes: {image_path}")
-                return
-            
-            # Berechnet die Position, um das Bild zentriert anzuzeigen
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
-            img_width = self.photo_img.width()
-            img_height = self.photo_img.height()
-            x_position = max(0, (canvas_width - img_width) // 2)
-            y_position = max(0, (canvas_height - img_height) // 2)
-            
-            # Zeigt das Bild an
-            image_item = self.canvas.create_image(x_position, y_position, anchor=tk.NW, image=self.photo_img)
+            if self.zoom_mode:
+                # Zeigt das Bild über die Kachelpyramide an
+                if not self.show_zoomable_image(image_path):
+                    return
+            else:
+                self.photo_img = self.load_image(image_path)
+                if not self.photo_img:
+                    self.update_status(f"Fehler beim Laden des Bildes: {image_path}")
+                    return
+                
+                # Berechnet die Position, um das Bild zentriert anzuzeigen
+                canvas_width = self.canvas.winfo_width()
+                canvas_height = self.canvas.winfo_height()
+                img_width = self.photo_img.width()
+                img_height = self.photo_img.height()
+                x_position = max(0, (canvas_width - img_width) // 2)
+                y_position = max(0, (canvas_height - img_height) // 2)
+                
+                # Zeigt das Bild an; update_idletasks() erfasst das eigentliche Zeichnen
+                with timer("canvas_draw_seconds", kind="image"):
+                    self.canvas.create_image(x_position, y_position, anchor=tk.NW, image=self.photo_img, tags="image")
+                    self.canvas.update_idletasks()
+                
+                # Speichert die aktuelle Bildposition und den Anzeigemaßstab
+                self.current_image_position = (x_position, y_position, img_width, img_height)
+                original_width = self.photo_img.original_size[0]
+                self.view = ViewTransform(img_width / original_width, x_position, y_position)
             
-            # Speichert die aktuelle Bildposition und Pfad
-            self.current_image_position = (x_position, y_position, img_width, img_height)
             self.current_image_path = image_path
             
             # Lädt vorhandene Bounding Boxes, falls vorhanden
@@ -340,14 +632,146 @@ class BoundingBoxApp:
             
             # Zeichnet die Bildgrenzen für visuelle Orientierung
             self.draw_image_boundaries()
+            
+            if self.thumbnail_grid:
+                self.thumbnail_grid.set_current(self.current_image_index)
+            
+            # Lädt die Nachbarbilder im Hintergrund vor
+            if not self.zoom_mode:
+                self.prefetcher.schedule(
+                    self.images, self.current_image_index, self.get_canvas_size(),
+                    is_cached=lambda path: self.image_cache.contains(path, self.get_canvas_size())
+                )
+            self.prefetch_label.config(text=self.prefetcher.stats_text())
+            self.cache_label.config(text=f"{self.image_cache.stats_text()}  |  {self.pixel_cache.stats_text()}")
         except Exception as e:
             self.logger.error(f"Fehler beim Anzeigen des Bildes: {e}")
             messagebox.showerror("Fehler", f"Fehler beim Anzeigen des Bildes: {e}")
     
     def reset_canvas(self):
-        """Setzt den Canvas zurück und löscht alle Zeichnungen."""
-        self.canvas.delete("all")
+        """Setzt den Canvas zurück; die Rechtecke der Boxen werden nur versteckt."""
+        self.canvas.delete("!" + BoxOverlay.TAG)
+        self.overlay.clear()
         self.rect_id = None
+        self.edit = None
+        self.tile_photos = []
+    
+    def toggle_zoom_mode(self):
+        """Schaltet zwischen der angepassten Ansicht und dem Zoom-Modus um."""
+        self.zoom_mode = not self.zoom_mode
+        self.zoom_button.config(relief=tk.SUNKEN if self.zoom_mode else tk.RAISED)
+        if not self.zoom_mode:
+            self.pyramid = None
+        
+        if self.current_image_path:
+            self.load_and_display_image(self.current_image_path)
+        self.update_status("Zoom-Modus aktiviert" if self.zoom_mode else "Zoom-Modus deaktiviert")
+    
+    def show_zoomable_image(self, image_path):
+        """
+        Öffnet die Kachelpyramide eines Bildes und zeigt es eingepasst an.
+        
+        Args:
+            image_path: Pfad zum Bild
+            
+        Returns:
+            True bei Erfolg, sonst False
+        """
+        try:
+            self.pyramid = TilePyramid(image_path, self.tile_cache, self.level_cache)
+        except Exception as e:
+            self.logger.error(f"Fehler beim Öffnen des Bildes '{image_path}': {e}")
+            self.update_status(f"Fehler beim Laden des Bildes: {image_path}")
+            return False
+        
+        # Startansicht wie im normalen Modus: eingepasst und zentriert
+        canvas_width, canvas_height = self.get_canvas_size()
+        img_width, img_height = self.pyramid.size
+        scale = min(canvas_width / img_width, canvas_height / img_height, 1) * 0.9
+        self.view = ViewTransform(
+            scale,
+            (canvas_width - img_width * scale) / 2,
+            (canvas_height - img_height * scale) / 2
+        )
+        self.render_tiles()
+        return True
+    
+    def render_tiles(self):
+        """Zeichnet die im Sichtbereich liegenden Kacheln der passenden Pyramidenstufe."""
+        if not self.pyramid or not self.view:
+            return
+        
+        canvas_width, canvas_height = self.get_canvas_size()
+        level = self.pyramid.level_for_scale(self.view.scale)
+        x1, y1 = self.view.to_image(0, 0)
+        x2, y2 = self.view.to_image(canvas_width, canvas_height)
+        
+        with timer("canvas_draw_seconds", kind="tiles"):
+            self.canvas.delete("tile")
+            self.tile_photos = []
+            for tx, ty, box in self.pyramid.visible_tiles(level, (x1, y1, x2, y2)):
+                cx1, cy1, cx2, cy2 = (round(value) for value in self.view.box_to_canvas(box))
+                size = (max(1, cx2 - cx1), max(1, cy2 - cy1))
+            
+                # Bereits skalierte Kacheln werden beim Verschieben wiederverwendet
+                key = (level, tx, ty, size)
+                photo = self.tile_photo_cache.get(self.pyramid.image_path, key)
+                if photo is None:
+                    tile = self.pyramid.tile(level, tx, ty)
+                    if tile.size != size:
+                        tile = tile.resize(size, Image.BILINEAR)
+                    photo = ImageTk.PhotoImage(tile)
+                    self.tile_photo_cache.put(self.pyramid.image_path, key, photo, mtime=self.pyramid.mtime)
+            
+                self.canvas.create_image(cx1, cy1, anchor=tk.NW, image=photo, tags="tile")
+                # Tk hält selbst keine Referenz auf das PhotoImage
+                self.tile_photos.append(photo)
+        self.canvas.tag_lower("tile")
+        
+        # Bildgrenzen in Canvas-Koordinaten für das Zeichnen von Boxen
+        ix1, iy1, ix2, iy2 = self.view.box_to_canvas((0, 0, *self.pyramid.size))
+        self.current_image_position = (ix1, iy1, ix2 - ix1, iy2 - iy1)
+        self.canvas.delete("boundary")
+        self.draw_image_boundaries()
+        self.render_overlay()
+    
+    def render_overlay(self):
+        """Zeichnet die im Sichtbereich liegenden Boxen des aktuellen Bildes."""
+        if self.view:
+            self.overlay.render(self.view, self.get_canvas_size())
+    
+    def on_mouse_wheel(self, event):
+        """Handler für das Mausrad: zoomt im Zoom-Modus um den Mauszeiger."""
+        if not self.zoom_mode or not self.pyramid or not self.view:
+            return
+        
+        factor = 1 / 1.25 if event.num == 5 or event.delta < 0 else 1.25
+        
+        # Begrenzt den Zoom zwischen Übersicht und achtfacher Vergrößerung
+        canvas_width, canvas_height = self.get_canvas_size()
+        min_scale = min(canvas_width / self.pyramid.width, canvas_height / self.pyramid.height, 1) * 0.5
+        new_scale = self.view.scale * factor
+        if not min_scale <= new_scale <= 8:
+            return
+        
+        self.view.zoom_at(factor, event.x, event.y)
+        self.render_tiles()
+    
+    def on_pan_start(self, event):
+        """Handler für das Drücken der rechten Maustaste: beginnt das Verschieben."""
+        self.pan_last = (event.x, event.y)
+    
+    def on_pan_drag(self, event):
+        """Handler für Mausbewegung mit gedrückter rechter Taste: verschiebt die Ansicht."""
+        if not self.zoom_mode or not self.view or not self.pan_last:
+            return
+        
+        dx = event.x - self.pan_last[0]
+        dy = event.y - self.pan_last[1]
+        self.pan_last = (event.x, event.y)
+        
+        self.view.pan(dx, dy)
+        self.render_tiles()
     
     def draw_image_boundaries(self):
         """Zeichnet Linien um die Grenzen des Bildes auf dem Canvas."""
@@ -368,6 +792,15 @@ class BoundingBoxApp:
         if not self.current_image_position:
             return
         
+        # Kante oder Ecke einer Box bzw. Inneres der ausgewählten Box: bearbeiten
+        hit = self.overlay.hit_test(self.view, event.x, event.y)
+        if hit:
+            box_id, handle = hit
+            self.select_box(box_id)
+            self.edit = (box_id, handle, event.x, event.y, self.overlay.bbox(box_id))
+            return
+        self.select_box(None)
+        
         x_position, y_position, img_width, img_height = self.current_image_position
         
         # Prüft, ob der Klick innerhalb des Bildbereichs liegt
@@ -385,6 +818,10 @@ class BoundingBoxApp:
     
     def on_canvas_drag(self, event):
         """Handler für Mausbewegung mit gedrückter Taste auf dem Canvas."""
+        if self.edit:
+            box_id = self.edit[0]
+            self.overlay.preview(box_id, self.view.box_to_canvas(self.edited_bbox(event)))
+            return
         if not self.rect_id or not self.current_image_position:
             return
         
@@ -399,6 +836,9 @@ class BoundingBoxApp:
     
     def on_canvas_release(self, event):
         """Handler für Loslassen der Maustaste auf dem Canvas."""
+        if self.edit:
+            self.finish_edit(event)
+            return
         if not self.rect_id or not self.current_image_position or not self.current_image_path:
             return
         
@@ -408,25 +848,19 @@ class BoundingBoxApp:
         self.end_x = max(x_position, min(event.x, x_position + img_width))
         self.end_y = max(y_position, min(event.y, y_position + img_height))
         
-        # Berechnet die Koordinaten relativ zum Bild
-        box_x1 = self.start_x - x_position
-        box_y1 = self.start_y - y_position
-        box_x2 = self.end_x - x_position
-        box_y2 = self.end_y - y_position
-        
         # Stellt sicher, dass x1 < x2 und y1 < y2
-        if box_x1 > box_x2:
-            box_x1, box_x2 = box_x2, box_x1
-        if box_y1 > box_y2:
-            box_y1, box_y2 = box_y2, box_y1
+        canvas_x1, canvas_x2 = sorted((self.start_x, self.end_x))
+        canvas_y1, canvas_y2 = sorted((self.start_y, self.end_y))
         
-        # Prüft, ob die Box eine Mindestgröße hat
+        # Prüft, ob die Box auf dem Bildschirm eine Mindestgröße hat
         min_size = 5
-        if (box_x2 - box_x1 > min_size and box_y2 - box_y1 > min_size):
-            # Speichert die Bounding Box
+        if (canvas_x2 - canvas_x1 > min_size and canvas_y2 - canvas_y1 > min_size):
+            # Speichert die Bounding Box in Originalbild-Koordinaten
             image_id = self.get_image_id_from_path(self.current_image_path)
             category = self.get_category_from_path(self.current_image_path)
-            self.save_bounding_box(image_id, category, (box_x1, box_y1, box_x2, box_y2))
+            bbox = self.view.box_to_image((canvas_x1, canvas_y1, canvas_x2, canvas_y2))
+            self.canvas.delete(self.rect_id)
+            self.save_bounding_box(image_id, category, bbox)
         else:
             # Löscht das zu kleine Rechteck
             self.canvas.delete(self.rect_id)
@@ -435,8 +869,80 @@ class BoundingBoxApp:
         # Setzt das Rechteck-ID zurück
         self.rect_id = None
     
+    def edited_bbox(self, event):
+        """
+        Berechnet die Box, die beim Verschieben oder Größenändern entsteht.
+        
+        Returns:
+            Tuple (x1, y1, x2, y2) in Originalbild-Koordinaten, auf das Bild begrenzt
+        """
+        box_id, handle, start_x, start_y, (x1, y1, x2, y2) = self.edit
+        dx = (event.x - start_x) / self.view.scale
+        dy = (event.y - start_y) / self.view.scale
+        img_width, img_height = self.get_image_size()
+        
+        if handle == "move":
+            # Verschiebt die Box, ohne sie über den Bildrand hinauszuschieben
+            dx = max(-x1, min(dx, img_width - x2))
+            dy = max(-y1, min(dy, img_height - y2))
+            return x1 + dx, y1 + dy, x2 + dx, y2 + dy
+        
+        if "w" in handle:
+            x1 += dx
+        if "e" in handle:
+            x2 += dx
+        if "n" in handle:
+            y1 += dy
+        if "s" in handle:
+            y2 += dy
+        x1, x2 = sorted((max(0, min(x1, img_width)), max(0, min(x2, img_width))))
+        y1, y2 = sorted((max(0, min(y1, img_height)), max(0, min(y2, img_height))))
+        return x1, y1, x2, y2
+    
+    def finish_edit(self, event):
+        """Übernimmt die verschobene bzw. in der Größe geänderte Box."""
+        box_id, handle, start_x, start_y, original = self.edit
+        self.edit = None
+        if (event.x, event.y) == (start_x, start_y):
+            # Nur ausgewählt
+            self.render_overlay()
+            return
+        
+        x1, y1, x2, y2 = self.edited_bbox(event)
+        bbox = round(x1), round(y1), round(x2), round(y2)
+        canvas_x1, canvas_y1, canvas_x2, canvas_y2 = self.view.box_to_canvas(bbox)
+        if canvas_x2 - canvas_x1 <= 5 or canvas_y2 - canvas_y1 <= 5:
+            self.update_status("Bounding Box zu klein - Änderung verworfen")
+            self.render_overlay()
+            return
+        
+        try:
+            self.box_writer.update(box_id, bbox)
+            self.overlay.update(box_id, bbox)
+            self.update_status("Bounding Box verschoben" if handle == "move" else "Bounding Box geändert")
+            self.writer_label.config(text=self.box_writer.stats_text())
+        except sqlite3.Error as e:
+            self.logger.error(f"Fehler beim Ändern der Bounding Box: {e}")
+            messagebox.showerror("Datenbankfehler", f"Fehler beim Speichern: {e}")
+        self.render_overlay()
+    
+    def select_box(self, box_id):
+        """Wählt eine Box zum Bearbeiten aus (None hebt die Auswahl auf)."""
+        if self.overlay.selected == box_id:
+            return
+        self.overlay.select(box_id)
+        self.render_overlay()
+    
+    def get_image_size(self):
+        """Gibt die Größe des aktuellen Bildes in Originalpixeln zurück."""
+        if self.zoom_mode and self.pyramid:
+            return self.pyramid.size
+        return self.photo_img.original_size
+    
     def load_existing_bounding_boxes(self):
         """Lädt vorhandene Bounding Boxes für das aktuelle Bild aus der Datenbank."""
+        self.last_box_id = None
+        self.image_box_ids = []
         if not self.current_image_path or not self.current_image_position:
             return
         
@@ -444,118 +950,195 @@ class BoundingBoxApp:
         category = self.get_category_from_path(self.current_image_path)
         
         try:
-            self.cursor.execute(
-                "SELECT id, x1, y1, x2, y2 FROM boxes WHERE image_id = ? AND category = ?", 
-                (image_id, category)
-            )
-            boxes = self.cursor.fetchall()
+            with timer("db_query_seconds", query="load_boxes"):
+                self.cursor.execute(
+                    """SELECT b.id, b.x1, b.y1, b.x2, b.y2
+                       FROM categories c
+                       JOIN images i ON i.category_id = c.id
+                       JOIN boxes b ON b.image_id = i.id
+                       WHERE c.name = ? AND i.name = ?
+                       ORDER BY b.id""",
+                    (category, image_id)
+                )
+                boxes = self.cursor.fetchall()
             
-            x_position, y_position, _, _ = self.current_image_position
+            # Zeichnet nur die Boxen im Sichtbereich
+            self.overlay.set_boxes(boxes)
+            self.image_box_ids = [box[0] for box in boxes]
+            self.render_overlay()
             
-            for box_id, x1, y1, x2, y2 in boxes:
-                # Zeichnet die Bounding Box auf dem Canvas
-                display_x1 = x1 + x_position
-                display_y1 = y1 + y_position
-                display_x2 = x2 + x_position
-                display_y2 = y2 + y_position
-                
-                self.canvas.create_rectangle(
-                    display_x1, display_y1, display_x2, display_y2,
-                    outline="green", width=2, tags=f"box_{box_id}"
-                )
-                
-                # Speichert die ID der letzten Box
-                self.last_box_id = box_id
+            # Speichert die ID der letzten Box
+            if self.image_box_ids:
+                self.last_box_id = self.image_box_ids[-1]
         except sqlite3.Error as e:
             self.logger.error(f"Fehler beim Laden vorhandener Bounding Boxes: {e}")
     
     def save_bounding_box(self, image_id, category, bbox):
         """
-        Speichert eine Bounding Box in der Datenbank.
+        Merkt eine Bounding Box zum gebündelten Speichern in der Datenbank vor.
         
         Args:
             image_id: ID des Bildes
             category: Kategorie des Bildes
-            bbox: Tuple mit (x1, y1, x2, y2) Koordinaten
+            bbox: Tuple mit (x1, y1, x2, y2) Koordinaten im Originalbild
+            
+        Returns:
+            Vorläufige ID der Box oder None bei Fehler
         """
         try:
-            # Prüft, ob bereits ein Eintrag existiert
-            self.cursor.execute(
-                "SELECT id FROM boxes WHERE image_id = ? AND category = ?", 
-                (image_id, category)
-            )
-            existing = self.cursor.fetchone()
-            
-            if existing:
-                # Aktualisiert den vorhandenen Eintrag
-                box_id = existing[0]
-                self.cursor.execute(
-                    "UPDATE boxes SET x1 = ?, y1 = ?, x2 = ?, y2 = ? WHERE id = ?",
-                    (*bbox, box_id)
-                )
-                message = "Bounding Box aktualisiert"
-            else:
-                # Fügt einen neuen Eintrag hinzu
-                self.cursor.execute(
-                    "INSERT INTO boxes (image_id, category, x1, y1, x2, y2) VALUES (?, ?, ?, ?, ?, ?)",
-                    (image_id, category, *bbox)
-                )
-                box_id = self.cursor.lastrowid
-                message = "Neue Bounding Box gespeichert"
-            
-            self.conn.commit()
+            box_id = self.box_writer.add(category, image_id, bbox)
             self.last_box_id = box_id
-            self.update_status(message)
-            
-            # Zeigt die gespeicherte Box visuell an
-            x_position, y_position, _, _ = self.current_image_position
-            x1, y1, x2, y2 = bbox
+            self.image_box_ids.append(box_id)
+            self.update_status("Neue Bounding Box gespeichert")
             
             # Zeichnet die gespeicherte Box in einer anderen Farbe
-            self.canvas.create_rectangle(
-                x1 + x_position, y1 + y_position, 
-                x2 + x_position, y2 + y_position,
-                outline="green", width=2, tags=f"box_{box_id}"
-            )
-            
+            self.overlay.add(box_id, bbox)
+            self.render_overlay()
+            self.writer_label.config(text=self.box_writer.stats_text())
             return box_id
         except sqlite3.Error as e:
             self.logger.error(f"Fehler beim Speichern der Bounding Box: {e}")
             messagebox.showerror("Datenbankfehler", f"Fehler beim Speichern: {e}")
             return None
     
+    def flush_bounding_boxes(self):
+        """Schreibt alle vorgemerkten Box-Änderungen in die Datenbank."""
+        if not self.box_writer:
+            return
+        if not len(self.box_writer):
+            return
+        try:
+            with timer("db_query_seconds", query="flush_boxes"):
+                written = self.box_writer.flush()
+            if written:
+                self.writer_label.config(text=self.box_writer.stats_text())
+                self.update_category_stats()
+        except sqlite3.Error as e:
+            self.logger.error(f"Fehler beim Schreiben der Bounding Boxes: {e}")
+            messagebox.showerror("Datenbankfehler", f"Fehler beim Speichern: {e}")
+    
+    def dump_metrics(self):
+        """Schreibt die Laufzeitmessungen in die Metrikdatei."""
+        try:
+            REGISTRY.dump(self.metrics_path)
+        except OSError as e:
+            self.logger.error(f"Fehler beim Schreiben der Messungen: {e}")
+    
+    def schedule_metrics_dump(self):
+        """Schreibt die Messungen regelmäßig, damit sie auch nach einem Absturz vorliegen."""
+        self.dump_metrics()
+        self.root.after(self.metrics_interval_ms, self.schedule_metrics_dump)
+    
+    def toggle_metrics_panel(self):
+        """Öffnet oder schließt das Debug-Panel mit den Laufzeitmessungen."""
+        if self.metrics_window is not None:
+            self.root.after_cancel(self.metrics_job)
+            self.metrics_window.destroy()
+            self.metrics_window = None
+            return
+        
+        self.metrics_window = tk.Toplevel(self.root)
+        self.metrics_window.title("Laufzeitmessungen")
+        self.metrics_window.geometry("900x400")
+        self.metrics_window.protocol("WM_DELETE_WINDOW", self.toggle_metrics_panel)
+        self.metrics_text = tk.Text(self.metrics_window, wrap=tk.NONE, font=("Courier", 10))
+        self.metrics_text.pack(fill=tk.BOTH, expand=True)
+        self.refresh_metrics_panel()
+    
+    def refresh_metrics_panel(self):
+        """Aktualisiert das Debug-Panel einmal pro Sekunde, solange es geöffnet ist."""
+        if self.metrics_window is None:
+            return
+        self.metrics_text.config(state=tk.NORMAL)
+        self.metrics_text.delete("1.0", tk.END)
+        self.metrics_text.insert(tk.END, REGISTRY.summary_text())
+        self.metrics_text.config(state=tk.DISABLED)
+        self.metrics_job = self.root.after(1000, self.refresh_metrics_panel)
+    
+    def update_category_stats(self):
+        """Zeigt an, wie viele Bilder der aktuellen Kategorie bereits Boxen haben."""
+        if not self.current_category or not self.conn:
+            return
+        try:
+            images, annotated, boxes = category_progress(self.conn, self.current_category)
+            self.category_stats_label.config(
+                text=f"Annotiert: {annotated}/{images} Bilder, {boxes} Boxen"
+            )
+        except sqlite3.Error as e:
+            self.logger.error(f"Fehler beim Lesen der Statistik: {e}")
+    
+    def toggle_stats_panel(self):
+        """Öffnet oder schließt das Statistik-Panel."""
+        if self.stats_window is not None:
+            self.root.after_cancel(self.stats_job)
+            self.stats_window.destroy()
+            self.stats_window = None
+            return
+        
+        self.stats_window = tk.Toplevel(self.root)
+        self.stats_window.title("Statistik")
+        self.stats_window.geometry("700x600")
+        self.stats_window.protocol("WM_DELETE_WINDOW", self.toggle_stats_panel)
+        self.stats_scope = tk.StringVar(value="alle")
+        scope_frame = tk.Frame(self.stats_window)
+        scope_frame.pack(fill=tk.X)
+        for text, value in (("Alle Kategorien", "alle"), ("Aktuelle Kategorie", "aktuell")):
+            tk.Radiobutton(scope_frame, text=text, variable=self.stats_scope, value=value,
+                           command=self.refresh_stats_panel).pack(side=tk.LEFT)
+        self.stats_text = tk.Text(self.stats_window, wrap=tk.NONE, font=("Courier", 10))
+        self.stats_text.pack(fill=tk.BOTH, expand=True)
+        self.refresh_stats_panel()
+    
+    def refresh_stats_panel(self):
+        """
+        Aktualisiert das Statistik-Panel alle zwei Sekunden, solange es geöffnet ist.
+        
+        Die Zahlen werden von Triggern bei jedem Speichern fortgeschrieben, das
+        Lesen kostet daher nur einige kleine Abfragen.
+        """
+        if self.stats_window is None:
+            return
+        if self.stats_job:
+            self.root.after_cancel(self.stats_job)
+        category = self.current_category if self.stats_scope.get() == "aktuell" else None
+        try:
+            with timer("db_query_seconds", query="statistik"):
+                text = stats_text(dataset_stats(self.conn, category))
+        except sqlite3.Error as e:
+            self.logger.error(f"Fehler beim Lesen der Statistik: {e}")
+            text = f"Fehler beim Lesen der Statistik: {e}"
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, text)
+        self.stats_text.config(state=tk.DISABLED)
+        self.stats_job = self.root.after(2000, self.refresh_stats_panel)
+    
+    def schedule_flush(self):
+        """Schreibt vorgemerkte Änderungen periodisch, spätestens nach flush_interval_ms."""
+        self.flush_bounding_boxes()
+        self.flush_job = self.root.after(self.flush_interval_ms, self.schedule_flush)
+    
     def delete_last_bounding_box(self):
-        """Löscht die zuletzt gezeichnete Bounding Box."""
-        if not self.last_box_id:
+        """Löscht die ausgewählte bzw. zuletzt gezeichnete Bounding Box."""
+        box_id = self.overlay.selected or self.last_box_id
+        if not box_id:
             self.update_status("Keine Bounding Box zum Löschen vorhanden")
             return
         
         try:
-            # Löscht die Box aus der Datenbank
-            self.cursor.execute("DELETE FROM boxes WHERE id = ?", (self.last_box_id,))
-            self.conn.commit()
+            # Merkt das Löschen vor; eine noch nicht geschriebene Box wird verworfen
+            self.box_writer.delete(box_id)
             
             # Löscht die Box visuell vom Canvas
-            self.canvas.delete(f"box_{self.last_box_id}")
+            self.overlay.remove(box_id)
+            self.render_overlay()
             
-            self.update_status(f"Bounding Box mit ID {self.last_box_id} gelöscht")
+            self.update_status(f"Bounding Box mit ID {self.box_writer.resolve(box_id)} gelöscht")
+            self.writer_label.config(text=self.box_writer.stats_text())
             
-            # Setzt die letzte Box ID zurück
-            self.last_box_id = None
-            
-            # Lädt die vorherige Box (falls vorhanden) als neue "letzte" Box
-            if self.current_image_path:
-                image_id = self.get_image_id_from_path(self.current_image_path)
-                category = self.get_category_from_path(self.current_image_path)
-                
-                self.cursor.execute(
-                    "SELECT id FROM boxes WHERE image_id = ? AND category = ? ORDER BY id DESC LIMIT 1",
-                    (image_id, category)
-                )
-                last_box = self.cursor.fetchone()
-                
-                if last_box:
-                    self.last_box_id = last_box[0]
+            # Die vorherige Box des Bildes wird zur neuen "letzten" Box
+            self.image_box_ids.remove(box_id)
+            self.last_box_id = self.image_box_ids[-1] if self.image_box_ids else None
         except sqlite3.Error as e:
             self.logger.error(f"Fehler beim Löschen der Bounding Box: {e}")
             messagebox.showerror("Datenbankfehler", f"Fehler beim Löschen: {e}")
@@ -589,17 +1172,11 @@ class BoundingBoxApp:
             self.update_status("Erstes Bild der Kategorie erreicht")
     
     def switch_to_next_category(self):
-        """Wechselt zur nächsten Kategorie in der Listbox."""
-        current_index = self.kategorien_listbox.curselection()
+        """Wechselt zur nächsten Kategorie in der Kategorienliste."""
+        current = self.kategorien_list.selection
         
-        if current_index:
-            current_index = current_index[0]
-            next_index = (current_index + 1) % self.kategorien_listbox.size()
-            
-            self.kategorien_listbox.selection_clear(0, tk.END)
-            self.kategorien_listbox.selection_set(next_index)
-            self.kategorien_listbox.see(next_index)
-            self.on_category_select(None)
+        if current:
+            self.kategorien_list.select(self.kategorien_list.next_item(current), notify=True)
             
             self.update_status(f"Gewechselt zur Kategorie: {self.current_category}")
         else:
@@ -615,45 +1192,292 @@ class BoundingBoxApp:
     
     def is_image_processed(self, image_id, category):
         """Prüft, ob ein Bild bereits Bounding Boxes hat."""
-        self.cursor.execute(
-            "SELECT 1 FROM boxes WHERE image_id = ? AND category = ?", 
-            (image_id, category)
-        )
-        return self.cursor.fetchone() is not None
+        self.flush_bounding_boxes()
+        with timer("db_query_seconds", query="is_image_processed"):
+            self.cursor.execute(
+                """SELECT 1
+                   FROM categories c
+                   JOIN images i ON i.category_id = c.id
+                   JOIN boxes b ON b.image_id = i.id
+                   WHERE c.name = ? AND i.name = ?
+                   LIMIT 1""",
+                (category, image_id)
+            )
+            return self.cursor.fetchone() is not None
     
     def export_bounding_boxes(self):
-        """Exportiert alle Bounding Boxes der aktuellen Kategorie in eine CSV-Datei."""
+        """
+        Exportiert alle Bounding Boxes der aktuellen Kategorie im gewählten Format.
+        
+        Der Export läuft in einem Hintergrund-Thread und meldet seinen
+        Fortschritt über den Fortschrittsbalken. Ein unterbrochener Export
+        kann beim nächsten Aufruf fortgesetzt werden.
+        """
         if not self.current_category:
             self.update_status("Keine Kategorie ausgewählt")
             return
         
+        if self.export_job and self.export_job.is_alive():
+            self.update_status("Es läuft bereits ein Export")
+            return
+        
         try:
-            filename = f"{self.current_category}_bounding_boxes.csv"
-            
-            # Holt alle Boxen der Kategorie
-            self.cursor.execute(
-                "SELECT image_id, category, x1, y1, x2, y2 FROM boxes WHERE category = ?", 
-                (self.current_category,)
-            )
-            boxes = self.cursor.fetchall()
+            self.flush_bounding_boxes()
             
-            if not boxes:
-                self.update_status(f"Keine Bounding Boxes in Kategorie '{self.current_category}' zum Exportieren")
-                messagebox.showinfo("Export", "Keine Daten zum Exportieren vorhanden.")
-                return
+            fmt = self.export_format.get()
+            output = default_output(self.current_category, fmt)
+            resume = False
+            if os.path.exists(checkpoint_path(output)):
+                resume = messagebox.askyesno(
+                    "Export fortsetzen",
+                    f"Ein Export nach '{output}' wurde unterbrochen. Möchten Sie ihn fortsetzen?"
+                )
             
-            # Schreibt die Daten in die CSV-Datei
-            with open(filename, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(['Image ID', 'Kategorie', 'X1', 'Y1', 'X2', 'Y2'])
-                writer.writerows(boxes)
+            self.export_events = queue.Queue()
+            self.export_job = ExportJob(
+                self.export_events, self.db_path, self.img_folder, self.current_category, fmt,
+                output=output, resume=resume
+            )
+            self.export_job.start()
             
-            self.update_status(f"Bounding Boxes nach '{filename}' exportiert")
-            messagebox.showinfo("Export erfolgreich", f"Bounding Boxes wurden in '{filename}' exportiert.")
+            self.export_button.config(state=tk.DISABLED)
+            self.progress["value"] = 0
+            self.update_status(f"Export nach '{output}' gestartet")
+            self.root.after(100, self.poll_export)
         except Exception as e:
             self.logger.error(f"Fehler beim Exportieren: {e}")
             messagebox.showerror("Exportfehler", f"Fehler beim Exportieren: {e}")
     
+    def poll_export(self):
+        """Überträgt Fortschritt und Ergebnis des Export-Threads in die Oberfläche."""
+        try:
+            while True:
+                event = self.export_events.get_nowait()
+                if event[0] == "progress":
+                    _, done, total = event
+                    self.progress["maximum"] = max(total, 1)
+                    self.progress["value"] = done
+                else:
+                    self.finish_export(event)
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(100, self.poll_export)
+    
+    def finish_export(self, event):
+        """Meldet das Ergebnis eines Exports und stellt den Fortschrittsbalken wieder her."""
+        self.export_button.config(state=tk.NORMAL)
+        
+        # Der Fortschrittsbalken zeigt wieder die Position in der Kategorie
+        self.progress["maximum"] = max(len(self.images), 1)
+        self.progress["value"] = self.current_image_index + 1 if self.images else 0
+        
+        kind, result = event
+        if kind == "error":
+            if isinstance(result, ExportCancelled):
+                self.update_status(f"{result} - kann fortgesetzt werden")
+                return
+            self.logger.error(f"Fehler beim Exportieren: {result}")
+            messagebox.showerror("Exportfehler", f"Fehler beim Exportieren: {result}")
+            return
+        
+        if result["unconverted_boxes"]:
+            self.logger.warning(
+                f"{result['unconverted_boxes']} Boxen alter Werkzeuge nicht exportiert; "
+                f"Umrechnung mit 'python cli.py migrate'"
+            )
+        if not result["boxes"]:
+            self.update_status(f"Keine Bounding Boxes in Kategorie '{self.current_category}' zum Exportieren")
+            messagebox.showinfo("Export", "Keine Daten zum Exportieren vorhanden.")
+            return
+        
+        self.update_status(
+            f"{result['boxes']} Bounding Boxes aus {result['images']} Bildern nach '{result['output']}' "
+            f"exportiert ({result['seconds']:.1f} s, {result['boxes_per_second']:.0f} Boxen/s)"
+        )
+        if result["skipped_images"]:
+            self.logger.warning(f"{result['skipped_images']} Bilder ohne bekannte Größe übersprungen")
+        messagebox.showinfo("Export erfolgreich", f"Bounding Boxes wurden in '{result['output']}' exportiert.")
+    
+    def run_quality_check(self):
+        """
+        Prüft die Boxen der aktuellen Kategorie auf Duplikate und ungültige Boxen.
+        
+        Die Prüfung läuft in einem Hintergrund-Thread; die Befunde werden als
+        CSV-Bericht gespeichert und in einer Prüfliste angezeigt.
+        """
+        if not self.current_category:
+            self.update_status("Keine Kategorie ausgewählt")
+            return
+        
+        if self.qa_job and self.qa_job.is_alive():
+            self.update_status("Es läuft bereits eine Qualitätsprüfung")
+            return
+        
+        try:
+            from qa import QaJob
+        except ImportError as e:
+            self.logger.error(f"Qualitätsprüfung nicht verfügbar: {e}")
+            messagebox.showerror("Qualitätsprüfung", f"Die Qualitätsprüfung benötigt NumPy: {e}")
+            return
+        
+        self.flush_bounding_boxes()
+        self.qa_events = queue.Queue()
+        self.qa_job = QaJob(self.qa_events, self.db_path, category=self.current_category)
+        self.qa_job.start()
+        
+        self.qa_button.config(state=tk.DISABLED)
+        self.progress["value"] = 0
+        self.update_status(f"Qualitätsprüfung der Kategorie '{self.current_category}' gestartet")
+        self.root.after(100, self.poll_quality_check)
+    
+    def poll_quality_check(self):
+        """Überträgt Fortschritt und Ergebnis der Qualitätsprüfung in die Oberfläche."""
+        try:
+            while True:
+                event = self.qa_events.get_nowait()
+                if event[0] == "progress":
+                    _, done, total = event
+                    self.progress["maximum"] = max(total, 1)
+                    self.progress["value"] = done
+                else:
+                    self.finish_quality_check(event)
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(100, self.poll_quality_check)
+    
+    def finish_quality_check(self, event):
+        """Speichert den Bericht der Qualitätsprüfung und öffnet die Prüfliste."""
+        self.qa_button.config(state=tk.NORMAL)
+        self.progress["maximum"] = max(len(self.images), 1)
+        self.progress["value"] = self.current_image_index + 1 if self.images else 0
+        
+        kind, report = event
+        if kind == "error":
+            self.logger.error(f"Fehler bei der Qualitätsprüfung: {report}")
+            messagebox.showerror("Qualitätsprüfung", f"Fehler bei der Qualitätsprüfung: {report}")
+            return
+        
+        counts = report.counts()
+        summary = ", ".join(f"{kind}: {count}" for kind, count in counts.items())
+        self.update_status(
+            f"{report.boxes_checked} Boxen in {report.seconds:.1f} s geprüft - {summary}"
+        )
+        if not any(counts.values()):
+            messagebox.showinfo("Qualitätsprüfung", "Keine Auffälligkeiten gefunden.")
+            return
+        
+        report_path = f"{report.settings['category']}_qa.csv"
+        try:
+            report.write_csv(report_path)
+            self.logger.info(f"Qualitätsbericht nach '{report_path}' geschrieben ({summary})")
+        except OSError as e:
+            self.logger.error(f"Fehler beim Schreiben des Qualitätsberichts: {e}")
+        self.show_review_queue(report.review_queue())
+    
+    def show_review_queue(self, items):
+        """
+        Zeigt die Bilder mit Befunden; ein Klick öffnet das Bild und wählt die Box aus.
+        
+        Args:
+            items: Liste von (Kategorie, Bildname, Box-IDs, Arten) aus QaReport.review_queue()
+        """
+        if self.qa_window is not None:
+            self.qa_window.destroy()
+        self.review_items = items
+        
+        self.qa_window = tk.Toplevel(self.root)
+        self.qa_window.title(f"Prüfliste ({len(items)} Bilder)")
+        self.qa_window.geometry("500x400")
+        self.qa_window.protocol("WM_DELETE_WINDOW", self.close_review_queue)
+        
+        review_listbox = Listbox(self.qa_window, exportselection=False)
+        scrollbar = tk.Scrollbar(self.qa_window, orient="vertical", command=review_listbox.yview)
+        review_listbox.config(yscrollcommand=scrollbar.set)
+        review_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill="y")
+        for category, image_name, box_ids, kinds in items:
+            review_listbox.insert(tk.END, f"{category}/{image_name}: {', '.join(kinds)} ({len(box_ids)} Boxen)")
+        review_listbox.bind(
+            '<<ListboxSelect>>',
+            lambda event: self.open_review_item(review_listbox.curselection())
+        )
+    
+    def close_review_queue(self):
+        """Schließt die Prüfliste."""
+        self.qa_window.destroy()
+        self.qa_window = None
+        self.review_items = []
+    
+    def open_review_item(self, selection):
+        """Öffnet das Bild eines Eintrags der Prüfliste und wählt die erste betroffene Box aus."""
+        if not selection:
+            return
+        category, image_name, box_ids, kinds = self.review_items[selection[0]]
+        if category != self.current_category:
+            self.auto_load_image_from_category(category)
+        
+        for index, image_path in enumerate(self.images):
+            if self.get_image_id_from_path(image_path) == image_name:
+                self.current_image_index = index
+                self.load_and_display_image(image_path)
+                break
+        else:
+            self.update_status(f"Bild '{image_name}' nicht im Bilderordner gefunden")
+            return
+        
+        for box_id in box_ids:
+            if box_id in self.overlay:
+                self.select_box(box_id)
+                break
+        self.update_status(f"{category}/{image_name}: {', '.join(kinds)}")
+    
+    def toggle_thumbnail_grid(self):
+        """
+        Öffnet oder schließt die Übersicht der aktuellen Kategorie.
+        
+        Das Raster zeichnet nur die sichtbaren Zeilen, auch große Kategorien
+        öffnen daher sofort; ein Klick auf ein Vorschaubild öffnet das Bild.
+        """
+        if self.thumbnail_window is not None:
+            self.thumbnail_grid.shutdown()
+            self.thumbnail_window.destroy()
+            self.thumbnail_window = None
+            self.thumbnail_grid = None
+            return
+        
+        self.thumbnail_window = tk.Toplevel(self.root)
+        self.thumbnail_window.title(f"Übersicht: {self.current_category or '-'} ({len(self.images)} Bilder)")
+        self.thumbnail_window.geometry("900x650")
+        self.thumbnail_window.protocol("WM_DELETE_WINDOW", self.toggle_thumbnail_grid)
+        self.thumbnail_grid = ThumbnailGrid(
+            self.thumbnail_window, self.thumbnail_cache, self.open_thumbnail,
+            self.annotated_names, logger=self.logger
+        )
+        self.thumbnail_grid.pack(fill=tk.BOTH, expand=True)
+        self.thumbnail_grid.set_images(self.images, self.current_image_index if self.current_image_path else None)
+    
+    def annotated_names(self, image_names):
+        """Gibt die Bildnamen der aktuellen Kategorie zurück, die bereits Boxen haben."""
+        if not self.current_category:
+            return set()
+        # Wie is_image_processed, aber für alle sichtbaren Bilder mit einer Abfrage
+        self.flush_bounding_boxes()
+        try:
+            with timer("db_query_seconds", query="annotated_names"):
+                return self.catalog.annotated_names(self.current_category, image_names)
+        except sqlite3.Error as e:
+            self.logger.error(f"Fehler beim Lesen des Annotationsstands: {e}")
+            return set()
+    
+    def open_thumbnail(self, index):
+        """Öffnet das in der Übersicht angeklickte Bild."""
+        if index >= len(self.images):
+            return
+        self.current_image_index = index
+        self.load_and_display_image(self.images[index])
+    
     def show_help(self):
         """Zeigt ein Hilfefenster mit Anweisungen an."""
         help_window = tk.Toplevel(self.root)
@@ -671,7 +1495,8 @@ Bounding Box App - Benutzerhandbuch
 Diese Anwendung ermöglicht es Ihnen, Bounding Boxes um Objekte in Bildern zu zeichnen und die Daten zu exportieren.
 
 Verwendung:
-1. Wählen Sie eine Kategorie aus der Liste auf der linken Seite.
+1. Wählen Sie eine Kategorie aus der Liste auf der linken Seite. Das Suchfeld
+   darüber filtert die Liste beim Tippen; Pfeiltasten und Enter wählen aus.
 2. Das erste Bild der Kategorie wird automatisch geladen.
 3. Zeichnen Sie eine Bounding Box, indem Sie mit der Maus auf dem Bild ziehen.
 4. Navigieren Sie mit den Buttons oder Pfeiltasten zwischen den Bildern.
@@ -679,12 +1504,31 @@ Verwendung:
 Tastaturbefehle:
 - Rechte Pfeiltaste: Nächstes Bild
 - Linke Pfeiltaste: Vorheriges Bild
-- Entf-Taste: Letzte Bounding Box löschen
+- Entf-Taste: Ausgewählte bzw. letzte Bounding Box löschen
+- Esc: Auswahl aufheben
+- Z: Zoom-Modus ein-/ausschalten
+- G: Übersicht der Kategorie ein-/ausblenden (grüne Marke = annotiert)
+- F11: Statistik anzeigen (Annotationsstand, Boxgrößen, Boxen pro Tag)
+- F12: Laufzeitmessungen anzeigen (p50/p95/p99 je Arbeitsschritt)
+
+Zoom-Modus:
+- Mausrad: Vergrößern/Verkleinern um den Mauszeiger
+- Rechte Maustaste ziehen: Ansicht verschieben
+- Boxen werden immer in Koordinaten des Originalbildes gespeichert.
 
 Tipps:
 - Die Bounding Box wird automatisch gespeichert, sobald Sie die Maustaste loslassen.
 - Grün umrandete Boxen sind bereits gespeicherte Bounding Boxes.
+- Ein Klick auf Kante oder Ecke einer Box wählt sie aus (orange); Ziehen
+  an Kante oder Ecke ändert die Größe, Ziehen im Inneren der ausgewählten
+  Box verschiebt sie.
+- Pro Bild können beliebig viele Bounding Boxes gezeichnet werden.
+- "Qualität prüfen" sucht in der aktuellen Kategorie nach doppelten,
+  entarteten, über den Bildrand ragenden und extrem schmalen Boxen. Die
+  Befunde werden als <Kategorie>_qa.csv gespeichert und in einer Prüfliste
+  angezeigt; ein Klick auf einen Eintrag öffnet das Bild.
 - Exportieren Sie Ihre Arbeit regelmäßig mit dem "Exportieren"-Button.
+  Verfügbare Formate: CSV, COCO (JSON), YOLO (txt) und Pascal VOC (XML).
 
 Bei Problemen oder Fragen wenden Sie sich bitte an den Support.
 """
@@ -2,7 +2,12 @@ import tkinter as tk
 from tkinter import Listbox, messagebox, Canvas
 import os
 import sqlite3
+from PIL import Image, ImageTk
 import random
+from catalog import ImageCatalog
+from schema import ensure_schema, insert_box
+from storage import connect
+from tiles import centered_view
 
 class BoundingBoxApp:
     def __init__(self, master, img_folder):
@@ -13,24 +18,16 @@ class BoundingBoxApp:
         self.current_image_index = 0
         self.current_image_path = None
         self.images = []
+        # Abbildung zwischen Originalbild- und Canvas-Koordinaten des angezeigten Bildes
+        self.view = None
         self.init_db()
         self.setup_ui()
 
     def init_db(self):
-        self.conn = sqlite3.connect(self.database_path)
+        self.conn = connect(self.database_path)
         self.cursor = self.conn.cursor()
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS boxes (
-                id INTEGER PRIMARY KEY,
-                image_id TEXT NOT NULL,
-                category TEXT NOT NULL,
-                x1 INTEGER NOT NULL,
-                y1 INTEGER NOT NULL,
-                x2 INTEGER NOT NULL,
-                y2 INTEGER NOT NULL,
-                UNIQUE(image_id, category)
-            )
-        ''')
+        ensure_schema(self.conn)
+        self.catalog = ImageCatalog(self.conn, self.img_folder)
         self.conn.commit()
 
     def setup_ui(self):
@@ -43,7 +40,8 @@ class BoundingBoxApp:
         self.kategorien_listbox.bind('<<ListboxSelect>>', self.on_category_select)
 
     def load_categories(self):
-        categories = [name for name in os.listdir(self.img_folder) if os.path.isdir(os.path.join(self.img_folder, name))]
+        self.catalog.refresh_categories()
+        categories = self.catalog.categories()
         for category in categories:
             self.kategorien_listbox.insert(tk.END, category)
 
@@ -54,8 +52,8 @@ class BoundingBoxApp:
             self.load_images()
 
     def load_images(self):
-        category_path = os.path.join(self.img_folder, self.current_category)
-        self.images = [os.path.join(category_path, img) for img in os.listdir(category_path) if os.path.isfile(os.path.join(category_path, img))]
+        self.catalog.ensure_category(self.current_category)
+        self.images = self.catalog.image_paths(self.current_category)
         self.display_next_image()
 
     def display_next_image(self):
@@ -63,7 +61,9 @@ class BoundingBoxApp:
             self.current_image_path = self.images[self.current_image_index]
             # Bild laden und anzeigen
             img = Image.open(self.current_image_path)
+            original_size = img.size
             img.thumbnail((800, 600), Image.ANTIALIAS)  # Bildgröße anpassen
+            self.view = centered_view(original_size, img.size)
             self.photo_img = ImageTk.PhotoImage(img)
             self.canvas.create_image(400, 300, image=self.photo_img, anchor=tk.CENTER)  # Bild zentrieren
             self.current_image_index += 1
@@ -71,12 +71,12 @@ class BoundingBoxApp:
             messagebox.showinfo("Fertig", "Alle Bilder in dieser Kategorie wurden bearbeitet.")
 
     def save_bounding_box(self, bbox):
-        image_id = os.path.basename(self.current_image_path)
+        if self.view is None:
+            return
+        image_id = os.path.splitext(os.path.basename(self.current_image_path))[0]
         try:
-            self.cursor.execute('''
-                INSERT INTO boxes (image_id, category, x1, y1, x2, y2)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (image_id, self.current_category, *bbox))
+            # Gespeichert wird in Koordinaten des Originalbildes, wie in gui4.py
+            insert_box(self.conn, self.current_category, image_id, self.view.box_to_image(bbox))
             self.conn.commit()
         except sqlite3.IntegrityError:
             messagebox.showerror("Fehler", "Bounding Box bereits vorhanden.")
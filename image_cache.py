@@ -0,0 +1,162 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def photo_image_nbytes(photo_img):
+    """Schätzt den Speicherbedarf eines PhotoImage (Tk hält 4 Byte pro Pixel)."""
+    return photo_img.width() * photo_img.height() * 4
+
+
+class ImageCache:
+    """
+    Speicherbegrenzter LRU-Cache für Anzeigebilder.
+
+    Einträge werden über (Pfad, Anzeigegröße) adressiert, sodass eine
+    geänderte Canvasgröße nicht das alte, falsch skalierte Bild liefert.
+    Beim Zugriff wird die mtime der Datei geprüft; geänderte Dateien werden
+    verworfen.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, sizeof=photo_image_nbytes):
+        """
+        Args:
+            max_bytes: Speicherbudget in Byte
+            sizeof: Funktion (Wert) -> Größe in Byte
+        """
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._keys_by_path = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+
+        # Zähler
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, path, size):
+        """
+        Liefert den Eintrag für (Pfad, Größe) oder None.
+
+        Args:
+            path: Pfad zum Bild
+            size: Tuple (Breite, Höhe) der Anzeigefläche
+        """
+        key = (path, size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+        mtime = self._mtime(path)
+        with self._lock:
+            if mtime != entry[0]:
+                # Datei wurde geändert oder gelöscht
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                    self.invalidations += 1
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def contains(self, path, size):
+        """Prüft ohne Zählerwirkung, ob ein Eintrag vorhanden ist."""
+        with self._lock:
+            return (path, size) in self._entries
+
+    def put(self, path, size, value, mtime=None):
+        """
+        Legt einen Eintrag ab und verdrängt bei Bedarf die ältesten Einträge.
+
+        Args:
+            path: Pfad zum Bild
+            size: Tuple (Breite, Höhe) der Anzeigefläche
+            value: Zu speicherndes Objekt
+            mtime: mtime der Quelldatei in ns (wird sonst ermittelt)
+        """
+        if mtime is None:
+            mtime = self._mtime(path)
+        nbytes = self.sizeof(value)
+        key = (path, size)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if nbytes > self.max_bytes:
+                # Zu groß für das Budget, wird nicht zwischengespeichert
+                return
+            self._entries[key] = (mtime, nbytes, value)
+            self._keys_by_path.setdefault(path, set()).add(key)
+            self.current_bytes += nbytes
+            self._evict()
+
+    def _remove(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self.current_bytes -= nbytes
+        keys = self._keys_by_path.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_path[key[0]]
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, path):
+        """Entfernt alle Einträge eines Bildpfads, unabhängig von der Größe."""
+        with self._lock:
+            for key in list(self._keys_by_path.get(path, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def set_max_bytes(self, max_bytes):
+        """Ändert das Speicherbudget und verdrängt sofort überzählige Einträge."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """Leert den Cache, die Zähler bleiben erhalten."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_path.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Gibt die Zähler und die Belegung als Dictionary zurück."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def stats_text(self):
+        """Formatiert die Statistik für das Status-Panel."""
+        stats = self.stats()
+        return (f"Cache: {stats['entries']} Bilder, "
+                f"{stats['bytes'] / 2**20:.0f}/{stats['max_bytes'] / 2**20:.0f} MB, "
+                f"{stats['hit_rate']:.0%} Treffer, {stats['evictions']} verdrängt")
@@ -0,0 +1,576 @@
+"""
+Massenimport vorhandener Annotationen (CSV, COCO, YOLO, Pascal VOC).
+
+Der Import läuft in zwei Phasen. Zuerst schreiben die Leser ihre Zeilen
+gebündelt per executemany() in temporäre Tabellen; diese liegen in einer
+eigenen Datei, sperren die Datenbank nicht und halten den Speicherbedarf
+unabhängig von der Eingabegröße. Danach werden Kategorien, Labels, Bilder
+und Boxen mit wenigen INSERT ... SELECT in einer einzigen Transaktion
+übernommen. Der Boxindex und die Statistik-Trigger werden dafür entfernt
+und erst am Ende neu angelegt bzw. durch eine einmalige Fortschreibung
+ersetzt (schema.STATS_APPEND). Ein abgebrochener Import hinterlässt keine
+halben Daten, und Boxen, die mit Bild, Label und Koordinaten bereits
+vorhanden sind, werden übersprungen; ein wiederholter Import ist daher
+unschädlich.
+"""
+import csv
+import json
+import os
+import re
+import time
+import xml.etree.ElementTree as ElementTree
+
+from schema import BOX_INDEX, STATS_APPEND, STATS_TRIGGER_NAMES, STATS_TRIGGERS, ensure_schema, execute_script
+from storage import connect
+
+IMPORT_FORMATS = ("csv", "coco", "yolo", "voc")
+
+# Anzahl der Zeilen pro executemany() in die Zwischentabellen
+BATCH_SIZE = 20000
+
+# Größe der Blöcke, in denen COCO-Dateien gelesen werden
+JSON_CHUNK_SIZE = 1024 * 1024
+
+# Ab diesem Anteil neuer Boxen an den vorhandenen wird der Boxindex nach dem
+# Einfügen neu aufgebaut, statt ihn Zeile für Zeile nachzuführen
+DEFER_INDEX_RATIO = 0.25
+
+# Die Leser liefern (Zeilenart, Liste von Zeilen) in Blöcken bis BATCH_SIZE:
+#   BOX     (Kategorie, Bildname, Label, x1, y1, x2, y2)
+#   BOX_REF (Bildverweis, Labelverweis, x1, y1, x2, y2), aufgelöst über IMAGE und LABEL
+#   IMAGE   (Verweis, Kategorie, Bildname)
+#   LABEL   (Verweis, Name)
+#   SKIP    Beschreibung eines übersprungenen Eintrags
+BOX, BOX_REF, IMAGE, LABEL, SKIP = "box", "box_ref", "image", "label", "skip"
+
+STAGING_TABLES = '''
+    CREATE TEMP TABLE IF NOT EXISTS import_boxes (
+        category TEXT, image TEXT, label TEXT, x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER
+    );
+    CREATE TEMP TABLE IF NOT EXISTS import_box_refs (
+        image_ref INTEGER, label_ref INTEGER, x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER
+    );
+    CREATE TEMP TABLE IF NOT EXISTS import_images (ref INTEGER PRIMARY KEY, category TEXT, name TEXT);
+    CREATE TEMP TABLE IF NOT EXISTS import_labels (ref INTEGER PRIMARY KEY, name TEXT);
+'''
+
+STAGING_INSERTS = {
+    BOX: "INSERT INTO temp.import_boxes VALUES (?, ?, ?, ?, ?, ?, ?)",
+    BOX_REF: "INSERT INTO temp.import_box_refs VALUES (?, ?, ?, ?, ?, ?)",
+    IMAGE: "INSERT OR REPLACE INTO temp.import_images VALUES (?, ?, ?)",
+    LABEL: "INSERT OR REPLACE INTO temp.import_labels VALUES (?, ?)",
+}
+
+# Boxen mit Verweisen (COCO) in Boxen mit Namen überführen; ohne Kategorie
+# der Annotation gilt die Kategorie des Bildes als Label
+RESOLVE_REFS = '''
+    INSERT INTO temp.import_boxes
+        SELECT r.category, r.name, COALESCE(l.name, r.category), b.x1, b.y1, b.x2, b.y2
+        FROM temp.import_box_refs b
+        JOIN temp.import_images r ON r.ref = b.image_ref
+        LEFT JOIN temp.import_labels l ON l.ref = b.label_ref
+        ORDER BY b.rowid
+'''
+
+INSERT_CATEGORIES = '''
+    INSERT INTO categories (name)
+        SELECT DISTINCT category FROM temp.import_boxes WHERE true
+        ON CONFLICT(name) DO NOTHING
+'''
+INSERT_LABELS = '''
+    INSERT INTO labels (name)
+        SELECT DISTINCT label FROM temp.import_boxes WHERE true
+        ON CONFLICT(name) DO NOTHING
+'''
+INSERT_IMAGES = '''
+    INSERT INTO images (category_id, name)
+        SELECT DISTINCT c.id, s.image
+        FROM temp.import_boxes s JOIN categories c ON c.name = s.category
+        WHERE true
+        ON CONFLICT(category_id, name) DO NOTHING
+'''
+# Boxen, die mit Bild, Label und Koordinaten schon gespeichert sind, nicht
+# erneut übernehmen; so ändert ein wiederholter Import nichts. Läuft vor dem
+# Entfernen des Boxindex, der genau diese Spalten abdeckt.
+DELETE_EXISTING = '''
+    DELETE FROM temp.import_boxes WHERE rowid IN (
+        SELECT s.rowid
+        FROM temp.import_boxes s
+        JOIN categories c ON c.name = s.category
+        JOIN images i ON i.category_id = c.id AND i.name = s.image
+        JOIN labels l ON l.name = s.label
+        WHERE EXISTS (
+            SELECT 1 FROM boxes b
+            WHERE b.image_id = i.id AND b.x1 = s.x1 AND b.y1 = s.y1
+              AND b.x2 = s.x2 AND b.y2 = s.y2 AND b.label_id = l.id
+        )
+    )
+'''
+INSERT_BOXES = '''
+    INSERT INTO boxes (image_id, label_id, x1, y1, x2, y2)
+        SELECT i.id, l.id, s.x1, s.y1, s.x2, s.y2
+        FROM temp.import_boxes s
+        JOIN categories c ON c.name = s.category
+        JOIN images i ON i.category_id = c.id AND i.name = s.image
+        JOIN labels l ON l.name = s.label
+        ORDER BY s.rowid
+'''
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+# Zeichen, die auf einen vollständigen JSON-Wert folgen können
+_DELIMITERS = frozenset(" \t\r\n,]}:")
+
+
+def _image_name(file_name):
+    """Bildname ohne Verzeichnis und Endung, wie er in der Tabelle images steht."""
+    return os.path.splitext(os.path.basename(file_name))[0]
+
+
+def _coordinate(value):
+    """Wandelt eine Koordinate aus Text in eine ganze Zahl um."""
+    try:
+        return int(value)
+    except ValueError:
+        return round(float(value))
+
+
+def _category_from_path(path, suffix):
+    """Leitet die Kategorie aus einem Exportpfad ab (Umkehrung von exporter.default_output)."""
+    name = os.path.basename(os.path.normpath(path))
+    return name[:-len(suffix)] if name.endswith(suffix) and len(name) > len(suffix) else name
+
+
+class _JsonStream:
+    """Liest JSON-Werte nacheinander aus einer Datei, ohne sie ganz zu laden."""
+
+    def __init__(self, f):
+        self.file = f
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.file.read(JSON_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Nächstes Zeichen außer Leerraum ("" am Dateiende)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def next(self):
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Meist nur ein am Blockende abgeschnittener Wert
+                if self._fill():
+                    continue
+                raise
+            # Eine Zahl am Pufferende kann im nächsten Block weitergehen
+            if (len(self.buffer) - end < 64 and self.buffer[end:end + 1] not in _DELIMITERS
+                    and not self.eof and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Liefert die Elemente eines Arrays; die Position steht hinter '['."""
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        decode = self.decoder.raw_decode
+        skip = _WHITESPACE.match
+        while True:
+            # Schneller Weg: Element und Trennzeichen stehen vollständig im Puffer.
+            # Leerraum wird vorher übersprungen, denn raw_decode() scheitert daran,
+            # und jede JSONDecodeError zählt die Zeilen bis zur Fehlerstelle.
+            buffer = self.buffer
+            start = self.pos
+            try:
+                if buffer[start].isspace():
+                    start = skip(buffer, start).end()
+                value, end = decode(buffer, start)
+                separator = buffer[end]
+                if separator.isspace():
+                    end = skip(buffer, end).end()
+                    separator = buffer[end]
+            except (json.JSONDecodeError, IndexError):
+                separator = None
+            if separator == "," or separator == "]":
+                self.pos = end + 1
+            else:
+                # Leerraum, Blockende oder Fehler
+                value = self.value()
+                separator = self.next()
+            yield value
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"',' oder ']' erwartet, gefunden: {separator!r}")
+
+
+def iter_json_arrays(path):
+    """
+    Liest die Arrays eines JSON-Objekts Element für Element.
+
+    Andere Werte der obersten Ebene werden gelesen und verworfen. Im
+    Speicher liegt jeweils nur ein Block der Datei und ein Element.
+
+    Args:
+        path: Pfad zur JSON-Datei
+
+    Yields:
+        (Schlüssel, Iterator über die Elemente); nicht gelesene Elemente
+        werden vor dem nächsten Schlüssel übersprungen
+    """
+    with open(path, encoding="utf-8") as f:
+        stream = _JsonStream(f)
+        if stream.next() != "{":
+            raise ValueError(f"{path}: JSON-Objekt erwartet")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            if stream.next() != ":":
+                raise ValueError(f"{path}: ':' nach Schlüssel {key!r} erwartet")
+            if stream.peek() == "[":
+                stream.next()
+                items = stream.items()
+                yield key, items
+                for _ in items:
+                    pass
+            else:
+                stream.value()
+            separator = stream.next()
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"{path}: ',' oder '}}' erwartet")
+
+
+def iter_csv(path, category=None):
+    """
+    Liest Boxen aus einer CSV-Datei im Format des CSV-Exports.
+
+    Spalten: Image ID, Kategorie, X1, Y1, X2, Y2. Die Datei wird zeilenweise
+    gelesen; das Label ist die Kategorie.
+
+    Args:
+        path: Pfad zur CSV-Datei
+        category: Ersetzt die Kategorie aus der Datei
+    """
+    boxes = []
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        if next(reader, None) is None:
+            return
+        for line_number, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            try:
+                row_category = category or row[1]
+                try:
+                    x1, y1, x2, y2 = map(int, row[2:6])
+                except ValueError:
+                    x1, y1, x2, y2 = map(_coordinate, row[2:6])
+            except (IndexError, ValueError) as e:
+                raise ValueError(f"{path}, Zeile {line_number}: ungültige Zeile ({e})") from e
+            boxes.append((row_category, row[0], row_category, x1, y1, x2, y2))
+            if len(boxes) >= BATCH_SIZE:
+                yield BOX, boxes
+                boxes = []
+    yield BOX, boxes
+
+
+def iter_coco(path, category=None):
+    """
+    Liest eine COCO-JSON-Datei inkrementell.
+
+    Bilder, Kategorien und Annotationen werden als Verweise weitergegeben
+    und erst in der Datenbank verknüpft; ihre Reihenfolge in der Datei ist
+    daher beliebig (der eigene Export schreibt die Kategorien zuletzt).
+
+    Bekannte Grenze: Das Dekodieren der einzelnen Annotationen mit dem
+    json-Modul bestimmt die Dauer (rund 5 s je Million). In eine leere
+    Datenbank erreicht ein COCO-Import daher etwa 80.000 Boxen/s, ein
+    CSV-Import über 100.000.
+
+    Args:
+        path: Pfad zur JSON-Datei
+        category: Zielkategorie; sonst der Ordner im file_name der Bilder
+    """
+    for key, items in iter_json_arrays(path):
+        rows = []
+        if key == "annotations":
+            kind = BOX_REF
+            for item in items:
+                try:
+                    # Die Werte sind bereits Zahlen; round() liefert ganze Zahlen
+                    x, y, w, h = item["bbox"]
+                    rows.append((item["image_id"], item.get("category_id"),
+                                 round(x), round(y), round(x + w), round(y + h)))
+                except (KeyError, TypeError, ValueError):
+                    yield SKIP, [f"Annotation {item.get('id')} ohne gültige bbox"]
+                if len(rows) >= BATCH_SIZE:
+                    yield kind, rows
+                    rows = []
+        elif key == "images":
+            kind = IMAGE
+            for item in items:
+                file_name = item["file_name"]
+                image_category = category or os.path.basename(os.path.dirname(file_name))
+                if not image_category:
+                    raise ValueError(f"{path}: Bild {file_name} liegt in keinem Kategorieordner; "
+                                     f"bitte eine Kategorie angeben")
+                rows.append((item["id"], image_category, _image_name(file_name)))
+                if len(rows) >= BATCH_SIZE:
+                    yield kind, rows
+                    rows = []
+        elif key == "categories":
+            kind = LABEL
+            rows = [(item["id"], item["name"]) for item in items]
+        else:
+            continue
+        yield kind, rows
+
+
+def iter_yolo(path, category=None, img_folder="img"):
+    """
+    Liest ein YOLO-Verzeichnis (eine .txt-Datei pro Bild, dazu classes.txt).
+
+    YOLO speichert normierte Koordinaten; die Bildgröße stammt aus dem
+    Header der Bilddatei in img_folder/<Kategorie>. Bilder ohne lesbare
+    Datei werden übersprungen.
+
+    Args:
+        path: Verzeichnis mit den Labeldateien
+        category: Zielkategorie; sonst aus dem Verzeichnisnamen (<Kategorie>_yolo)
+        img_folder: Bilderordner
+    """
+    from exporter import ImageFileLookup
+
+    category = category or _category_from_path(path, "_yolo")
+    classes = []
+    classes_path = os.path.join(path, "classes.txt")
+    if os.path.exists(classes_path):
+        with open(classes_path) as f:
+            classes = [line.strip() for line in f if line.strip()]
+    lookup = ImageFileLookup(os.path.join(img_folder, category))
+
+    with os.scandir(path) as entries:
+        names = sorted(entry.name for entry in entries if entry.name.endswith(".txt") and entry.name != "classes.txt")
+    boxes = []
+    for name in names:
+        image_name = name[:-4]
+        with open(os.path.join(path, name)) as f:
+            lines = [line.split() for line in f if line.strip()]
+        if not lines:
+            continue
+        size = lookup.size(image_name)
+        if not size:
+            yield SKIP, [f"{image_name}: Bildgröße unbekannt"]
+            continue
+        width, height = size
+        for line_number, values in enumerate(lines, start=1):
+            try:
+                class_index = int(values[0])
+                cx, cy, w, h = (float(value) for value in values[1:5])
+            except (IndexError, ValueError) as e:
+                raise ValueError(f"{name}, Zeile {line_number}: ungültige Zeile ({e})") from e
+            label = classes[class_index] if 0 <= class_index < len(classes) else category
+            boxes.append((category, image_name, label,
+                          round((cx - w / 2) * width), round((cy - h / 2) * height),
+                          round((cx + w / 2) * width), round((cy + h / 2) * height)))
+        if len(boxes) >= BATCH_SIZE:
+            yield BOX, boxes
+            boxes = []
+    yield BOX, boxes
+
+
+def iter_voc(path, category=None):
+    """
+    Liest Pascal-VOC-XML-Dateien (eine Datei oder ein Verzeichnis).
+
+    Args:
+        path: XML-Datei oder Verzeichnis mit XML-Dateien
+        category: Zielkategorie; sonst <folder> der Datei bzw. der Verzeichnisname (<Kategorie>_voc)
+    """
+    if os.path.isdir(path):
+        with os.scandir(path) as entries:
+            files = sorted(os.path.join(path, entry.name) for entry in entries if entry.name.endswith(".xml"))
+        default_category = _category_from_path(path, "_voc")
+    else:
+        files = [path]
+        default_category = _category_from_path(os.path.dirname(path), "_voc")
+
+    boxes = []
+    for file_path in files:
+        try:
+            root = ElementTree.parse(file_path).getroot()
+        except ElementTree.ParseError as e:
+            raise ValueError(f"{file_path}: ungültiges XML ({e})") from e
+        image_category = category or (root.findtext("folder") or "").strip() or default_category
+        image_name = _image_name((root.findtext("filename") or "").strip() or file_path)
+        for obj in root.iter("object"):
+            box = obj.find("bndbox")
+            try:
+                x1, y1, x2, y2 = (_coordinate(box.findtext(tag)) for tag in ("xmin", "ymin", "xmax", "ymax"))
+            except (AttributeError, TypeError, ValueError):
+                yield SKIP, [f"{file_path}: Objekt ohne gültige bndbox"]
+                continue
+            label = (obj.findtext("name") or "").strip() or image_category
+            boxes.append((image_category, image_name, label, x1, y1, x2, y2))
+        if len(boxes) >= BATCH_SIZE:
+            yield BOX, boxes
+            boxes = []
+    yield BOX, boxes
+
+
+READERS = {
+    "csv": iter_csv,
+    "coco": iter_coco,
+    "yolo": iter_yolo,
+    "voc": iter_voc,
+}
+
+
+class BoxImporter:
+    """
+    Schreibt die Blöcke der Leser in temporäre Tabellen und übernimmt sie gesammelt.
+
+    Im Speicher liegt nie mehr als ein Block je Zeilenart.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.staged = 0
+        self.existing = 0
+        self.skipped = 0
+        self.skipped_examples = []
+        execute_script(conn, STAGING_TABLES)
+        for table in ("import_boxes", "import_box_refs", "import_images", "import_labels"):
+            conn.execute(f"DELETE FROM temp.{table}")
+        conn.commit()
+
+    def add(self, kind, rows):
+        """Schreibt einen Block von Zeilen einer Art per executemany()."""
+        if kind == SKIP:
+            self.skipped += len(rows)
+            self.skipped_examples.extend(rows[:10 - len(self.skipped_examples)])
+            return
+        if not rows:
+            return
+        self.conn.executemany(STAGING_INSERTS[kind], rows)
+        self.conn.commit()
+        if kind in (BOX, BOX_REF):
+            self.staged += len(rows)
+
+    def apply(self, defer_index=None):
+        """
+        Übernimmt alle gesammelten Boxen in einer Transaktion.
+
+        Args:
+            defer_index: Boxindex erst nach dem Einfügen neu aufbauen; lohnt,
+                sobald der Import einen merklichen Teil der Datenbank ausmacht.
+                None entscheidet danach (DEFER_INDEX_RATIO), True/False erzwingt es.
+
+        Returns:
+            (neue Bilder, neue Boxen)
+        """
+        conn = self.conn
+        conn.execute(RESOLVE_REFS)
+        conn.commit()
+        # Die Verknüpfungen entstehen hier selbst per JOIN; die Prüfung je Zeile entfällt.
+        # foreign_keys lässt sich nur außerhalb einer Transaktion umschalten.
+        conn.execute("PRAGMA foreign_keys=OFF")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                last_box_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM boxes").fetchone()[0]
+                self.existing = conn.execute(DELETE_EXISTING).rowcount
+                conn.execute(INSERT_CATEGORIES)
+                conn.execute(INSERT_LABELS)
+                images = conn.execute(INSERT_IMAGES).rowcount
+                if defer_index is None:
+                    # Boxanzahl aus der Statistik statt COUNT(*) über alle Boxen
+                    existing = conn.execute("SELECT COALESCE(SUM(boxes), 0) FROM stats_categories").fetchone()[0]
+                    defer_index = self.staged - self.existing >= DEFER_INDEX_RATIO * existing
+                for name in STATS_TRIGGER_NAMES:
+                    conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                if defer_index:
+                    conn.execute("DROP INDEX IF EXISTS idx_boxes_image")
+                boxes = conn.execute(INSERT_BOXES).rowcount
+                if defer_index:
+                    conn.execute(BOX_INDEX)
+                execute_script(conn, STATS_TRIGGERS)
+                execute_script(conn, STATS_APPEND, {"after": last_box_id})
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        finally:
+            conn.execute("PRAGMA foreign_keys=ON")
+        return images, boxes
+
+
+def import_file(db_path, path, fmt="csv", category=None, progress=None, defer_index=None, **options):
+    """
+    Importiert Boxen aus einer Datei oder einem Verzeichnis.
+
+    Args:
+        db_path: Pfad zur Datenbank
+        path: Quelle im gewählten Format
+        fmt: Eines von IMPORT_FORMATS
+        category: Zielkategorie (ersetzt bzw. ergänzt die Angabe der Quelle)
+        progress: Optionale Funktion (gelesene Boxen)
+        defer_index: Siehe BoxImporter.apply()
+        **options: Weitere Argumente für den Leser des Formats (z.B. img_folder für YOLO)
+
+    Returns:
+        Dictionary mit Anzahl neuer Bilder, Boxen, bereits vorhandener Boxen,
+        übersprungener Einträge, Dauer und Durchsatz
+    """
+    if fmt not in READERS:
+        raise ValueError(f"Unbekanntes Importformat: {fmt}")
+    conn = connect(db_path)
+    try:
+        ensure_schema(conn)
+        importer = BoxImporter(conn)
+        start = time.perf_counter()
+        for kind, rows in READERS[fmt](path, category=category, **options):
+            importer.add(kind, rows)
+            if progress and kind in (BOX, BOX_REF):
+                progress(importer.staged)
+        images, boxes = importer.apply(defer_index)
+        elapsed = time.perf_counter() - start
+    finally:
+        conn.close()
+    return {
+        "source": path,
+        "format": fmt,
+        "images": images,
+        "boxes": boxes,
+        "existing": importer.existing,
+        "unresolved": importer.staged - importer.existing - boxes,
+        "skipped": importer.skipped,
+        "skipped_examples": importer.skipped_examples,
+        "seconds": round(elapsed, 3),
+        "boxes_per_second": round(boxes / elapsed) if elapsed > 0 else 0,
+    }
@@ -0,0 +1,146 @@
+"""
+Lasttest für POST /api/objekt_daten.
+
+Startet mehrere Serverprozesse, die sich eine Datenbank teilen (wie
+mehrere Worker hinter einem Load Balancer), und schickt aus vielen
+gleichzeitigen Clients Datensätze an alle Worker. Ein Teil der bild_ids wird
+absichtlich von mehreren Clients gleichzeitig gesendet. Anschließend wird
+geprüft, dass jede bild_id genau einmal angenommen wurde und die Datenbank
+jeden angenommenen Datensatz genau einmal enthält.
+
+Aufruf:
+    python loadtest.py --workers 4 --clients 32 --requests 200
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+
+def run_server(work_dir, port, ready):
+    """Startet main.app in einem eigenen Prozess mit work_dir als Arbeitsverzeichnis."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(work_dir)
+    import logging
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    from werkzeug.serving import make_server
+    import main
+
+    server = make_server("127.0.0.1", port, main.app, threaded=True)
+    ready.set()
+    server.serve_forever()
+
+
+def post(url, daten):
+    request = urllib.request.Request(
+        url, data=json.dumps(daten).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest für /api/objekt_daten")
+    parser.add_argument("--workers", type=int, default=4, help="Anzahl der Serverprozesse")
+    parser.add_argument("--clients", type=int, default=32, help="Anzahl gleichzeitiger Clients")
+    parser.add_argument("--requests", type=int, default=200, help="Anfragen pro Client")
+    parser.add_argument("--duplicates", type=float, default=0.2,
+                        help="Anteil der Anfragen mit einer umkämpften bild_id")
+    parser.add_argument("--port", type=int, default=5100, help="Erster Port der Serverprozesse")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="loadtest_")
+    context = multiprocessing.get_context("spawn")
+    servers = []
+    for i in range(args.workers):
+        ready = context.Event()
+        process = context.Process(target=run_server, args=(work_dir, args.port + i, ready), daemon=True)
+        process.start()
+        if not ready.wait(30):
+            sys.exit(f"Server auf Port {args.port + i} startet nicht")
+        servers.append(process)
+
+    # Umkämpfte bild_ids werden von allen Clients gesendet
+    shared_ids = [f"geteilt_{i}" for i in range(max(1, int(args.requests * args.duplicates)))]
+    accepted = Counter()
+    statuses = Counter()
+    latencies = []
+    lock = threading.Lock()
+
+    def client(number):
+        rng = random.Random(number)
+        for i in range(args.requests):
+            if rng.random() < args.duplicates:
+                bild_id = rng.choice(shared_ids)
+            else:
+                bild_id = f"client{number}_{i}"
+            port = args.port + rng.randrange(args.workers)
+            start = time.perf_counter()
+            status = post(f"http://127.0.0.1:{port}/api/objekt_daten",
+                          {"bild_id": bild_id, "client": number, "boxen": [[1, 2, 3, 4]]})
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[status] += 1
+                latencies.append(elapsed)
+                if status == 200:
+                    accepted[bild_id] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    for process in servers:
+        process.terminate()
+        process.join()
+
+    conn = sqlite3.connect(os.path.join(work_dir, "bounding_boxes.db"))
+    gespeichert_db = Counter(bild_id for (bild_id,) in conn.execute("SELECT bild_id FROM objekt_daten"))
+    conn.close()
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"{total} Anfragen in {duration:.1f} s ({total / duration:.0f}/s), Status: {dict(statuses)}")
+    print(f"Latenz p50 {latencies[total // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(total * 0.99)] * 1000:.1f} ms")
+
+    errors = []
+    doppelt_angenommen = [bild_id for bild_id, count in accepted.items() if count > 1]
+    if doppelt_angenommen:
+        errors.append(f"{len(doppelt_angenommen)} bild_ids mehrfach angenommen")
+    doppelt_in_db = [bild_id for bild_id, count in gespeichert_db.items() if count > 1]
+    if doppelt_in_db:
+        errors.append(f"{len(doppelt_in_db)} bild_ids mehrfach in der Datenbank")
+    verloren = accepted.keys() - gespeichert_db.keys()
+    if verloren:
+        errors.append(f"{len(verloren)} angenommene Datensätze fehlen in der Datenbank")
+    unbestaetigt = gespeichert_db.keys() - accepted.keys()
+    if unbestaetigt:
+        errors.append(f"{len(unbestaetigt)} Datensätze in der Datenbank ohne Bestätigung")
+    if set(statuses) - {200, 400}:
+        errors.append(f"Unerwartete Statuscodes: {dict(statuses)}")
+
+    if errors:
+        print("FEHLER: " + "; ".join(errors))
+        sys.exit(1)
+    print(f"OK: {len(gespeichert_db)} Datensätze, keine verlorenen oder doppelten Einträge")
+
+
+if __name__ == "__main__":
+    main()
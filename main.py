@@ -1,19 +1,136 @@
-from flask import Flask, jsonify, request, send_from_directory
+import bisect
+from flask import Flask, g, jsonify, request, send_file, send_from_directory
+from werkzeug.utils import safe_join
 import json
 import os
+import sqlite3
+import threading
+import time
+from urllib.parse import quote
+
+from annotation_log import import_legacy_files
+from catalog import ImageCatalog
+from metrics import REGISTRY, observe, timer
+from derivatives import DEFAULT_QUALITY, FORMATS, MAX_DIMENSION, DerivativeCache, derivative_key
+from stats import dataset_stats
+from storage import ConnectionPool, DatabaseBusyError, existing_object_ids, insert_objects
 
 app = Flask(__name__, static_folder='.')
-json_dateipfad = "./objekte.json"
+json_dateipfad = "./objekte.json"  # Alte Formate, werden beim ersten Start übernommen
+log_pfad = "./objekte.jsonl"
 current_directory = os.getcwd()
 kategorien_pfad = "./img"  # Pfad zu den Kategorien/Bildern
+db_pfad = "bounding_boxes.db"  # Gemeinsame Datenbank mit den Desktop-Werkzeugen
+
+# Jeder Server-Thread nutzt eine eigene Datenbankverbindung
+db = ConnectionPool(db_pfad, logger=app.logger)
+_lokal = threading.local()
+
+def bildkatalog():
+    if not hasattr(_lokal, "katalog"):
+        _lokal.katalog = ImageCatalog(db.connection(), kategorien_pfad)
+    return _lokal.katalog
+
+def importiere_altdaten():
+    """Übernimmt Objektdaten aus objekte.jsonl bzw. objekte.json einmalig in die Datenbank."""
+    import_legacy_files(db.connection(), log_pfad, json_dateipfad, logger=app.logger)
+
+max_stapel = 100000  # Höchstzahl an Datensätzen pro Stapel-Anfrage
+
+# Sortierte Dateinamen je Kategorie: {Kategorie: (mtime des Verzeichnisses, Namen)}
+bildlisten = {}
+max_seitengroesse = 1000
+
+# Verkleinerte Bildversionen für die Anzeige im Browser
+# Absoluter Pfad, da send_file relative Pfade auf app.root_path bezieht
+derivat_cache = DerivativeCache(os.path.abspath(os.path.join(".cache", "derivate")), logger=app.logger)
+
+def pruefe_objekt(objekt):
+    """Gibt eine Fehlermeldung zurück, wenn ein Datensatz ungültig ist, sonst None."""
+    if not isinstance(objekt, dict):
+        return "Datensatz ist kein Objekt"
+    bild_id = objekt.get('bild_id')
+    if isinstance(bild_id, bool) or not isinstance(bild_id, (str, int)) or bild_id == "":
+        return "bild_id fehlt oder ist ungültig"
+    boxen = objekt.get('boxen')
+    if boxen is not None and not (
+            isinstance(boxen, list)
+            and all(isinstance(box, list) and len(box) == 4
+                    and all(isinstance(wert, (int, float)) for wert in box) for box in boxen)):
+        return "boxen muss eine Liste von [x1, y1, x2, y2] sein"
+    return None
+
+def bildliste(kategorie):
+    """
+    Gibt die sortierten Dateinamen einer Kategorie zurück.
+
+    Die Liste bleibt im Speicher, bis sich die mtime des Verzeichnisses ändert;
+    danach liest der Bildkatalog nur dieses Verzeichnis inkrementell neu ein.
+    """
+    pfad = safe_join(kategorien_pfad, kategorie)
+    if pfad is None or not os.path.isdir(pfad):
+        raise FileNotFoundError(kategorie)
+    mtime_ns = os.stat(pfad).st_mtime_ns
+    eintrag = bildlisten.get(kategorie)
+    if eintrag is not None and eintrag[0] == mtime_ns:
+        return eintrag[1]
+    katalog = bildkatalog()
+    with timer("db_query_seconds", query="load_images"):
+        katalog.ensure_category(kategorie)
+        namen = katalog.file_names(kategorie)
+    bildlisten[kategorie] = (mtime_ns, namen)
+    return namen
+
+def bearbeitete_bilder(kategorie, dateinamen):
+    """Ermittelt, welche Bilder Boxen oder gespeicherte Objektdaten haben."""
+    namen = {os.path.splitext(dateiname)[0]: dateiname for dateiname in dateinamen}
+    mit_boxen = bildkatalog().annotated_names(kategorie, list(namen))
+    mit_objekten = existing_object_ids(db.connection(), [*namen, *dateinamen])
+    return {dateiname for name, dateiname in namen.items()
+            if name in mit_boxen or name in mit_objekten or dateiname in mit_objekten}
+
+def lese_stapel():
+    """
+    Liest die Datensätze einer Stapel-Anfrage als JSON-Array oder als JSON-Lines.
 
-def lese_oder_erstelle_datei():
-    if not os.path.exists(json_dateipfad):
-        os.makedirs(os.path.dirname(json_dateipfad), exist_ok=True)
-        with open(json_dateipfad, 'w') as datei:
-            json.dump([], datei)
-    with open(json_dateipfad, 'r') as datei:
-        return json.load(datei)
+    Returns:
+        Liste von (Datensatz, Fehlermeldung); bei JSON-Lines wird jede Zeile
+        einzeln gelesen, sodass eine fehlerhafte Zeile nur sich selbst betrifft
+    """
+    if request.mimetype == 'application/json':
+        daten = request.get_json(silent=True)
+        if not isinstance(daten, list):
+            raise ValueError("Erwartet wird ein JSON-Array von Datensätzen")
+        return [(objekt, pruefe_objekt(objekt)) for objekt in daten]
+
+    eintraege = []
+    for nummer, zeile in enumerate(request.get_data().splitlines(), start=1):
+        if not zeile.strip():
+            continue
+        try:
+            objekt = json.loads(zeile)
+        except ValueError:
+            eintraege.append((None, f"Ungültiges JSON in Zeile {nummer}"))
+            continue
+        eintraege.append((objekt, pruefe_objekt(objekt)))
+    return eintraege
+
+@app.before_request
+def starte_messung():
+    g.messung_start = time.perf_counter()
+
+@app.after_request
+def beende_messung(antwort):
+    if 'messung_start' in g:
+        observe("http_request_duration_seconds", time.perf_counter() - g.messung_start,
+                endpoint=request.endpoint or "unbekannt", method=request.method,
+                status=str(antwort.status_code))
+    return antwort
+
+@app.route('/metrics')
+def metrics():
+    """Laufzeitmessungen dieses Serverprozesses im Prometheus-Textformat."""
+    return app.response_class(REGISTRY.prometheus_text(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.route('/')
 def home():
@@ -23,23 +140,133 @@ def home():
 @app.route('/api/kategorien', methods=['GET'])
 def get_kategorien():
     try:
-        kategorien = [name for name in os.listdir(kategorien_pfad) if os.path.isdir(os.path.join(kategorien_pfad, name))]
-        return jsonify(kategorien)
-    except OSError as e:
+        katalog = bildkatalog()
+        # Kostet nur ein stat(), solange sich der Bilderordner nicht ändert
+        katalog.refresh_categories()
+        return jsonify(katalog.categories())
+    except (OSError, sqlite3.Error) as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/statistik', methods=['GET'])
+def get_statistik():
+    """
+    Annotationsstand als JSON: Zählungen je Kategorie, Histogramme und Boxen pro Tag.
+
+    Parameter: kategorie (optional) und tage (Zeitraum der Tagesstatistik).
+    """
+    kategorie = request.args.get('kategorie') or None
+    try:
+        tage = int(request.args.get('tage', 30))
+    except ValueError:
+        return jsonify({"error": "tage muss eine ganze Zahl sein"}), 400
+    if not 1 <= tage <= 3660:
+        return jsonify({"error": "Ungültiger Zeitraum"}), 400
+    try:
+        with timer("db_query_seconds", query="statistik"):
+            return jsonify(dataset_stats(db.connection(), kategorie, tage))
+    except sqlite3.Error as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/kategorien/<kategorie>/bilder', methods=['GET'])
+def get_bilder(kategorie):
+    """
+    Listet die Bilder einer Kategorie seitenweise.
+
+    Parameter: nach (Dateiname, hinter dem die Seite beginnt), limit und
+    status (alle, bearbeitet, offen). Die Seite beginnt per Binärsuche am
+    Cursor, daher kostet jede Seite gleich viel, unabhängig von ihrer Position.
+    """
+    nach = request.args.get('nach', '')
+    status = request.args.get('status', 'alle')
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({"error": "limit muss eine ganze Zahl sein"}), 400
+    if status not in ('alle', 'bearbeitet', 'offen') or not 1 <= limit <= max_seitengroesse:
+        return jsonify({"error": "Ungültiger Status oder ungültiges Limit"}), 400
+
+    try:
+        namen = bildliste(kategorie)
+    except FileNotFoundError:
+        return jsonify({"error": "Kategorie nicht gefunden"}), 404
+    except (OSError, sqlite3.Error) as e:
+        return jsonify({"error": str(e)}), 500
+
+    position = bisect.bisect_right(namen, nach) if nach else 0
+    bilder = []
+    # Der Bearbeitungsstatus wird blockweise nur für die gelesenen Namen geprüft
+    while len(bilder) < limit and position < len(namen):
+        block = namen[position:position + max(limit, 100)][:500]
+        bearbeitet = bearbeitete_bilder(kategorie, block)
+        for dateiname in block:
+            position += 1
+            ist_bearbeitet = dateiname in bearbeitet
+            if status == 'alle' or (status == 'bearbeitet') == ist_bearbeitet:
+                bilder.append({
+                    "name": dateiname,
+                    "url": f"/img/{quote(kategorie, safe='')}/{quote(dateiname, safe='')}",
+                    "bearbeitet": ist_bearbeitet,
+                })
+                if len(bilder) == limit:
+                    break
+
+    weiter = namen[position - 1] if position < len(namen) else None
+    return jsonify({"bilder": bilder, "weiter": weiter, "gesamt": len(namen)})
+
+
 @app.route('/api/objekt_daten', methods=['POST'])
 def speichere_objekt_daten():
     daten = request.json
-    objekte = lese_oder_erstelle_datei()
-    if any(objekt['bild_id'] == daten['bild_id'] for objekt in objekte):
+    fehler = pruefe_objekt(daten)
+    if fehler:
+        return jsonify({"status": "Fehler", "message": fehler}), 400
+    try:
+        with timer("db_query_seconds", query="insert_objects"), db.transaction() as conn:
+            gespeichert = insert_objects(conn, [daten])[0]
+    except DatabaseBusyError:
+        return jsonify({"status": "Fehler", "message": "Datenbank ausgelastet, bitte erneut senden"}), 503
+    except sqlite3.Error as e:
+        return jsonify({"status": "Fehler", "message": str(e)}), 500
+    if not gespeichert:
         return jsonify({"status": "Fehler", "message": "Bild bereits bearbeitet"}), 400
-    objekte.append(daten)
-    with open(json_dateipfad, 'w') as datei:
-        json.dump(objekte, datei, indent=4)
     return jsonify({"status": "Erfolg", "message": "Daten gespeichert"})
 
+@app.route('/api/objekt_daten/batch', methods=['POST'])
+def speichere_objekt_daten_stapel():
+    try:
+        eintraege = lese_stapel()
+    except ValueError as e:
+        return jsonify({"status": "Fehler", "message": str(e)}), 400
+    if len(eintraege) > max_stapel:
+        return jsonify({"status": "Fehler", "message": f"Höchstens {max_stapel} Datensätze pro Anfrage"}), 413
+
+    # Gültige Datensätze werden gemeinsam in einer Transaktion gespeichert
+    gueltig = [objekt for objekt, fehler in eintraege if fehler is None]
+    try:
+        with timer("db_query_seconds", query="insert_objects_batch"), db.transaction() as conn:
+            gespeichert = iter(insert_objects(conn, gueltig))
+    except DatabaseBusyError:
+        return jsonify({"status": "Fehler", "message": "Datenbank ausgelastet, bitte erneut senden"}), 503
+    except sqlite3.Error as e:
+        return jsonify({"status": "Fehler", "message": str(e)}), 500
+
+    ergebnisse = []
+    zaehler = {"gespeichert": 0, "duplikat": 0, "ungueltig": 0}
+    for objekt, fehler in eintraege:
+        bild_id = objekt.get('bild_id') if isinstance(objekt, dict) else None
+        if fehler is not None:
+            ergebnis = {"bild_id": bild_id, "status": "ungueltig", "message": fehler}
+        elif next(gespeichert):
+            ergebnis = {"bild_id": bild_id, "status": "gespeichert"}
+        else:
+            ergebnis = {"bild_id": bild_id, "status": "duplikat", "message": "Bild bereits bearbeitet"}
+        zaehler[ergebnis["status"]] += 1
+        ergebnisse.append(ergebnis)
+
+    return jsonify({"status": "Erfolg", **zaehler, "ergebnisse": ergebnisse})
+
 # Zusätzliche Route, um Bilder aus den Kategorien-Unterordnern auszuliefern
 @app.route('/img/<kategorie>/<bildname>')
 def kategorie_bild(kategorie, bildname):
@@ -48,5 +275,49 @@ def kategorie_bild(kategorie, bildname):
     return send_from_directory(current_directory, bild_pfad)
 
 
+# Verkleinerte Version eines Bildes, z.B. /api/bild/schraube/a.png?w=800&h=600&format=webp
+@app.route('/api/bild/<kategorie>/<bildname>')
+def bild_derivat(kategorie, bildname):
+    quelle = safe_join(kategorien_pfad, kategorie, bildname)
+    if quelle is None or not os.path.isfile(quelle):
+        return jsonify({"error": "Bild nicht gefunden"}), 404
+    try:
+        breite = int(request.args.get('w', 800))
+        hoehe = int(request.args.get('h', 600))
+        qualitaet = int(request.args.get('q', DEFAULT_QUALITY))
+    except ValueError:
+        return jsonify({"error": "w, h und q müssen ganze Zahlen sein"}), 400
+    fmt = request.args.get('format', 'jpeg').lower().replace('jpg', 'jpeg')
+    if (fmt not in FORMATS or not 1 <= breite <= MAX_DIMENSION
+            or not 1 <= hoehe <= MAX_DIMENSION or not 1 <= qualitaet <= 100):
+        return jsonify({"error": "Ungültige Größe, Qualität oder ungültiges Format"}), 400
+
+    mtime_ns = os.stat(quelle).st_mtime_ns
+    etag = derivative_key(quelle, mtime_ns, breite, hoehe, fmt, qualitaet)
+    geaendert = mtime_ns // 1_000_000_000
+
+    # Unveränderte Versionen beantworten, ohne den Cache zu berühren
+    if request.if_none_match:
+        unveraendert = request.if_none_match.contains(etag)
+    else:
+        unveraendert = (request.if_modified_since is not None
+                        and request.if_modified_since.timestamp() >= geaendert)
+    if unveraendert:
+        antwort = app.response_class(status=304)
+        antwort.set_etag(etag)
+        antwort.last_modified = geaendert
+        return antwort
+
+    try:
+        pfad = derivat_cache.get(quelle, mtime_ns, breite, hoehe, fmt, qualitaet)
+    except OSError as e:
+        return jsonify({"error": f"Bild kann nicht verarbeitet werden: {e}"}), 500
+    # max_age=0: der Browser fragt jedes Mal nach und erhält in der Regel ein 304
+    return send_file(pfad, mimetype=FORMATS[fmt][1], etag=etag,
+                     last_modified=geaendert, max_age=0)
+
+
 if __name__ == '__main__':
+    # Mit mehreren Workern (z.B. gunicorn) stattdessen vorab "python cli.py migrate"
+    importiere_altdaten()
     app.run(debug=True)
@@ -0,0 +1,173 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Obere Bucket-Grenzen in Sekunden (logarithmisch von 0,1 ms bis 60 s)
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    """
+    Histogramm mit festen Buckets, wie es Prometheus erwartet.
+
+    Quantile werden durch lineare Interpolation innerhalb des Buckets
+    geschätzt; der Speicherbedarf bleibt unabhängig von der Anzahl der Werte.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Schätzt das Quantil q (0..1) in Sekunden."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+
+class MetricsRegistry:
+    """
+    Sammelt Laufzeitmessungen als Histogramme, getrennt nach Name und Labels.
+
+    Alle Methoden sind threadsicher, sodass auch Worker-Threads (Vorladen,
+    Export, Katalog) messen können.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, help_text):
+        """Hinterlegt eine Beschreibung für die Prometheus-Ausgabe."""
+        self._help[name] = help_text
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Misst die Dauer des with-Blocks, auch wenn er mit einer Ausnahme endet."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """
+        Gibt eine Zusammenfassung aller Histogramme zurück.
+
+        Returns:
+            Liste von Dictionaries mit name, labels, count, sum sowie
+            p50/p95/p99/max in Millisekunden, sortiert nach Name
+        """
+        with self._lock:
+            items = sorted(self._histograms.items())
+            return [{
+                "name": name,
+                "labels": dict(labels),
+                "count": histogram.count,
+                "sum_ms": round(histogram.sum * 1000, 3),
+                "p50_ms": round(histogram.quantile(0.5) * 1000, 3),
+                "p95_ms": round(histogram.quantile(0.95) * 1000, 3),
+                "p99_ms": round(histogram.quantile(0.99) * 1000, 3),
+                "max_ms": round(histogram.max * 1000, 3),
+            } for (name, labels), histogram in items]
+
+    def summary_text(self):
+        """Formatiert die Zusammenfassung als Tabelle für das Debug-Panel."""
+        lines = [f"{'Messung':<48}{'Anzahl':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for entry in self.snapshot():
+            label = ",".join(f"{k}={v}" for k, v in entry["labels"].items())
+            name = f"{entry['name']}{{{label}}}" if label else entry["name"]
+            lines.append(f"{name:<48}{entry['count']:>8}{entry['p50_ms']:>10.2f}"
+                         f"{entry['p95_ms']:>10.2f}{entry['p99_ms']:>10.2f}{entry['max_ms']:>10.2f}")
+        return "\n".join(lines)
+
+    def prometheus_text(self):
+        """Gibt alle Histogramme im Prometheus-Textformat (Version 0.0.4) zurück."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            lines = []
+            last_name = None
+            for (name, labels), histogram in items:
+                if name != last_name:
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} histogram")
+                    last_name = name
+                base = [f'{key}="{_escape(value)}"' for key, value in labels]
+                cumulative = 0
+                for bound, count in zip(self.buckets_for(histogram), histogram.counts):
+                    cumulative += count
+                    label_text = ",".join(base + [f'le="{bound}"'])
+                    lines.append(f"{name}_bucket{{{label_text}}} {cumulative}")
+                label_text = "{" + ",".join(base) + "}" if base else ""
+                lines.append(f"{name}_sum{label_text} {histogram.sum}")
+                lines.append(f"{name}_count{label_text} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def buckets_for(histogram):
+        return [repr(bound) for bound in histogram.buckets] + ["+Inf"]
+
+    def dump(self, path):
+        """Schreibt die Zusammenfassung atomar als JSON-Datei."""
+        data = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "metrics": self.snapshot()}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as datei:
+            json.dump(data, datei, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Gemeinsame Registry des Prozesses
+REGISTRY = MetricsRegistry()
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+
+REGISTRY.describe("http_request_duration_seconds", "Dauer der HTTP-Anfragen je Endpunkt")
+REGISTRY.describe("db_query_seconds", "Dauer der Datenbankzugriffe je Abfrage")
+REGISTRY.describe("image_decode_seconds", "Dauer des Dekodierens von Bilddateien")
+REGISTRY.describe("image_resize_seconds", "Dauer des Skalierens für die Anzeige")
+REGISTRY.describe("derivative_render_seconds", "Dauer der Erzeugung verkleinerter Bildversionen")
+REGISTRY.describe("pixel_cache_load_seconds", "Dauer des Einblendens eines Bildes aus dem Pixel-Cache")
+REGISTRY.describe("thumbnail_grid_render_seconds", "Dauer des Zeichnens der sichtbaren Zeilen der Übersicht")
+REGISTRY.describe("export_seconds", "Dauer eines Exports je Format")
@@ -0,0 +1,346 @@
+import math
+from array import array
+
+from metrics import timer
+
+# Einträge pro Knoten des R-Baums
+NODE_SIZE = 16
+
+# Abstand in Canvas-Pixeln, innerhalb dessen eine Kante oder Ecke greift
+HANDLE_TOLERANCE = 6
+
+# Ab so vielen nicht indizierten Änderungen wird der Index neu aufgebaut
+REINDEX_THRESHOLD = 256
+
+# Setzt Koordinaten und Sichtbarkeit vieler Rechtecke mit einem einzigen
+# Aufruf aus Python; Listen werden von tkinter direkt als Tcl-Listen übergeben
+OVERLAY_DRAW_PROC = """
+proc ::overlay_draw {canvas items coords shown hidden} {
+    foreach item $items {x1 y1 x2 y2} $coords {
+        $canvas coords $item $x1 $y1 $x2 $y2
+    }
+    foreach item $shown {
+        $canvas itemconfigure $item -state normal
+    }
+    foreach item $hidden {
+        $canvas itemconfigure $item -state hidden
+    }
+}
+"""
+
+
+class SpatialIndex:
+    """
+    Statischer R-Baum über Boxen, gepackt mit Sort-Tile-Recursive (STR).
+
+    Die Boxen werden nach Mittelpunkt in senkrechte Streifen und innerhalb
+    der Streifen von oben nach unten sortiert; je NODE_SIZE benachbarte
+    Einträge bilden einen Knoten. Jede Ebene ist ein flaches array mit
+    (x1, y1, x2, y2) je Eintrag, die Kinder von Eintrag p liegen auf der
+    Ebene darunter an den Positionen p * NODE_SIZE bis (p + 1) * NODE_SIZE.
+    Eine Bereichsabfrage kostet so O(log n + k); liegt ein Knoten ganz im
+    Bereich, werden seine Boxen als zusammenhängender Abschnitt übernommen.
+    """
+
+    def __init__(self, coords, indices):
+        """
+        Args:
+            coords: array('d') mit x1, y1, x2, y2 je Box
+            indices: Positionen der Boxen in coords, die indiziert werden
+        """
+        order = sorted(indices, key=lambda i: coords[4 * i] + coords[4 * i + 2])
+        leaf_count = math.ceil(len(order) / NODE_SIZE)
+        slice_length = max(1, math.ceil(math.sqrt(leaf_count))) * NODE_SIZE
+        for start in range(0, len(order), slice_length):
+            order[start:start + slice_length] = sorted(
+                order[start:start + slice_length], key=lambda i: coords[4 * i + 1] + coords[4 * i + 3]
+            )
+        self.items = array('l', order)
+
+        bounds = array('d')
+        for i in order:
+            bounds.extend(coords[4 * i:4 * i + 4])
+        self.levels = [bounds]
+        while len(bounds) > 4 * NODE_SIZE:
+            parent = array('d')
+            step = 4 * NODE_SIZE
+            for start in range(0, len(bounds), step):
+                chunk = bounds[start:start + step]
+                parent.extend((min(chunk[0::4]), min(chunk[1::4]), max(chunk[2::4]), max(chunk[3::4])))
+            self.levels.append(parent)
+            bounds = parent
+
+    def __len__(self):
+        return len(self.items)
+
+    def search(self, x1, y1, x2, y2):
+        """Gibt die Positionen aller Boxen zurück, die den Bereich schneiden."""
+        results = []
+        top = len(self.levels) - 1
+        stack = [(top, p) for p in range(len(self.levels[top]) // 4)]
+        while stack:
+            level, p = stack.pop()
+            bounds = self.levels[level]
+            k = 4 * p
+            if bounds[k] > x2 or bounds[k + 1] > y2 or bounds[k + 2] < x1 or bounds[k + 3] < y1:
+                continue
+            if level == 0:
+                results.append(self.items[p])
+            elif bounds[k] >= x1 and bounds[k + 1] >= y1 and bounds[k + 2] <= x2 and bounds[k + 3] <= y2:
+                span = NODE_SIZE ** level
+                results.extend(self.items[p * span:(p + 1) * span])
+            else:
+                child_count = len(self.levels[level - 1]) // 4
+                stack.extend((level - 1, c) for c in range(p * NODE_SIZE, min((p + 1) * NODE_SIZE, child_count)))
+        return results
+
+
+class BoxOverlay:
+    """
+    Zeichnet die Bounding Boxes eines Bildes auf den Canvas.
+
+    Die Boxen liegen in Originalbild-Koordinaten in einem flachen array
+    statt als einzelne Objekte; ein SpatialIndex liefert die im Sichtbereich
+    liegenden Boxen und die Box unter dem Mauszeiger. Gezeichnet werden nur
+    sichtbare Boxen, und zwar in einem Vorrat von Canvas-Rechtecken, der
+    über Bildwechsel hinweg erhalten bleibt: Beim Neuzeichnen werden nur
+    Koordinaten gesetzt und überzählige Rechtecke versteckt, gebündelt in
+    einem einzigen Tcl-Aufruf (OVERLAY_DRAW_PROC).
+
+    Geänderte oder neue Boxen werden bis zum nächsten Neuaufbau des Index
+    zusätzlich linear geprüft, sodass einzelne Änderungen den Index nicht
+    jedes Mal neu aufbauen.
+    """
+
+    TAG = "overlay"
+
+    def __init__(self, canvas, outline="green", selected_outline="orange", width=2):
+        """
+        Args:
+            canvas: Tk-Canvas, auf dem gezeichnet wird
+            outline: Farbe der Boxen
+            selected_outline: Farbe der ausgewählten Box
+            width: Linienstärke in Pixeln
+        """
+        self.canvas = canvas
+        self.outline = outline
+        self.width = width
+        self.selected = None
+
+        self._coords = array('d')
+        self._ids = array('q')
+        self._alive = bytearray()
+        self._position = {}
+        self._index = None
+        self._pending = set()
+
+        # Vorrat an Canvas-Rechtecken; die ersten _shown sind sichtbar
+        self._items = []
+        self._shown = 0
+        self._visible = []
+        canvas.tk.eval(OVERLAY_DRAW_PROC)
+        self._selection_item = canvas.create_rectangle(
+            0, 0, 0, 0, outline=selected_outline, width=width + 1,
+            state="hidden", tags=(self.TAG, "selection")
+        )
+
+    def __len__(self):
+        return len(self._position)
+
+    def __contains__(self, box_id):
+        return box_id in self._position
+
+    def set_boxes(self, rows):
+        """
+        Ersetzt alle Boxen, z.B. beim Bildwechsel.
+
+        Args:
+            rows: Iterierbare (id, x1, y1, x2, y2) in Originalbild-Koordinaten
+        """
+        self._coords = array('d')
+        self._ids = array('q')
+        for box_id, x1, y1, x2, y2 in rows:
+            self._ids.append(box_id)
+            self._coords.extend((x1, y1, x2, y2))
+        self._alive = bytearray(b"\x01" * len(self._ids))
+        self._position = {box_id: i for i, box_id in enumerate(self._ids)}
+        self._pending.clear()
+        self._index = None
+        self.selected = None
+
+    def clear(self):
+        """Entfernt alle Boxen und versteckt die Canvas-Rechtecke."""
+        self.set_boxes(())
+        self.hide()
+
+    def add(self, box_id, bbox):
+        """Fügt eine Box hinzu."""
+        position = len(self._ids)
+        self._ids.append(box_id)
+        self._coords.extend(bbox)
+        self._alive.append(1)
+        self._position[box_id] = position
+        self._mark_pending(position)
+
+    def update(self, box_id, bbox):
+        """Setzt neue Koordinaten einer Box."""
+        position = self._position[box_id]
+        self._coords[4 * position:4 * position + 4] = array('d', bbox)
+        self._mark_pending(position)
+
+    def remove(self, box_id):
+        """Entfernt eine Box; ihr Platz im array bleibt bis zum nächsten set_boxes() frei."""
+        position = self._position.pop(box_id, None)
+        if position is None:
+            return
+        self._alive[position] = 0
+        self._pending.discard(position)
+        if self.selected == box_id:
+            self.selected = None
+
+    def bbox(self, box_id):
+        """Gibt die Koordinaten einer Box im Originalbild zurück."""
+        position = self._position[box_id]
+        return tuple(self._coords[4 * position:4 * position + 4])
+
+    def _mark_pending(self, position):
+        self._pending.add(position)
+        if self._index is not None and len(self._pending) > REINDEX_THRESHOLD:
+            self._index = None
+
+    def _ensure_index(self):
+        if self._index is None:
+            self._index = SpatialIndex(self._coords, [i for i, alive in enumerate(self._alive) if alive])
+            self._pending.clear()
+
+    def query(self, x1, y1, x2, y2):
+        """
+        Gibt die IDs aller Boxen zurück, die einen Bereich des Originalbildes schneiden.
+
+        Reihenfolge: in der Reihenfolge, in der die Boxen angelegt wurden.
+        """
+        return [self._ids[p] for p in sorted(self._search(x1, y1, x2, y2))]
+
+    def _search(self, x1, y1, x2, y2):
+        """Wie query(), liefert aber ungeordnete Positionen im array."""
+        self._ensure_index()
+        coords = self._coords
+        alive = self._alive
+        pending = self._pending
+        positions = self._index.search(x1, y1, x2, y2)
+        if pending:
+            positions = [p for p in positions if p not in pending]
+            for p in pending:
+                k = 4 * p
+                if not (coords[k] > x2 or coords[k + 1] > y2 or coords[k + 2] < x1 or coords[k + 3] < y1):
+                    positions.append(p)
+        return [p for p in positions if alive[p]]
+
+    def hit_test(self, view, canvas_x, canvas_y, tolerance=HANDLE_TOLERANCE):
+        """
+        Ermittelt die Box und den Griff unter einem Canvas-Punkt.
+
+        Kanten und Ecken jeder Box greifen innerhalb von tolerance Pixeln,
+        das Innere nur bei der ausgewählten Box. Liegen mehrere Boxen unter
+        dem Punkt, gewinnt die ausgewählte, danach die kleinste.
+
+        Args:
+            view: ViewTransform des aktuellen Bildes
+            canvas_x, canvas_y: Punkt in Canvas-Koordinaten
+            tolerance: Greifabstand in Canvas-Pixeln
+
+        Returns:
+            (box_id, griff) oder None; griff ist eine Kombination aus
+            "n", "s", "w", "e" (z.B. "nw") oder "move" für das Innere
+        """
+        x, y = view.to_image(canvas_x, canvas_y)
+        t = tolerance / view.scale
+        best = None
+        for box_id in self.query(x - t, y - t, x + t, y + t):
+            x1, y1, x2, y2 = self.bbox(box_id)
+            handle = ""
+            if y1 - t <= y <= y2 + t:
+                if abs(y - y1) <= t:
+                    handle += "n"
+                elif abs(y - y2) <= t:
+                    handle += "s"
+            if x1 - t <= x <= x2 + t:
+                if abs(x - x1) <= t:
+                    handle += "w"
+                elif abs(x - x2) <= t:
+                    handle += "e"
+            if not (x1 - t <= x <= x2 + t and y1 - t <= y <= y2 + t):
+                continue
+            if not handle:
+                if box_id != self.selected:
+                    continue
+                handle = "move"
+            rank = (box_id != self.selected, (x2 - x1) * (y2 - y1))
+            if best is None or rank < best[0]:
+                best = (rank, box_id, handle)
+        return None if best is None else (best[1], best[2])
+
+    def select(self, box_id):
+        """Wählt eine Box aus (None hebt die Auswahl auf)."""
+        self.selected = box_id if box_id in self._position else None
+
+    def render(self, view, canvas_size):
+        """
+        Zeichnet alle Boxen, die im Sichtbereich liegen.
+
+        Args:
+            view: ViewTransform des aktuellen Bildes
+            canvas_size: (Breite, Höhe) des Canvas
+        """
+        x1, y1 = view.to_image(0, 0)
+        x2, y2 = view.to_image(*canvas_size)
+        with timer("canvas_draw_seconds", kind="boxes"):
+            visible = self._search(x1, y1, x2, y2)
+            while len(self._items) < len(visible):
+                self._items.append(self.canvas.create_rectangle(
+                    0, 0, 0, 0, outline=self.outline, width=self.width,
+                    state="hidden", tags=(self.TAG, "box")
+                ))
+
+            scale, offset_x, offset_y = view.scale, view.offset_x, view.offset_y
+            coords = self._coords
+            canvas_coords = []
+            for p in visible:
+                k = 4 * p
+                canvas_coords += (coords[k] * scale + offset_x, coords[k + 1] * scale + offset_y,
+                                  coords[k + 2] * scale + offset_x, coords[k + 3] * scale + offset_y)
+            count = len(visible)
+            self.canvas.tk.call(
+                "::overlay_draw", self.canvas._w, tuple(self._items[:count]), tuple(canvas_coords),
+                tuple(self._items[self._shown:count]), tuple(self._items[count:self._shown])
+            )
+            self._shown = count
+            self._visible = visible
+
+            if self.selected is not None:
+                self.canvas.coords(self._selection_item, *view.box_to_canvas(self.bbox(self.selected)))
+                self.canvas.itemconfigure(self._selection_item, state="normal")
+            else:
+                self.canvas.itemconfigure(self._selection_item, state="hidden")
+            self.canvas.tag_raise(self.TAG)
+
+    def preview(self, box_id, canvas_bbox):
+        """
+        Zeigt eine Box während des Verschiebens oder Größenänderns an.
+
+        Das Rechteck der Box wird versteckt und stattdessen die Auswahl an
+        der neuen Position gezeichnet; gespeichert wird erst über update().
+        """
+        position = self._position[box_id]
+        if position in self._visible:
+            self.canvas.itemconfigure(self._items[self._visible.index(position)], state="hidden")
+        self.canvas.coords(self._selection_item, *canvas_bbox)
+        self.canvas.itemconfigure(self._selection_item, state="normal")
+        self.canvas.tag_raise(self._selection_item)
+
+    def hide(self):
+        """Versteckt alle Rechtecke, ohne sie zu löschen."""
+        self.canvas.tk.call("::overlay_draw", self.canvas._w, (), (), (), tuple(self._items[:self._shown]))
+        self.canvas.itemconfigure(self._selection_item, state="hidden")
+        self._shown = 0
+        self._visible = []
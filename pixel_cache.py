@@ -0,0 +1,286 @@
+"""
+Festplatten-Cache für dekodierte Bilder in Anzeigegröße.
+
+Jeder Eintrag ist eine Datei aus festem Header (HEADER) und den rohen
+Pixeldaten. Beim Lesen wird die Datei per mmap eingeblendet und das Bild
+direkt auf den Puffer gelegt; ein erneutes Öffnen kostet so nur das
+Einlesen der Seiten statt eines Dekodiervorgangs. Der Cache übersteht
+Neustarts und lässt sich vor einer Annotationsschicht vorwärmen (warm(),
+siehe auch "cli.py warm").
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from derivatives import cache_entries, trim_cache_dir
+from metrics import timer
+from prefetch import decode_for_display
+
+# Magic, Version, Kanäle, Breite, Höhe, Originalbreite, Originalhöhe
+HEADER = struct.Struct("<4sHHIIII")
+MAGIC = b"BBPX"
+VERSION = 1
+
+# Kanäle -> PIL-Modus; andere Modi werden vor dem Speichern umgewandelt
+MODES = {1: "L", 3: "RGB", 4: "RGBA"}
+CHANNELS = {mode: channels for channels, mode in MODES.items()}
+
+# Canvasgröße, wenn weder angegeben noch von der Oberfläche gemerkt
+DEFAULT_CANVAS_SIZE = (800, 600)
+
+
+def pixel_key(image_path, stat, canvas_size):
+    """Bildet den Schlüssel aus Pfad, mtime, Dateigröße und Canvasgröße."""
+    raw = (f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|"
+           f"{canvas_size[0]}x{canvas_size[1]}")
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class PixelCache:
+    """
+    Persistenter Cache für Bilder in Anzeigegröße.
+
+    Ein geändertes Original (mtime oder Größe) ergibt einen neuen Schlüssel;
+    der veraltete Eintrag altert dann aus dem Cache. Überschreitet der Cache
+    max_bytes, werden die am längsten nicht genutzten Dateien gelöscht.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3, logger=None):
+        """
+        Args:
+            cache_dir: Verzeichnis für die Cache-Dateien
+            max_bytes: Obergrenze für die Größe des Cache-Verzeichnisses
+            logger: Optionaler Logger
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._bytes = None
+        self._canvas_size = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Statistik
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".px")
+
+    def _lookup(self, image_path, canvas_size):
+        """Gibt (stat, Cache-Pfad) zurück oder None, wenn das Original fehlt."""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return stat, self.path_for(pixel_key(image_path, stat, canvas_size))
+
+    def contains(self, image_path, canvas_size):
+        found = self._lookup(image_path, canvas_size)
+        return found is not None and os.path.exists(found[1])
+
+    def get(self, image_path, canvas_size):
+        """
+        Liest ein Bild aus dem Cache.
+
+        Args:
+            image_path: Pfad zum Originalbild
+            canvas_size: Tuple (Breite, Höhe) des Canvas
+
+        Returns:
+            Schreibgeschütztes PIL-Image auf dem eingeblendeten Puffer
+            (info["original_size"] wie bei decode_for_display) oder None
+        """
+        found = self._lookup(image_path, canvas_size)
+        if found is None:
+            return None
+        path = found[1]
+        try:
+            with timer("pixel_cache_load_seconds"):
+                with open(path, "rb") as f:
+                    # Die Abbildung bleibt nach dem Schließen der Datei gültig
+                    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                img = self._image(buffer)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        if img is None:
+            self._discard(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            # Zugriffszeit für die Verdrängung merken
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return img
+
+    def _image(self, buffer):
+        """Legt ein Bild auf den Puffer; None, wenn Header oder Länge nicht passen."""
+        if len(buffer) < HEADER.size:
+            return None
+        magic, version, channels, width, height, original_width, original_height = \
+            HEADER.unpack_from(buffer)
+        mode = MODES.get(channels)
+        if (magic != MAGIC or version != VERSION or mode is None
+                or len(buffer) != HEADER.size + width * height * channels):
+            return None
+        img = Image.frombuffer(mode, (width, height), memoryview(buffer)[HEADER.size:], "raw", mode, 0, 1)
+        img.info["original_size"] = (original_width, original_height)
+        return img
+
+    def _discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def put(self, image_path, canvas_size, img):
+        """
+        Legt ein Bild in Anzeigegröße im Cache ab.
+
+        Geschrieben wird in eine Temp-Datei, die dann atomar umbenannt wird,
+        damit parallele Leser nie eine halbe Datei sehen.
+        """
+        found = self._lookup(image_path, canvas_size)
+        if found is None:
+            return
+        path = found[1]
+        original_width, original_height = img.info.get("original_size", img.size)
+        if img.mode not in CHANNELS:
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        data = img.tobytes()
+        header = HEADER.pack(MAGIC, VERSION, CHANNELS[img.mode], img.width, img.height,
+                             original_width, original_height)
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Z.B. unter Windows, wenn die Zieldatei gerade eingeblendet ist
+            self._discard(tmp_path)
+            if self.logger:
+                self.logger.warning(f"Pixel-Cache: '{image_path}' nicht gespeichert: {e}")
+            return
+        self._account(len(header) + len(data))
+
+    def decode(self, image_path, canvas_size):
+        """
+        Wie decode_for_display, aber über den Cache.
+
+        Passt als decoder für ImagePrefetcher und kann in Worker-Threads laufen.
+        """
+        img = self.get(image_path, canvas_size)
+        if img is None:
+            img = decode_for_display(image_path, canvas_size)
+            self.put(image_path, canvas_size, img)
+        return img
+
+    def _account(self, nbytes):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in cache_entries(self.cache_dir))
+            else:
+                self._bytes += nbytes
+            if self._bytes <= self.max_bytes:
+                return
+            self._bytes, removed = trim_cache_dir(self.cache_dir, self.max_bytes)
+        if self.logger:
+            self.logger.info(f"Pixel-Cache bereinigt: {removed} Dateien entfernt")
+
+    def remember_canvas_size(self, canvas_size):
+        """Merkt sich die Canvasgröße der Oberfläche als Vorgabe für warm()."""
+        canvas_size = tuple(canvas_size)
+        if canvas_size == self._canvas_size:
+            return
+        self._canvas_size = canvas_size
+        if canvas_size == self.last_canvas_size():
+            return
+        path = os.path.join(self.cache_dir, "canvas.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(list(canvas_size), f)
+            os.replace(tmp_path, path)
+        except OSError:
+            self._discard(tmp_path)
+
+    def last_canvas_size(self):
+        """Zuletzt von der Oberfläche gemerkte Canvasgröße oder DEFAULT_CANVAS_SIZE."""
+        try:
+            with open(os.path.join(self.cache_dir, "canvas.json")) as f:
+                width, height = json.load(f)
+            return (int(width), int(height))
+        except (OSError, ValueError, TypeError):
+            return DEFAULT_CANVAS_SIZE
+
+    def warm(self, image_paths, canvas_size=None, max_workers=None, progress=None, cancel_event=None):
+        """
+        Füllt den Cache für eine Liste von Bildern, z.B. eine ganze Kategorie.
+
+        Bereits vorhandene Einträge werden nur geprüft, nicht neu dekodiert.
+
+        Args:
+            image_paths: Pfade der Originalbilder
+            canvas_size: Canvasgröße der Oberfläche (Standard: last_canvas_size())
+            max_workers: Größe des Thread-Pools (Standard: CPU-Anzahl, höchstens 4)
+            progress: Optionale Funktion (erledigte Bilder, Gesamtzahl)
+            cancel_event: Optionales threading.Event zum Abbrechen
+
+        Returns:
+            Dictionary mit Anzahl Bilder, neu dekodierter, bereits vorhandener
+            und fehlerhafter Bilder sowie der Dauer
+        """
+        canvas_size = tuple(canvas_size or self.last_canvas_size())
+        image_paths = list(image_paths)
+        counts = {"decoded": 0, "cached": 0, "failed": 0}
+
+        def warm_one(image_path):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            if self.contains(image_path, canvas_size):
+                return "cached"
+            try:
+                self.put(image_path, canvas_size, decode_for_display(image_path, canvas_size))
+                return "decoded"
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Pixel-Cache: '{image_path}' nicht dekodierbar: {e}")
+                return "failed"
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers or min(4, os.cpu_count() or 1),
+                                thread_name_prefix="pixelcache") as executor:
+            for done, result in enumerate(executor.map(warm_one, image_paths), start=1):
+                if result:
+                    counts[result] += 1
+                if progress and (done % 100 == 0 or done == len(image_paths)):
+                    progress(done, len(image_paths))
+        return {
+            "images": len(image_paths),
+            **counts,
+            "canvas_size": list(canvas_size),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    def stats_text(self):
+        """Formatiert die Statistik für das Status-Panel."""
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"Pixel-Cache: {self.hits} Treffer / {self.misses} Fehlgriffe ({rate:.0%})"
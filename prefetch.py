@@ -0,0 +1,180 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+from metrics import timer
+
+# Vor LANCZOS wird mit Image.reduce() bis auf das Doppelte der Zielgröße verkleinert
+REDUCING_GAP = 2.0
+
+
+def decode_for_display(image_path, canvas_size):
+    """
+    Dekodiert ein Bild und verkleinert es auf die Anzeigegröße des Canvas.
+
+    JPEGs werden per draft() bereits beim Dekodieren um bis zu 1/8 verkleinert,
+    sodass LANCZOS nur noch auf einem kleinen Zwischenbild arbeitet. Die
+    Box-Koordinaten hängen davon nicht ab, sie werden in Originalpixeln
+    gespeichert (siehe tiles.ViewTransform).
+
+    Die Funktion berührt kein Tkinter-Objekt und kann daher in einem
+    Worker-Thread laufen. PIL gibt beim Dekodieren und Skalieren den GIL frei.
+
+    Args:
+        image_path: Pfad zum Bild
+        canvas_size: Tuple (Breite, Höhe) des Canvas
+
+    Returns:
+        PIL-Image in Anzeigegröße; info["original_size"] enthält die
+        Größe des Originalbildes
+    """
+    canvas_width, canvas_height = canvas_size
+    img = Image.open(image_path)
+
+    # Behält das Seitenverhältnis bei, wenn das Bild verkleinert wird
+    img_width, img_height = img.size
+    original_size = img.size
+    ratio = min(canvas_width / img_width, canvas_height / img_height)
+    new_width = max(1, int(img_width * ratio * 0.9))  # 90% der verfügbaren Breite
+    new_height = max(1, int(img_height * ratio * 0.9))  # 90% der verfügbaren Höhe
+    target = (new_width, new_height)
+
+    with timer("image_decode_seconds"):
+        if ratio < 1 and img.format == "JPEG":
+            # Wählt die kleinste Decoder-Stufe, die noch mindestens target groß ist
+            img.draft("RGB", target)
+        img.load()
+
+    if ratio < 1:  # Nur verkleinern, nicht vergrößern
+        with timer("image_resize_seconds"):
+            img = img.resize(target, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+    # Die Originalgröße wird für die Umrechnung der Box-Koordinaten benötigt
+    img.info["original_size"] = original_size
+    return img
+
+
+class ImagePrefetcher:
+    """
+    Lädt die Nachbarbilder des aktuellen Bildes im Hintergrund vor.
+
+    Die Worker liefern fertig skalierte PIL-Images; die Umwandlung in ein
+    PhotoImage bleibt dem Tk-Hauptthread vorbehalten (siehe take()).
+    """
+
+    def __init__(self, ahead=3, behind=1, max_workers=None, decoder=decode_for_display):
+        """
+        Args:
+            ahead: Anzahl der vorzuladenden nächsten Bilder
+            behind: Anzahl der vorzuladenden vorherigen Bilder
+            max_workers: Größe des Thread-Pools (Standard: CPU-Anzahl, höchstens 4)
+            decoder: Funktion (Pfad, Canvasgröße) -> PIL-Image
+        """
+        self.ahead = ahead
+        self.behind = behind
+        self.decoder = decoder
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(4, os.cpu_count() or 1),
+            thread_name_prefix="prefetch"
+        )
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._generation = 0
+
+        # Statistik
+        self.hits = 0
+        self.misses = 0
+
+    def _decode(self, generation, image_path, canvas_size):
+        """Worker-Funktion; überspringt Aufträge, die inzwischen veraltet sind."""
+        if generation != self._generation:
+            return None
+        return self.decoder(image_path, canvas_size)
+
+    def schedule(self, images, index, canvas_size, is_cached=None):
+        """
+        Plant das Vorladen der Bilder rund um den aktuellen Index.
+
+        Aufträge außerhalb des neuen Fensters werden abgebrochen, sofern sie
+        noch nicht laufen.
+
+        Args:
+            images: Liste aller Bildpfade der Kategorie
+            index: Index des aktuell angezeigten Bildes
+            canvas_size: Tuple (Breite, Höhe) des Canvas
+            is_cached: Optionale Funktion (Pfad) -> bool, um bereits
+                zwischengespeicherte Bilder zu überspringen
+        """
+        # Nächste Bilder zuerst, danach die vorherigen
+        window = [images[i] for i in range(index + 1, min(len(images), index + 1 + self.ahead))]
+        window += [images[i] for i in range(index - 1, max(-1, index - 1 - self.behind), -1)]
+        wanted = {(path, canvas_size) for path in window}
+
+        with self._lock:
+            for key in list(self._futures):
+                if key not in wanted:
+                    self._futures.pop(key).cancel()
+
+            for path in window:
+                key = (path, canvas_size)
+                if key in self._futures or (is_cached and is_cached(path)):
+                    continue
+                self._futures[key] = self._executor.submit(
+                    self._decode, self._generation, path, canvas_size
+                )
+
+    def take(self, image_path, canvas_size):
+        """
+        Holt ein vorgeladenes Bild ab.
+
+        Ein bereits laufender Auftrag wird abgewartet, da er schneller fertig
+        ist als ein erneutes Dekodieren; er zählt dennoch als Fehlgriff.
+
+        Args:
+            image_path: Pfad zum Bild
+            canvas_size: Tuple (Breite, Höhe) des Canvas
+
+        Returns:
+            PIL-Image oder None, wenn das Bild nicht vorgeladen wurde
+        """
+        with self._lock:
+            future = self._futures.pop((image_path, canvas_size), None)
+
+        if future is None or future.cancelled():
+            self.misses += 1
+            return None
+
+        if future.done():
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        try:
+            return future.result()
+        except Exception:
+            # Fehler werden beim synchronen Laden erneut ausgelöst und protokolliert
+            return None
+
+    def cancel(self):
+        """Bricht alle ausstehenden Aufträge ab, z.B. beim Kategoriewechsel."""
+        with self._lock:
+            self._generation += 1
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    def hit_rate(self):
+        """Gibt die Trefferquote zwischen 0 und 1 zurück."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats_text(self):
+        """Formatiert die Statistik für das Status-Panel."""
+        return (f"Vorladen: {self.hits} Treffer / {self.misses} Fehlgriffe "
+                f"({self.hit_rate():.0%})")
+
+    def shutdown(self):
+        """Beendet den Thread-Pool, ohne auf laufende Aufträge zu warten."""
+        self.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,426 @@
+"""
+Qualitätsprüfung der Bounding Boxes in der Box-Datenbank.
+
+Lädt die Boxen blockweise in NumPy-Arrays (sortiert nach Bild) und prüft
+vektorisiert:
+
+    degenerate      Breite oder Höhe kleiner als min_size
+    out_of_image    Box ragt über das Bild hinaus (nur bei bekannter Bildgröße)
+    aspect_ratio    Seitenverhältnis größer als max_aspect
+    duplicate       zwei Boxen eines Bildes mit IoU >= iou_threshold
+    unconverted     Box eines alten Werkzeugs, noch nicht in Originalbild-
+                    Koordinaten (boxes.coord_space); nur gemeldet, die übrigen
+                    Prüfungen lassen sie aus. Umgerechnet wird mit "cli.py migrate".
+
+Die Prüfung liest nur und ändert keine Boxen.
+
+Die paarweise IoU wird nur innerhalb eines Bildes berechnet: Für Bilder
+mit wenigen Boxen werden die Paare vieler Bilder auf einmal gebildet,
+Bilder mit sehr vielen Boxen werden blockweise als Matrix verglichen.
+
+Aufruf:
+    python qa.py --db bounding_boxes.db --category Hunde --report qa_bericht.csv
+"""
+import argparse
+import csv
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+from catalog import legacy_box_ids
+from metrics import observe
+from schema import ensure_schema
+from storage import connect
+
+DEGENERATE = "degenerate"
+OUT_OF_IMAGE = "out_of_image"
+ASPECT_RATIO = "aspect_ratio"
+DUPLICATE = "duplicate"
+UNCONVERTED = "unconverted"
+ISSUE_KINDS = (DEGENERATE, OUT_OF_IMAGE, ASPECT_RATIO, DUPLICATE, UNCONVERTED)
+
+# Zeilen pro fetchmany() beim Laden der Boxen
+CHUNK_SIZE = 500000
+
+# Höchstzahl der Boxpaare, die auf einmal verglichen werden
+PAIR_BUDGET = 4000000
+
+# Ab dieser Boxanzahl wird ein Bild blockweise als Matrix verglichen
+LARGE_IMAGE = 512
+
+# Die Boxen werden über den deckenden Index idx_boxes_image gelesen
+BOX_QUERY = "SELECT image_id, id, x1, y1, x2, y2, COALESCE(label_id, 0) FROM boxes ORDER BY image_id, id"
+
+CATEGORY_BOX_QUERY = '''
+    SELECT b.image_id, b.id, b.x1, b.y1, b.x2, b.y2, COALESCE(b.label_id, 0)
+    FROM categories c
+    JOIN images i ON i.category_id = c.id
+    JOIN boxes b ON b.image_id = i.id
+    WHERE c.name = ?
+    ORDER BY b.image_id, b.id
+'''
+
+IMAGE_QUERY = '''
+    SELECT i.id, c.name, i.name, COALESCE(i.width, 0), COALESCE(i.height, 0)
+    FROM images i JOIN categories c ON c.id = i.category_id
+'''
+
+
+def load_boxes(conn, category=None):
+    """
+    Lädt alle Boxen (optional einer Kategorie) als Arrays, sortiert nach Bild.
+
+    Returns:
+        Dictionary mit den int64-Arrays image_id, box_id, x1, y1, x2, y2, label_id
+    """
+    if category is None:
+        cursor = conn.execute(BOX_QUERY)
+    else:
+        cursor = conn.execute(CATEGORY_BOX_QUERY, (category,))
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=np.int64))
+    table = np.concatenate(chunks) if chunks else np.empty((0, 7), dtype=np.int64)
+    names = ("image_id", "box_id", "x1", "y1", "x2", "y2", "label_id")
+    return {name: np.ascontiguousarray(table[:, column]) for column, name in enumerate(names)}
+
+
+def load_images(conn, category=None):
+    """
+    Lädt Kategorie, Name und Größe der Bilder.
+
+    Returns:
+        Dictionary Bild-ID -> (Kategorie, Bildname, Breite, Höhe); unbekannte
+        Größen sind 0
+    """
+    query = IMAGE_QUERY
+    params = ()
+    if category is not None:
+        query += " WHERE c.name = ?"
+        params = (category,)
+    return {row[0]: row[1:] for row in conn.execute(query, params)}
+
+
+def pairwise_iou(ax1, ay1, ax2, ay2, bx1, by1, bx2, by2):
+    """Berechnet die IoU elementweise bzw. per Broadcasting; Boxen ohne Fläche ergeben 0."""
+    iw = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    ih = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    intersection = iw * ih
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - intersection
+    with np.errstate(divide="ignore", invalid="ignore"):
+        iou = np.where(union > 0, intersection / union, 0.0)
+    return iou
+
+
+def group_bounds(image_ids):
+    """Gibt Start- und Endindizes der Bildgruppen eines nach Bild sortierten Arrays zurück."""
+    if not len(image_ids):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(image_ids)) + 1))
+    ends = np.concatenate((starts[1:], [len(image_ids)]))
+    return starts, ends
+
+
+def find_duplicates(boxes, iou_threshold, progress=None):
+    """
+    Sucht Boxpaare desselben Bildes mit IoU >= iou_threshold.
+
+    Args:
+        boxes: Ergebnis von load_boxes()
+        iou_threshold: Schwellwert für die IoU
+        progress: Optionale Funktion (geprüfte Boxen, Gesamtzahl)
+
+    Returns:
+        Tuple (Index a, Index b, IoU) als Arrays; Indizes beziehen sich auf boxes
+    """
+    coords = [boxes[name].astype(np.float64) for name in ("x1", "y1", "x2", "y2")]
+    starts, ends = group_bounds(boxes["image_id"])
+    sizes = ends - starts
+    found_a, found_b, found_iou = [], [], []
+
+    def keep(a, b, iou):
+        mask = iou >= iou_threshold
+        if mask.any():
+            found_a.append(a[mask])
+            found_b.append(b[mask])
+            found_iou.append(iou[mask])
+
+    # Bilder mit wenigen Boxen: Paare vieler Bilder gemeinsam bilden
+    small = (sizes > 1) & (sizes < LARGE_IMAGE)
+    small_starts, small_ends = starts[small], ends[small]
+    pair_counts = (small_ends - small_starts) * (small_ends - small_starts - 1) // 2
+    cumulative = np.cumsum(pair_counts)
+    first = 0
+    total = len(boxes["box_id"])
+    processed = 0
+    while first < len(small_starts):
+        done = cumulative[first - 1] if first else 0
+        last = max(first + 1, int(np.searchsorted(cumulative, done + PAIR_BUDGET, side="right")))
+        group_start, group_end = small_starts[first:last], small_ends[first:last]
+        members = _ranges(group_start, group_end)
+        member_end = np.repeat(group_end, group_end - group_start)
+        partners = member_end - members - 1
+        a = np.repeat(members, partners)
+        offsets = np.arange(len(a)) - np.repeat(np.cumsum(partners) - partners, partners)
+        b = a + 1 + offsets
+        x1, y1, x2, y2 = coords
+        keep(a, b, pairwise_iou(x1[a], y1[a], x2[a], y2[a], x1[b], y1[b], x2[b], y2[b]))
+        first = last
+        processed += len(members)
+        if progress:
+            progress(processed, total)
+
+    # Bilder mit sehr vielen Boxen: obere Dreiecksmatrix blockweise
+    x1, y1, x2, y2 = coords
+    for start, end in zip(starts[sizes >= LARGE_IMAGE], ends[sizes >= LARGE_IMAGE]):
+        block = max(1, PAIR_BUDGET // (end - start))
+        for row in range(start, end, block):
+            rows = np.arange(row, min(row + block, end))
+            cols = np.arange(row + 1, end)
+            if not len(cols):
+                break
+            iou = pairwise_iou(
+                x1[rows, None], y1[rows, None], x2[rows, None], y2[rows, None],
+                x1[None, cols], y1[None, cols], x2[None, cols], y2[None, cols]
+            )
+            iou[cols[None, :] <= rows[:, None]] = 0.0
+            r, c = np.nonzero(iou >= iou_threshold)
+            if len(r):
+                found_a.append(rows[r])
+                found_b.append(cols[c])
+                found_iou.append(iou[r, c])
+        processed += end - start
+        if progress:
+            progress(int(processed), total)
+
+    if progress:
+        progress(total, total)
+    if not found_a:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+    return np.concatenate(found_a), np.concatenate(found_b), np.concatenate(found_iou)
+
+
+def _ranges(starts, ends):
+    """Verkettet np.arange(s, e) für alle Paare, ohne Python-Schleife."""
+    lengths = ends - starts
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets
+
+
+class QaReport:
+    """
+    Ergebnis einer Qualitätsprüfung.
+
+    issues enthält je Art ein Dictionary mit den Arrays box_id, other_id
+    (zweite Box bei duplicate, sonst 0), image_id und value (IoU bzw.
+    Seitenverhältnis, sonst 0).
+    """
+
+    def __init__(self, images, boxes_checked, images_checked, seconds, issues, settings):
+        self.images = images
+        self.boxes_checked = boxes_checked
+        self.images_checked = images_checked
+        self.seconds = seconds
+        self.issues = issues
+        self.settings = settings
+
+    def counts(self):
+        """Anzahl der Befunde je Art."""
+        return {kind: int(len(self.issues[kind]["box_id"])) for kind in ISSUE_KINDS}
+
+    def summary(self):
+        """Zusammenfassung als Dictionary (z.B. für JSON-Ausgabe)."""
+        return {
+            "boxes": self.boxes_checked,
+            "images": self.images_checked,
+            "seconds": round(self.seconds, 3),
+            "boxes_per_second": round(self.boxes_checked / self.seconds) if self.seconds > 0 else 0,
+            "issues": self.counts(),
+            "settings": self.settings,
+        }
+
+    def rows(self):
+        """Liefert (Art, Kategorie, Bildname, Box-ID, zweite Box-ID, Wert) je Befund."""
+        for kind in ISSUE_KINDS:
+            issue = self.issues[kind]
+            for image_id, box_id, other_id, value in zip(
+                issue["image_id"].tolist(), issue["box_id"].tolist(),
+                issue["other_id"].tolist(), issue["value"].tolist()
+            ):
+                category, image_name = self.images.get(image_id, ("", str(image_id)))[:2]
+                yield kind, category, image_name, box_id, other_id or "", round(value, 4)
+
+    def write_csv(self, path):
+        """Schreibt alle Befunde als CSV-Datei."""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Art", "Kategorie", "Bild", "Box-ID", "Zweite Box-ID", "Wert"])
+            writer.writerows(self.rows())
+
+    def review_queue(self):
+        """
+        Fasst die Befunde je Bild zusammen, in der Reihenfolge der Kategorien und Bildnamen.
+
+        Returns:
+            Liste von (Kategorie, Bildname, Box-IDs, Arten)
+        """
+        per_image = {}
+        for kind in ISSUE_KINDS:
+            issue = self.issues[kind]
+            for image_id, box_id, other_id in zip(
+                issue["image_id"].tolist(), issue["box_id"].tolist(), issue["other_id"].tolist()
+            ):
+                box_ids, kinds = per_image.setdefault(image_id, ([], set()))
+                box_ids.append(box_id)
+                if other_id:
+                    box_ids.append(other_id)
+                kinds.add(kind)
+        queue = []
+        for image_id, (box_ids, kinds) in per_image.items():
+            category, image_name = self.images.get(image_id, ("", str(image_id)))[:2]
+            queue.append((category, image_name, sorted(set(box_ids)), sorted(kinds)))
+        queue.sort()
+        return queue
+
+
+def run_qa(db_path, category=None, iou_threshold=0.9, max_aspect=10.0, min_size=2, progress=None):
+    """
+    Prüft die Boxen der Datenbank bzw. einer Kategorie.
+
+    Args:
+        db_path: Pfad zur Datenbank
+        category: Nur diese Kategorie prüfen (None = alle)
+        iou_threshold: Ab dieser IoU gelten zwei Boxen als Duplikat
+        max_aspect: Höchstes erlaubtes Seitenverhältnis (lange zu kurzer Seite)
+        min_size: Mindestbreite und -höhe in Pixeln
+        progress: Optionale Funktion (geprüfte Boxen, Gesamtzahl)
+
+    Returns:
+        QaReport
+    """
+    start = time.perf_counter()
+    conn = connect(db_path)
+    try:
+        ensure_schema(conn)
+        boxes = load_boxes(conn, category)
+        images = load_images(conn, category)
+        legacy = legacy_box_ids(conn, category)
+    finally:
+        conn.close()
+
+    # In Canvas-Koordinaten eines alten Werkzeugs lieferten die Prüfungen unsinnige Befunde
+    unconverted = np.isin(boxes["box_id"], np.fromiter(legacy, dtype=np.int64, count=len(legacy)))
+    index = np.flatnonzero(unconverted)
+    issues = {UNCONVERTED: {
+        "box_id": boxes["box_id"][index],
+        "other_id": np.zeros(len(index), dtype=np.int64),
+        "image_id": boxes["image_id"][index],
+        "value": np.zeros(len(index)),
+    }}
+    if legacy:
+        boxes = {name: np.ascontiguousarray(column[~unconverted]) for name, column in boxes.items()}
+
+    image_id = boxes["image_id"]
+    x1, y1, x2, y2 = boxes["x1"], boxes["y1"], boxes["x2"], boxes["y2"]
+    width = x2 - x1
+    height = y2 - y1
+
+    def issue(mask, value=None, other=None):
+        index = np.flatnonzero(mask)
+        return {
+            "box_id": boxes["box_id"][index],
+            "other_id": np.zeros(len(index), dtype=np.int64) if other is None else other,
+            "image_id": image_id[index],
+            "value": np.zeros(len(index)) if value is None else value[index],
+        }
+
+    degenerate = (width < min_size) | (height < min_size)
+    issues[DEGENERATE] = issue(degenerate)
+
+    # Bildgrößen aus dem Katalog, 0 = unbekannt
+    unique_ids, inverse = np.unique(image_id, return_inverse=True)
+    sizes = np.array([images.get(i, (None, None, 0, 0))[2:] for i in unique_ids.tolist()],
+                     dtype=np.int64).reshape(-1, 2)
+    image_width, image_height = sizes[inverse, 0], sizes[inverse, 1]
+    known = (image_width > 0) & (image_height > 0)
+    outside = known & ((x1 < 0) | (y1 < 0) | (x2 > image_width) | (y2 > image_height))
+    issues[OUT_OF_IMAGE] = issue(outside)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        aspect = np.maximum(width, height) / np.minimum(width, height)
+    issues[ASPECT_RATIO] = issue(~degenerate & (aspect > max_aspect), aspect)
+
+    a, b, iou = find_duplicates(boxes, iou_threshold, progress)
+    issues[DUPLICATE] = {
+        "box_id": boxes["box_id"][a],
+        "other_id": boxes["box_id"][b],
+        "image_id": image_id[a],
+        "value": iou,
+    }
+
+    elapsed = time.perf_counter() - start
+    observe("qa_seconds", elapsed)
+    settings = {"category": category, "iou_threshold": iou_threshold,
+                "max_aspect": max_aspect, "min_size": min_size}
+    return QaReport(images, len(image_id), len(unique_ids), elapsed, issues, settings)
+
+
+class QaJob(threading.Thread):
+    """
+    Führt eine Qualitätsprüfung in einem Hintergrund-Thread aus.
+
+    Fortschritt und Ergebnis werden in eine Queue gelegt, die die Oberfläche
+    im Tk-Hauptthread abfragt.
+    """
+
+    def __init__(self, events, *args, **kwargs):
+        """
+        Args:
+            events: queue.Queue für ("progress", geprüft, gesamt),
+                ("done", QaReport) oder ("error", Ausnahme)
+            *args, **kwargs: Argumente für run_qa()
+        """
+        super().__init__(daemon=True, name="qa")
+        self.events = events
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        try:
+            report = run_qa(
+                *self.args,
+                progress=lambda done, total: self.events.put(("progress", done, total)),
+                **self.kwargs
+            )
+            self.events.put(("done", report))
+        except Exception as e:
+            self.events.put(("error", e))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qualitätsprüfung der Bounding Boxes")
+    parser.add_argument("--db", default="bounding_boxes.db", help="Pfad zur Datenbank")
+    parser.add_argument("--category", help="Nur diese Kategorie prüfen")
+    parser.add_argument("--iou", type=float, default=0.9, help="IoU-Schwelle für Duplikate")
+    parser.add_argument("--max-aspect", type=float, default=10.0, help="Höchstes Seitenverhältnis")
+    parser.add_argument("--min-size", type=int, default=2, help="Mindestbreite und -höhe in Pixeln")
+    parser.add_argument("--report", help="CSV-Datei für alle Befunde")
+    args = parser.parse_args()
+
+    report = run_qa(args.db, args.category, args.iou, args.max_aspect, args.min_size)
+    if args.report:
+        report.write_csv(args.report)
+    json.dump(report.summary(), sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+if __name__ == "__main__":
+    main()
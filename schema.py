@@ -0,0 +1,529 @@
+import sqlite3
+
+# Aktuelle Schemaversion, gespeichert in PRAGMA user_version
+SCHEMA_VERSION = 5
+
+BOX_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_boxes_image
+        ON boxes(image_id, x1, y1, x2, y2, label_id);
+'''
+
+SCHEMA_V1 = f'''
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS images (
+        id INTEGER PRIMARY KEY,
+        category_id INTEGER NOT NULL REFERENCES categories(id),
+        name TEXT NOT NULL,
+        UNIQUE(category_id, name)
+    );
+    CREATE TABLE IF NOT EXISTS labels (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS boxes (
+        id INTEGER PRIMARY KEY,
+        image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+        label_id INTEGER REFERENCES labels(id),
+        x1 INTEGER NOT NULL,
+        y1 INTEGER NOT NULL,
+        x2 INTEGER NOT NULL,
+        y2 INTEGER NOT NULL
+    );
+    -- Deckender Index: das Laden der Boxen eines Bildes liest nur den Index
+    {BOX_INDEX}
+'''
+
+# Endungen, die gui3.py und gut2.py in der alten image_id mitspeicherten (wie catalog.IMAGE_EXTENSIONS)
+LEGACY_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
+
+
+def _strip_extension_sql(column):
+    """SQL-Ausdruck: column ohne eine der LEGACY_EXTENSIONS (LIKE ignoriert die Groß-/Kleinschreibung)."""
+    cases = " ".join(f"WHEN {column} LIKE '%{ext}' THEN substr({column}, 1, length({column}) - {len(ext)})"
+                     for ext in LEGACY_EXTENSIONS)
+    return f"CASE {cases} ELSE {column} END"
+
+
+def _has_extension_sql(column):
+    """SQL-Bedingung: column endet auf eine der LEGACY_EXTENSIONS."""
+    return "(" + " OR ".join(f"{column} LIKE '%{ext}'" for ext in LEGACY_EXTENSIONS) + ")"
+
+
+# Überführt die alte Tabelle boxes(image_id TEXT, category TEXT, ...).
+# Keines der alten Werkzeuge speicherte Originalbild-Koordinaten, und welches
+# eine Box schrieb, steht nicht in der Tabelle. Nur gui3.py und gut2.py
+# speicherten die image_id mit Dateiendung; deren Boxen sind sicher Canvas-
+# Koordinaten des auf 800x600 eingepassten, zentrierten Bildes ('display').
+# Boxen ohne Endung können von gui.py (ebenso) oder von der früheren gui4.py
+# (links oben, auf 90% der damaligen Canvasgröße eingepasst) stammen und
+# bleiben als 'unknown' zur Prüfung stehen. Die Zuordnung wird in
+# legacy_display_boxes vermerkt, Version 5 überträgt sie nach boxes.coord_space.
+MIGRATE_LEGACY_BOXES = '''
+    ALTER TABLE boxes RENAME TO boxes_legacy;
+''' + SCHEMA_V1 + f'''
+    INSERT OR IGNORE INTO categories (name)
+        SELECT DISTINCT category FROM boxes_legacy;
+    INSERT OR IGNORE INTO labels (name)
+        SELECT DISTINCT category FROM boxes_legacy;
+    INSERT OR IGNORE INTO images (category_id, name)
+        SELECT DISTINCT c.id, {_strip_extension_sql("l.image_id")}
+        FROM boxes_legacy l JOIN categories c ON c.name = l.category;
+    INSERT INTO boxes (id, image_id, label_id, x1, y1, x2, y2)
+        SELECT l.id, i.id, lb.id, l.x1, l.y1, l.x2, l.y2
+        FROM boxes_legacy l
+        JOIN categories c ON c.name = l.category
+        JOIN images i ON i.category_id = c.id AND i.name = {_strip_extension_sql("l.image_id")}
+        JOIN labels lb ON lb.name = l.category;
+    CREATE TABLE legacy_display_boxes (box_id INTEGER PRIMARY KEY, coord_space TEXT NOT NULL);
+    INSERT INTO legacy_display_boxes (box_id, coord_space)
+        SELECT l.id, CASE WHEN {_has_extension_sql("l.image_id")} THEN 'display' ELSE 'unknown' END
+        FROM boxes_legacy l JOIN boxes b ON b.id = l.id;
+    DROP TABLE boxes_legacy;
+'''
+
+
+# Version 2: Bildkatalog mit Dateimetadaten und Verzeichnis-mtimes
+CATALOG_V2 = '''
+    ALTER TABLE images ADD COLUMN file_name TEXT;
+    ALTER TABLE images ADD COLUMN file_size INTEGER;
+    ALTER TABLE images ADD COLUMN mtime_ns INTEGER;
+    ALTER TABLE images ADD COLUMN width INTEGER;
+    ALTER TABLE images ADD COLUMN height INTEGER;
+    ALTER TABLE images ADD COLUMN format TEXT;
+    CREATE TABLE IF NOT EXISTS catalog_dirs (
+        category_id INTEGER PRIMARY KEY REFERENCES categories(id),
+        mtime_ns INTEGER,
+        present INTEGER NOT NULL DEFAULT 1
+    );
+    -- Die Bildliste einer Kategorie ist ein reiner Indexbereich
+    CREATE INDEX IF NOT EXISTS idx_images_catalog
+        ON images(category_id, file_name) WHERE file_name IS NOT NULL;
+'''
+
+# Version 3: Objektdaten des Web-Backends (vorher objekte.json)
+OBJECTS_V3 = '''
+    CREATE TABLE IF NOT EXISTS objekt_daten (
+        bild_id TEXT PRIMARY KEY,
+        daten TEXT NOT NULL
+    ) WITHOUT ROWID;
+'''
+
+# Bucket der längeren Boxseite: <8, <16, ..., <1024, >=1024 Pixel
+SIZE_BUCKET_SQL = '''
+    CASE
+        WHEN max({b}.x2 - {b}.x1, {b}.y2 - {b}.y1) < 8 THEN 0
+        WHEN max({b}.x2 - {b}.x1, {b}.y2 - {b}.y1) < 16 THEN 1
+        WHEN max({b}.x2 - {b}.x1, {b}.y2 - {b}.y1) < 32 THEN 2
+        WHEN max({b}.x2 - {b}.x1, {b}.y2 - {b}.y1) < 64 THEN 3
+        WHEN max({b}.x2 - {b}.x1, {b}.y2 - {b}.y1) < 128 THEN 4
+        WHEN max({b}.x2 - {b}.x1, {b}.y2 - {b}.y1) < 256 THEN 5
+        WHEN max({b}.x2 - {b}.x1, {b}.y2 - {b}.y1) < 512 THEN 6
+        WHEN max({b}.x2 - {b}.x1, {b}.y2 - {b}.y1) < 1024 THEN 7
+        ELSE 8
+    END'''
+
+# Bucket des Seitenverhältnisses Breite:Höhe: ohne Fläche, <1:4, <1:2, <1:1, <2:1, <4:1, >=4:1
+ASPECT_BUCKET_SQL = '''
+    CASE
+        WHEN {b}.x2 <= {b}.x1 OR {b}.y2 <= {b}.y1 THEN 0
+        WHEN ({b}.x2 - {b}.x1) * 4 < {b}.y2 - {b}.y1 THEN 1
+        WHEN ({b}.x2 - {b}.x1) * 2 < {b}.y2 - {b}.y1 THEN 2
+        WHEN {b}.x2 - {b}.x1 < {b}.y2 - {b}.y1 THEN 3
+        WHEN {b}.x2 - {b}.x1 < ({b}.y2 - {b}.y1) * 2 THEN 4
+        WHEN {b}.x2 - {b}.x1 < ({b}.y2 - {b}.y1) * 4 THEN 5
+        ELSE 6
+    END'''
+
+
+def _histogram_change(row, delta):
+    """SQL, das die Histogramm-Buckets einer Box (NEW oder OLD) um delta ändert."""
+    return f'''
+        INSERT INTO stats_histogram (category_id, kind, bucket, count)
+            SELECT category_id, 'size', {SIZE_BUCKET_SQL.format(b=row)}, {delta}
+            FROM images WHERE id = {row}.image_id
+            ON CONFLICT(category_id, kind, bucket) DO UPDATE SET count = count + ({delta});
+        INSERT INTO stats_histogram (category_id, kind, bucket, count)
+            SELECT category_id, 'aspect', {ASPECT_BUCKET_SQL.format(b=row)}, {delta}
+            FROM images WHERE id = {row}.image_id
+            ON CONFLICT(category_id, kind, bucket) DO UPDATE SET count = count + ({delta});
+    '''
+
+
+# Trigger, die die Statistik-Tabellen bei jeder Boxänderung fortschreiben
+STATS_TRIGGER_NAMES = ("stats_box_insert", "stats_box_delete", "stats_box_update")
+STATS_TRIGGERS = f'''
+    CREATE TRIGGER IF NOT EXISTS stats_box_insert AFTER INSERT ON boxes BEGIN
+        INSERT INTO stats_image_boxes (image_id, boxes) VALUES (NEW.image_id, 1)
+            ON CONFLICT(image_id) DO UPDATE SET boxes = boxes + 1;
+        INSERT INTO stats_categories (category_id, boxes, annotated_images)
+            SELECT category_id, 1,
+                   (SELECT boxes FROM stats_image_boxes WHERE image_id = NEW.image_id) = 1
+            FROM images WHERE id = NEW.image_id
+            ON CONFLICT(category_id) DO UPDATE SET
+                boxes = boxes + 1, annotated_images = annotated_images + excluded.annotated_images;
+        INSERT INTO stats_daily (category_id, day, added, deleted)
+            SELECT category_id, date('now', 'localtime'), 1, 0 FROM images WHERE id = NEW.image_id
+            ON CONFLICT(category_id, day) DO UPDATE SET added = added + 1;
+        {_histogram_change("NEW", 1)}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stats_box_delete AFTER DELETE ON boxes BEGIN
+        UPDATE stats_image_boxes SET boxes = boxes - 1 WHERE image_id = OLD.image_id;
+        UPDATE stats_categories SET
+            boxes = boxes - 1,
+            annotated_images = annotated_images -
+                ((SELECT boxes FROM stats_image_boxes WHERE image_id = OLD.image_id) = 0)
+        WHERE category_id = (SELECT category_id FROM images WHERE id = OLD.image_id);
+        INSERT INTO stats_daily (category_id, day, added, deleted)
+            SELECT category_id, date('now', 'localtime'), 0, 1 FROM images WHERE id = OLD.image_id
+            ON CONFLICT(category_id, day) DO UPDATE SET deleted = deleted + 1;
+        {_histogram_change("OLD", -1)}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stats_box_update AFTER UPDATE OF x1, y1, x2, y2 ON boxes BEGIN
+        {_histogram_change("OLD", -1)}
+        {_histogram_change("NEW", 1)}
+    END;
+'''
+
+# Version 4: Statistik-Tabellen, die Trigger bei jeder Boxänderung fortschreiben
+STATS_V4 = f'''
+    CREATE TABLE IF NOT EXISTS stats_image_boxes (
+        image_id INTEGER PRIMARY KEY,
+        boxes INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS stats_categories (
+        category_id INTEGER PRIMARY KEY,
+        boxes INTEGER NOT NULL,
+        annotated_images INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS stats_histogram (
+        category_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (category_id, kind, bucket)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS stats_daily (
+        category_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        added INTEGER NOT NULL,
+        deleted INTEGER NOT NULL,
+        PRIMARY KEY (category_id, day)
+    ) WITHOUT ROWID;
+
+    {STATS_TRIGGERS}
+    -- Einmalige Übernahme der vorhandenen Boxen
+    INSERT INTO stats_image_boxes (image_id, boxes)
+        SELECT image_id, COUNT(*) FROM boxes GROUP BY image_id;
+    INSERT INTO stats_categories (category_id, boxes, annotated_images)
+        SELECT i.category_id, SUM(s.boxes), COUNT(*)
+        FROM stats_image_boxes s JOIN images i ON i.id = s.image_id
+        GROUP BY i.category_id;
+    INSERT INTO stats_histogram (category_id, kind, bucket, count)
+        SELECT i.category_id, 'size', {SIZE_BUCKET_SQL.format(b="b")} AS bucket, COUNT(*)
+        FROM boxes b JOIN images i ON i.id = b.image_id
+        GROUP BY i.category_id, bucket;
+    INSERT INTO stats_histogram (category_id, kind, bucket, count)
+        SELECT i.category_id, 'aspect', {ASPECT_BUCKET_SQL.format(b="b")} AS bucket, COUNT(*)
+        FROM boxes b JOIN images i ON i.id = b.image_id
+        GROUP BY i.category_id, bucket;
+'''
+
+# Schreibt die Statistik für alle Boxen mit ID > :after auf einmal fort;
+# ersetzt die Trigger, solange diese für einen Massenimport entfernt sind.
+# Die Boxen werden zuerst je Bild und je Kategorie und Boxgröße gezählt, die
+# teuren Bucket-Ausdrücke laufen dann nur noch über diese Gruppen.
+STATS_APPEND = f'''
+    CREATE TEMP TABLE IF NOT EXISTS stats_new_images (image_id INTEGER PRIMARY KEY, boxes INTEGER);
+    -- Breite und Höhe als Box im Ursprung, damit SIZE_BUCKET_SQL und ASPECT_BUCKET_SQL passen
+    CREATE TEMP TABLE IF NOT EXISTS stats_new_sizes (category_id, x1, y1, x2, y2, count);
+    DELETE FROM temp.stats_new_images;
+    DELETE FROM temp.stats_new_sizes;
+
+    INSERT INTO temp.stats_new_images (image_id, boxes)
+        SELECT image_id, COUNT(*) FROM boxes WHERE id > :after GROUP BY image_id;
+    INSERT INTO stats_categories (category_id, boxes, annotated_images)
+        SELECT i.category_id, SUM(n.boxes), SUM(COALESCE(s.boxes, 0) = 0)
+        FROM temp.stats_new_images n
+        JOIN images i ON i.id = n.image_id
+        LEFT JOIN stats_image_boxes s ON s.image_id = n.image_id
+        WHERE true
+        GROUP BY i.category_id
+        ON CONFLICT(category_id) DO UPDATE SET
+            boxes = boxes + excluded.boxes, annotated_images = annotated_images + excluded.annotated_images;
+    INSERT INTO stats_image_boxes (image_id, boxes)
+        SELECT image_id, boxes FROM temp.stats_new_images WHERE true
+        ON CONFLICT(image_id) DO UPDATE SET boxes = boxes + excluded.boxes;
+
+    INSERT INTO temp.stats_new_sizes
+        SELECT i.category_id, 0, 0, b.x2 - b.x1, b.y2 - b.y1, COUNT(*)
+        FROM boxes b JOIN images i ON i.id = b.image_id
+        WHERE b.id > :after
+        GROUP BY 1, 4, 5;
+    INSERT INTO stats_histogram (category_id, kind, bucket, count)
+        SELECT g.category_id, 'size', {SIZE_BUCKET_SQL.format(b="g")} AS bucket, SUM(g.count)
+        FROM temp.stats_new_sizes g WHERE true
+        GROUP BY g.category_id, bucket
+        ON CONFLICT(category_id, kind, bucket) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO stats_histogram (category_id, kind, bucket, count)
+        SELECT g.category_id, 'aspect', {ASPECT_BUCKET_SQL.format(b="g")} AS bucket, SUM(g.count)
+        FROM temp.stats_new_sizes g WHERE true
+        GROUP BY g.category_id, bucket
+        ON CONFLICT(category_id, kind, bucket) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO stats_daily (category_id, day, added, deleted)
+        SELECT category_id, date('now', 'localtime'), SUM(count), 0 FROM temp.stats_new_sizes WHERE true
+        GROUP BY category_id
+        ON CONFLICT(category_id, day) DO UPDATE SET added = added + excluded.added;
+
+    DROP TABLE temp.stats_new_images;
+    DROP TABLE temp.stats_new_sizes;
+'''
+
+# Version 5: Koordinatenraum je Box. 'image' sind Pixel des Originalbildes,
+# 'display' Canvas-Pixel von gui3.py/gut2.py (Bild per thumbnail() auf
+# LEGACY_CANVAS_SIZE eingepasst und zentriert), 'unknown' Boxen der alten
+# Tabelle mit unklarer Herkunft (siehe MIGRATE_LEGACY_BOXES). Nur
+# "cli.py migrate" rechnet sie um (catalog.convert_legacy_boxes()); Export und
+# Prüfung lassen sie bis dahin aus.
+COORD_SPACE_V5 = f'''
+    CREATE TABLE IF NOT EXISTS legacy_display_boxes (box_id INTEGER PRIMARY KEY, coord_space TEXT NOT NULL);
+    ALTER TABLE boxes ADD COLUMN coord_space TEXT NOT NULL DEFAULT 'image';
+    UPDATE boxes SET coord_space = (SELECT l.coord_space FROM legacy_display_boxes l WHERE l.box_id = boxes.id)
+        WHERE id IN (SELECT box_id FROM legacy_display_boxes);
+    DROP TABLE legacy_display_boxes;
+
+    -- Vor dieser Version migrierte Datenbanken: Bildnamen mit Endung stammen
+    -- nur aus gui3.py/gut2.py. Ihre Boxen wandern zum Bild ohne Endung.
+    INSERT OR IGNORE INTO images (category_id, name)
+        SELECT category_id, {_strip_extension_sql("name")} FROM images
+        WHERE file_name IS NULL AND {_has_extension_sql("name")};
+    CREATE TEMP TABLE legacy_names AS
+        SELECT s.id AS src, d.id AS dst
+        FROM images s JOIN images d ON d.category_id = s.category_id AND d.name = {_strip_extension_sql("s.name")}
+        WHERE s.file_name IS NULL AND {_has_extension_sql("s.name")};
+    UPDATE boxes SET coord_space = 'display',
+                     image_id = (SELECT dst FROM temp.legacy_names WHERE src = boxes.image_id)
+        WHERE image_id IN (SELECT src FROM temp.legacy_names);
+    -- Die Trigger sehen den Wechsel des Bildes nicht; Kategorie und Histogramme bleiben gleich
+    INSERT INTO stats_image_boxes (image_id, boxes)
+        SELECT n.dst, SUM(s.boxes) FROM temp.legacy_names n JOIN stats_image_boxes s ON s.image_id = n.src
+        WHERE true
+        GROUP BY n.dst
+        ON CONFLICT(image_id) DO UPDATE SET boxes = boxes + excluded.boxes;
+    DELETE FROM stats_image_boxes WHERE image_id IN (SELECT src FROM temp.legacy_names);
+    UPDATE stats_categories SET annotated_images = (
+            SELECT COUNT(*) FROM stats_image_boxes s JOIN images i ON i.id = s.image_id
+            WHERE i.category_id = stats_categories.category_id AND s.boxes > 0)
+        WHERE category_id IN (SELECT i.category_id FROM temp.legacy_names n JOIN images i ON i.id = n.src);
+    DELETE FROM images WHERE id IN (SELECT src FROM temp.legacy_names);
+    DROP TABLE temp.legacy_names;
+
+    -- Noch nicht umgerechnete Boxen finden, ohne alle Boxen zu lesen
+    CREATE INDEX IF NOT EXISTS idx_boxes_legacy
+        ON boxes(image_id) WHERE coord_space <> 'image';
+'''
+
+# Skripte, die eine Datenbank von Version n-1 auf Version n bringen
+UPGRADES = {
+    2: CATALOG_V2,
+    3: OBJECTS_V3,
+    4: STATS_V4,
+    5: COORD_SPACE_V5,
+}
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def execute_script(conn, script, params=()):
+    """
+    Führt die Anweisungen eines Skripts einzeln aus.
+
+    Anders als executescript() beginnt oder beendet dies keine Transaktion,
+    und jede Anweisung erhält dieselben Parameter.
+    """
+    # Trigger enthalten selbst Semikolons; ausgeführt wird erst eine vollständige Anweisung
+    statement = ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \t\n;"):
+                conn.execute(statement, params)
+            statement = ""
+
+
+def _upgrade_steps(conn, version):
+    """Liefert die noch fehlenden Skripte als Liste von (Skript, Zielversion, Lognachricht)."""
+    steps = []
+    if version == 0:
+        if "category" in _table_columns(conn, "boxes"):
+            steps.append((MIGRATE_LEGACY_BOXES, 1, "Alte Tabelle 'boxes' in das normalisierte Schema migriert"))
+        else:
+            steps.append((SCHEMA_V1, 1, None))
+        version = 1
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        steps.append((UPGRADES[target], target, f"Datenbankschema auf Version {target} aktualisiert"))
+    return steps
+
+
+def ensure_schema(conn, logger=None):
+    """
+    Legt das Schema an oder bringt eine bestehende Datenbank auf den aktuellen Stand.
+
+    Eine Datenbank mit der alten Tabelle boxes (ein Eintrag pro Bild und
+    Kategorie, Textschlüssel) wird einmalig und an Ort und Stelle in das
+    normalisierte Schema überführt; die Box-IDs bleiben dabei erhalten.
+
+    Starten mehrere Prozesse gleichzeitig, aktualisiert nur einer: Die
+    Version wird nach BEGIN IMMEDIATE, also unter der Schreibsperre, erneut
+    gelesen, und nur die dann noch fehlenden Schritte laufen in derselben
+    Transaktion.
+
+    Args:
+        conn: sqlite3.Connection
+        logger: Optionaler Logger für durchgeführte Migrationen
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        steps = _upgrade_steps(conn, version) if version < SCHEMA_VERSION else []
+        for script, target, _ in steps:
+            execute_script(conn, script)
+            conn.execute(f"PRAGMA user_version = {target}")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+    if logger:
+        for _, _, message in steps:
+            if message:
+                logger.info(message)
+
+
+def get_category_id(conn, name, create=False):
+    """
+    Ermittelt die ID einer Kategorie.
+
+    Args:
+        conn: sqlite3.Connection
+        name: Name der Kategorie
+        create: Legt die Kategorie an, falls sie fehlt
+
+    Returns:
+        ID oder None, wenn die Kategorie fehlt und nicht angelegt werden soll
+    """
+    if create:
+        conn.execute("INSERT INTO categories (name) VALUES (?) ON CONFLICT(name) DO NOTHING", (name,))
+    row = conn.execute("SELECT id FROM categories WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def get_label_id(conn, name, create=False):
+    """Ermittelt die ID eines Labels, legt es bei Bedarf an."""
+    if create:
+        conn.execute("INSERT INTO labels (name) VALUES (?) ON CONFLICT(name) DO NOTHING", (name,))
+    row = conn.execute("SELECT id FROM labels WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def get_image_id(conn, category, name, create=False):
+    """
+    Ermittelt die ID eines Bildes über Kategorie und Bildnamen.
+
+    Args:
+        conn: sqlite3.Connection
+        category: Name der Kategorie
+        name: Bildname ohne Endung
+        create: Legt Kategorie und Bild an, falls sie fehlen
+    """
+    category_id = get_category_id(conn, category, create)
+    if category_id is None:
+        return None
+    return _image_id(conn, category_id, name, create)
+
+
+def _image_id(conn, category_id, name, create):
+    if create:
+        conn.execute(
+            "INSERT INTO images (category_id, name) VALUES (?, ?) "
+            "ON CONFLICT(category_id, name) DO NOTHING",
+            (category_id, name)
+        )
+    row = conn.execute(
+        "SELECT id FROM images WHERE category_id = ? AND name = ?", (category_id, name)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def insert_box(conn, category, image_name, bbox, label=None):
+    """
+    Fügt eine Box ein und legt Kategorie, Bild und Label bei Bedarf an.
+
+    Args:
+        conn: sqlite3.Connection
+        category: Name der Kategorie
+        image_name: Bildname ohne Endung
+        bbox: Tuple mit (x1, y1, x2, y2) Koordinaten
+        label: Objektklasse, standardmäßig der Kategoriename
+
+    Returns:
+        ID der neuen Box
+    """
+    image_id = get_image_id(conn, category, image_name, create=True)
+    label_id = get_label_id(conn, label or category, create=True)
+    cursor = conn.execute(
+        "INSERT INTO boxes (image_id, label_id, x1, y1, x2, y2) VALUES (?, ?, ?, ?, ?, ?)",
+        (image_id, label_id, *bbox)
+    )
+    return cursor.lastrowid
+
+
+def insert_boxes(conn, boxes):
+    """
+    Fügt mehrere Boxen mit einem executemany ein.
+
+    Kategorien, Bilder und Labels werden je Name nur einmal ermittelt bzw.
+    angelegt. Die IDs werden ab der größten vorhandenen ID vergeben, so wie
+    SQLite es ohne Angabe täte; conn muss daher in einer Transaktion sein.
+
+    Args:
+        conn: sqlite3.Connection
+        boxes: Liste von (Kategorie, Bildname, (x1, y1, x2, y2), Label oder None)
+
+    Returns:
+        IDs der neuen Boxen in der Reihenfolge von boxes
+    """
+    if not boxes:
+        return []
+    category_ids = {}
+    image_ids = {}
+    label_ids = {}
+    rows = []
+    for category, image_name, bbox, label in boxes:
+        if category not in category_ids:
+            category_ids[category] = get_category_id(conn, category, create=True)
+        image_key = (category, image_name)
+        if image_key not in image_ids:
+            image_ids[image_key] = _image_id(conn, category_ids[category], image_name, create=True)
+        label = label or category
+        if label not in label_ids:
+            label_ids[label] = get_label_id(conn, label, create=True)
+        rows.append((image_ids[image_key], label_ids[label], *bbox))
+
+    first_id = conn.execute("SELECT coalesce(max(id), 0) + 1 FROM boxes").fetchone()[0]
+    box_ids = list(range(first_id, first_id + len(rows)))
+    conn.executemany(
+        "INSERT INTO boxes (id, image_id, label_id, x1, y1, x2, y2) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(box_id, *row) for box_id, row in zip(box_ids, rows)]
+    )
+    return box_ids
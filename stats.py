@@ -0,0 +1,151 @@
+"""
+Statistik über den Annotationsstand.
+
+Die Zahlen stammen aus den Tabellen stats_*, die Trigger bei jedem
+Einfügen, Ändern und Löschen einer Box fortschreiben (siehe schema.STATS_V4).
+Eine Abfrage liest daher nur wenige kleine Tabellen statt aller Boxen;
+einzig die Bildanzahl je Kategorie wird aus dem Index des Bildkatalogs gezählt.
+"""
+import datetime
+
+# Beschriftungen der Buckets aus schema.SIZE_BUCKET_SQL und schema.ASPECT_BUCKET_SQL
+SIZE_BUCKETS = ("<8", "8-15", "16-31", "32-63", "64-127", "128-255", "256-511", "512-1023", ">=1024")
+ASPECT_BUCKETS = ("ohne Fläche", "<1:4", "1:4-1:2", "1:2-1:1", "1:1-2:1", "2:1-4:1", ">=4:1")
+
+CATEGORY_QUERY = '''
+    SELECT c.name,
+           (SELECT COUNT(*) FROM images i WHERE i.category_id = c.id AND i.file_name IS NOT NULL),
+           COALESCE(s.annotated_images, 0),
+           COALESCE(s.boxes, 0)
+    FROM categories c
+    LEFT JOIN stats_categories s ON s.category_id = c.id
+'''
+
+HISTOGRAM_QUERY = '''
+    SELECT h.kind, h.bucket, SUM(h.count)
+    FROM stats_histogram h JOIN categories c ON c.id = h.category_id
+    {where}
+    GROUP BY h.kind, h.bucket
+'''
+
+DAILY_QUERY = '''
+    SELECT d.day, SUM(d.added), SUM(d.deleted)
+    FROM stats_daily d JOIN categories c ON c.id = d.category_id
+    WHERE d.day >= ? {category_filter}
+    GROUP BY d.day
+    ORDER BY d.day
+'''
+
+
+def category_progress(conn, category):
+    """
+    Gibt (Bilder, annotierte Bilder, Boxen) einer Kategorie zurück.
+
+    Günstig genug, um nach jedem Speichern aufgerufen zu werden.
+    """
+    row = conn.execute(CATEGORY_QUERY + " WHERE c.name = ?", (category,)).fetchone()
+    return tuple(row[1:]) if row else (0, 0, 0)
+
+
+def dataset_stats(conn, category=None, days=30):
+    """
+    Fasst den Annotationsstand zusammen.
+
+    Args:
+        conn: sqlite3.Connection
+        category: Nur diese Kategorie auswerten (None = alle)
+        days: Zeitraum der Annotationsrate in Tagen
+
+    Returns:
+        Dictionary mit categories, totals, box_size_histogram,
+        aspect_ratio_histogram und annotation_rate
+    """
+    if category is None:
+        rows = conn.execute(CATEGORY_QUERY + " ORDER BY c.name").fetchall()
+        where, params = "", ()
+    else:
+        rows = conn.execute(CATEGORY_QUERY + " WHERE c.name = ?", (category,)).fetchall()
+        where, params = "WHERE c.name = ?", (category,)
+
+    categories = []
+    totals = {"images": 0, "annotated_images": 0, "unannotated_images": 0, "boxes": 0}
+    for name, images, annotated, boxes in rows:
+        if not images and not boxes:
+            continue
+        entry = {
+            "name": name,
+            "images": images,
+            "annotated_images": annotated,
+            # Annotierte Bilder, deren Datei fehlt, zählen nicht als offen
+            "unannotated_images": max(0, images - annotated),
+            "boxes": boxes,
+            "boxes_per_image": round(boxes / annotated, 2) if annotated else 0.0,
+        }
+        categories.append(entry)
+        for key in totals:
+            totals[key] += entry[key]
+    totals["progress"] = round(totals["annotated_images"] / totals["images"], 4) if totals["images"] else 0.0
+
+    size_counts = [0] * len(SIZE_BUCKETS)
+    aspect_counts = [0] * len(ASPECT_BUCKETS)
+    for kind, bucket, count in conn.execute(HISTOGRAM_QUERY.format(where=where), params):
+        counts = size_counts if kind == "size" else aspect_counts
+        if 0 <= bucket < len(counts):
+            counts[bucket] += count
+
+    since = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat()
+    daily = conn.execute(
+        DAILY_QUERY.format(category_filter="AND c.name = ?" if category is not None else ""),
+        (since, *params)
+    ).fetchall()
+
+    return {
+        "category": category,
+        "categories": categories,
+        "totals": totals,
+        "box_size_histogram": [{"bucket": label, "count": count}
+                               for label, count in zip(SIZE_BUCKETS, size_counts)],
+        "aspect_ratio_histogram": [{"bucket": label, "count": count}
+                                   for label, count in zip(ASPECT_BUCKETS, aspect_counts)],
+        "annotation_rate": [{"day": day, "added": added, "deleted": deleted}
+                            for day, added, deleted in daily],
+    }
+
+
+def _bar(count, largest, width=30):
+    return "#" * (round(count / largest * width) if largest else 0)
+
+
+def stats_text(stats):
+    """Formatiert das Ergebnis von dataset_stats() als Text für das Statistik-Panel."""
+    totals = stats["totals"]
+    lines = [
+        f"Bilder: {totals['images']}, annotiert: {totals['annotated_images']} "
+        f"({totals['progress'] * 100:.1f} %), offen: {totals['unannotated_images']}, "
+        f"Boxen: {totals['boxes']}",
+        "",
+        f"{'Kategorie':<24}{'Bilder':>8}{'annotiert':>11}{'offen':>8}{'Boxen':>9}{'Ø/Bild':>8}",
+    ]
+    for entry in stats["categories"]:
+        lines.append(
+            f"{entry['name'][:23]:<24}{entry['images']:>8}{entry['annotated_images']:>11}"
+            f"{entry['unannotated_images']:>8}{entry['boxes']:>9}{entry['boxes_per_image']:>8.2f}"
+        )
+
+    for title, key in (("Boxgröße (längere Seite in Pixeln)", "box_size_histogram"),
+                       ("Seitenverhältnis (Breite:Höhe)", "aspect_ratio_histogram")):
+        histogram = stats[key]
+        largest = max((entry["count"] for entry in histogram), default=0)
+        lines += ["", title]
+        lines += [f"  {entry['bucket']:>12} {entry['count']:>9} {_bar(entry['count'], largest)}"
+                  for entry in histogram]
+
+    rate = stats["annotation_rate"]
+    largest = max((entry["added"] for entry in rate), default=0)
+    lines += ["", "Neue Boxen pro Tag"]
+    lines += [f"  {entry['day']} {entry['added']:>9} {_bar(entry['added'], largest)}"
+              f"{'  (-' + str(entry['deleted']) + ')' if entry['deleted'] else ''}"
+              for entry in rate]
+    if not rate:
+        lines.append("  (keine Änderungen im Zeitraum)")
+    return "\n".join(lines)
@@ -0,0 +1,297 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from schema import ensure_schema, insert_boxes
+
+INSERT_OBJECT_SQL = (
+    "INSERT INTO objekt_daten (bild_id, daten) VALUES (?, ?) "
+    "ON CONFLICT(bild_id) DO NOTHING"
+)
+
+
+class DatabaseBusyError(Exception):
+    """Die Datenbank blieb länger als das Timeout durch einen anderen Schreiber gesperrt."""
+
+
+def connect(db_path, timeout=5.0, check_same_thread=True, cached_statements=256):
+    """
+    Öffnet eine SQLite-Verbindung im WAL-Modus.
+
+    Im WAL-Modus blockieren Leser keine Schreiber, und mit synchronous=NORMAL
+    wird nur noch beim Checkpoint statt bei jedem Commit ein fsync ausgeführt.
+
+    Args:
+        db_path: Pfad zur Datenbankdatei
+        timeout: Wartezeit in Sekunden, wenn die Datenbank gesperrt ist
+        check_same_thread: Verwendung aus anderen Threads verbieten
+        cached_statements: Anzahl vorbereiteter Anweisungen, die wiederverwendet werden
+
+    Returns:
+        sqlite3.Connection
+    """
+    conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=check_same_thread,
+                           cached_statements=cached_statements)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Eine SQLite-Verbindung pro Thread für dieselbe Datenbank.
+
+    SQLite-Verbindungen dürfen nicht zwischen Threads geteilt werden; der Pool
+    öffnet daher für jeden Thread beim ersten Zugriff eine eigene Verbindung
+    und hält sie offen, sodass vorbereitete Anweisungen wiederverwendet werden.
+    Das Schema wird einmal beim Anlegen des Pools geprüft.
+    """
+
+    def __init__(self, db_path, timeout=5.0, logger=None):
+        """
+        Args:
+            db_path: Pfad zur Datenbankdatei
+            timeout: Wartezeit in Sekunden, wenn die Datenbank gesperrt ist
+            logger: Optionaler Logger für Schemamigrationen
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+        ensure_schema(self.connection(), logger)
+
+    def connection(self):
+        """Gibt die Verbindung des aufrufenden Threads zurück."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False nur, damit close_all() schließen darf
+            conn = connect(self.db_path, self.timeout, check_same_thread=False)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.add(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Schreibtransaktion mit der Verbindung des aufrufenden Threads.
+
+        BEGIN IMMEDIATE holt die Schreibsperre sofort und wartet dabei bis zum
+        Timeout; ein späteres Hochstufen einer Lesetransaktion, das im WAL-Modus
+        ohne Warten fehlschlagen kann, entfällt dadurch.
+
+        Raises:
+            DatabaseBusyError: Wenn die Sperre nicht rechtzeitig frei wurde
+        """
+        conn = self.connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e) or "busy" in str(e):
+                raise DatabaseBusyError(str(e)) from e
+            raise
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def release(self):
+        """Schließt die Verbindung des aufrufenden Threads, z.B. am Ende eines Hintergrund-Threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    def close_all(self):
+        """Schließt alle Verbindungen des Pools."""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+
+
+def insert_objects(conn, records):
+    """
+    Speichert Objektdaten des Web-Backends; vorhandene bild_ids werden übersprungen.
+
+    Enthält ein Datensatz 'kategorie' und 'boxen' (Liste von [x1, y1, x2, y2]),
+    werden die Boxen zusätzlich in die Tabelle boxes übernommen, damit sie in
+    den Desktop-Werkzeugen erscheinen. Bildname ist die bild_id ohne Endung.
+
+    Args:
+        conn: sqlite3.Connection innerhalb einer Transaktion
+        records: Liste von Dictionaries mit dem Schlüssel 'bild_id'
+
+    Returns:
+        Liste von bool je Datensatz: True = gespeichert, False = bereits vorhanden
+    """
+    statuses = []
+    boxes = []
+    for record in records:
+        bild_id = str(record["bild_id"])
+        cursor = conn.execute(INSERT_OBJECT_SQL, (bild_id, json.dumps(record, ensure_ascii=False)))
+        saved = cursor.rowcount == 1
+        statuses.append(saved)
+        if saved and isinstance(record.get("kategorie"), str) and record.get("boxen"):
+            image_name = os.path.splitext(bild_id)[0]
+            boxes.extend((record["kategorie"], image_name, tuple(int(v) for v in box), None)
+                         for box in record["boxen"])
+    insert_boxes(conn, boxes)
+    return statuses
+
+
+def existing_object_ids(conn, bild_ids):
+    """Gibt die Teilmenge der bild_ids zurück, zu denen Objektdaten gespeichert sind."""
+    if not bild_ids:
+        return set()
+    placeholders = ",".join("?" * len(bild_ids))
+    return {bild_id for (bild_id,) in conn.execute(
+        f"SELECT bild_id FROM objekt_daten WHERE bild_id IN ({placeholders})", list(bild_ids)
+    )}
+
+
+class BoxWriter:
+    """
+    Verzögertes, gebündeltes Schreiben von Bounding Boxes.
+
+    Neue Boxen erhalten sofort eine vorläufige, negative ID, damit die
+    Oberfläche sie anzeigen und wieder löschen kann, bevor sie geschrieben
+    sind. Alle Änderungen werden in einer einzigen Transaktion geschrieben,
+    sobald flush() aufgerufen wird oder die Warteschlange den Schwellwert
+    erreicht. Danach lassen sich vorläufige IDs über resolve() auflösen.
+    """
+
+    UPDATE_SQL = "UPDATE boxes SET x1 = ?, y1 = ?, x2 = ?, y2 = ? WHERE id = ?"
+    DELETE_SQL = "DELETE FROM boxes WHERE id = ?"
+
+    def __init__(self, conn, flush_threshold=50, logger=None):
+        """
+        Args:
+            conn: sqlite3.Connection
+            flush_threshold: Anzahl wartender Änderungen, ab der sofort geschrieben wird
+            logger: Optionaler Logger für die Kosten jedes Schreibvorgangs
+        """
+        self.conn = conn
+        self.flush_threshold = flush_threshold
+        self.logger = logger
+        self._inserts = OrderedDict()
+        self._updates = OrderedDict()
+        self._deletes = set()
+        self._resolved = {}
+        self._next_temp_id = -1
+
+        # Statistik
+        self.flush_count = 0
+        self.rows_written = 0
+        self.total_flush_ms = 0.0
+        self.last_flush_ms = 0.0
+        self.last_flush_rows = 0
+
+    def __len__(self):
+        return len(self._inserts) + len(self._updates) + len(self._deletes)
+
+    def resolve(self, box_id):
+        """Löst eine vorläufige ID nach dem Schreiben in die Datenbank-ID auf."""
+        return self._resolved.get(box_id, box_id)
+
+    def clear_resolved(self):
+        """Vergisst die Zuordnung vorläufiger IDs, z.B. beim Bildwechsel."""
+        self._resolved.clear()
+
+    def _maybe_flush(self):
+        if len(self) >= self.flush_threshold:
+            self.flush()
+
+    def add(self, category, image_name, bbox, label=None):
+        """
+        Merkt eine neue Box zum Speichern vor.
+
+        Args:
+            category: Kategorie des Bildes
+            image_name: ID (Dateiname ohne Endung) des Bildes
+            bbox: Tuple mit (x1, y1, x2, y2) Koordinaten
+            label: Objektklasse, standardmäßig der Kategoriename
+
+        Returns:
+            Vorläufige (negative) ID der Box
+        """
+        temp_id = self._next_temp_id
+        self._next_temp_id -= 1
+        self._inserts[temp_id] = (category, image_name, label or category, tuple(bbox))
+        self._maybe_flush()
+        return temp_id
+
+    def update(self, box_id, bbox):
+        """Merkt neue Koordinaten einer Box vor."""
+        box_id = self.resolve(box_id)
+        if box_id in self._inserts:
+            category, image_name, label, _ = self._inserts[box_id]
+            self._inserts[box_id] = (category, image_name, label, tuple(bbox))
+        else:
+            self._updates[box_id] = tuple(bbox)
+            self._maybe_flush()
+
+    def delete(self, box_id):
+        """Merkt das Löschen einer Box vor; ungeschriebene Boxen werden verworfen."""
+        box_id = self.resolve(box_id)
+        if self._inserts.pop(box_id, None) is None:
+            self._updates.pop(box_id, None)
+            self._deletes.add(box_id)
+            self._maybe_flush()
+
+    def flush(self):
+        """
+        Schreibt alle vorgemerkten Änderungen in einer Transaktion.
+
+        Returns:
+            Anzahl der geschriebenen Änderungen
+        """
+        rows = len(self)
+        if not rows:
+            return 0
+
+        start = time.perf_counter()
+        with self.conn:
+            box_ids = insert_boxes(self.conn, [(category, image_name, bbox, label)
+                                               for category, image_name, label, bbox in self._inserts.values()])
+            resolved = dict(zip(self._inserts, box_ids))
+            if self._updates:
+                self.conn.executemany(
+                    self.UPDATE_SQL, [(*bbox, box_id) for box_id, bbox in self._updates.items()]
+                )
+            if self._deletes:
+                self.conn.executemany(self.DELETE_SQL, [(box_id,) for box_id in self._deletes])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self._resolved.update(resolved)
+        self._inserts.clear()
+        self._updates.clear()
+        self._deletes.clear()
+
+        self.flush_count += 1
+        self.rows_written += rows
+        self.total_flush_ms += elapsed_ms
+        self.last_flush_ms = elapsed_ms
+        self.last_flush_rows = rows
+        if self.logger:
+            self.logger.info(f"{rows} Box-Änderungen in {elapsed_ms:.1f} ms geschrieben")
+        return rows
+
+    def stats_text(self):
+        """Formatiert die Schreibstatistik für das Status-Panel."""
+        if not self.flush_count:
+            return f"Speichern: {len(self)} ausstehend"
+        average = self.total_flush_ms / self.flush_count
+        return (f"Speichern: {len(self)} ausstehend, "
+                f"zuletzt {self.last_flush_rows} in {self.last_flush_ms:.1f} ms "
+                f"(Ø {average:.1f} ms)")
@@ -0,0 +1,322 @@
+"""
+Virtualisierte Übersicht einer Kategorie als Raster von Vorschaubildern.
+
+Gezeichnet werden nur die Zeilen im sichtbaren Bereich; die Canvas-Elemente
+einer Zelle werden beim Scrollen wiederverwendet, sodass die Kosten nicht
+von der Anzahl der Bilder abhängen. Vorschaubilder entstehen in einem
+Thread-Pool und liegen dauerhaft im DerivativeCache, im Speicher hält ein
+ImageCache die zuletzt gezeigten PhotoImages.
+"""
+import math
+import os
+import queue
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageTk
+
+from derivatives import DEFAULT_QUALITY
+from image_cache import ImageCache
+from metrics import timer
+
+THUMBNAIL_SIZE = 128
+CELL_PADDING = 6
+LABEL_HEIGHT = 16
+
+# Abstand beim Abholen fertiger Vorschaubilder
+POLL_INTERVAL_MS = 30
+
+# Farben der Annotationsmarke
+ANNOTATED_COLOR = "#2e9e44"
+OPEN_COLOR = "#b0b0b0"
+CURRENT_COLOR = "#1f6fd1"
+
+
+def load_thumbnail(cache, image_path, size):
+    """
+    Holt das Vorschaubild aus dem DerivativeCache (erzeugt es bei Bedarf) und dekodiert es.
+
+    Läuft in einem Worker-Thread; das PhotoImage entsteht erst im Tk-Thread.
+    """
+    mtime_ns = os.stat(image_path).st_mtime_ns
+    path = cache.get(image_path, mtime_ns, size, size, "jpeg", DEFAULT_QUALITY)
+    with Image.open(path) as img:
+        img.load()
+        return img.copy()
+
+
+class ThumbnailGrid:
+    """
+    Scrollbares Raster der Bilder einer Kategorie mit Annotationsmarke.
+
+    Die Scrollposition wird in Pixeln geführt, nicht über die scrollregion
+    des Canvas; auch bei 100.000 Bildern existieren nur so viele
+    Canvas-Elemente, wie Zellen sichtbar sind.
+    """
+
+    def __init__(self, parent, cache, on_open, annotated_names, thumb_size=THUMBNAIL_SIZE,
+                 max_workers=None, logger=None):
+        """
+        Args:
+            parent: Tk-Container für das Raster
+            cache: DerivativeCache für die Vorschaubilder
+            on_open: Funktion (Index), aufgerufen beim Klick auf ein Bild
+            annotated_names: Funktion (Bildnamen) -> Menge der Namen mit Boxen
+            thumb_size: Kantenlänge der Vorschaubilder in Pixeln
+            max_workers: Größe des Thread-Pools (Standard: CPU-Anzahl, höchstens 4)
+            logger: Optionaler Logger
+        """
+        self.cache = cache
+        self.on_open = on_open
+        self.annotated_names = annotated_names
+        self.thumb_size = thumb_size
+        self.logger = logger
+        self.cell_width = thumb_size + 2 * CELL_PADDING
+        self.cell_height = thumb_size + 2 * CELL_PADDING + LABEL_HEIGHT
+
+        self.frame = tk.Frame(parent)
+        self.canvas = tk.Canvas(self.frame, bg="white", highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self.on_scrollbar)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill="y")
+
+        self.images = []
+        self.current_index = None
+        self.top = 0
+        self.columns = 1
+        self._see_index = None
+
+        # Wiederverwendete Canvas-Elemente je sichtbarer Zelle
+        self._cells = []
+        self._visible_paths = set()
+
+        # Vorschaubilder im Speicher, Annotationsstand je Bildname
+        self._photos = ImageCache(max_bytes=64 * 1024 * 1024)
+        self._status = {}
+        self._failed = set()
+
+        # Höchstens max_pending Aufträge gleichzeitig, damit beim schnellen
+        # Scrollen keine Warteschlange aus längst unsichtbaren Bildern entsteht
+        workers = max_workers or min(4, os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self.max_pending = 2 * workers
+        self._pending = set()
+        self._wanted = []
+        self._results = queue.Queue()
+        self._poll_job = None
+        self._render_job = None
+
+        self.canvas.bind("<Configure>", lambda event: self.schedule_render())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-5>", self.on_mouse_wheel)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def set_images(self, images, current_index=None):
+        """Zeigt eine neue Bildliste an (z.B. nach einem Kategoriewechsel)."""
+        self.images = images
+        self.current_index = current_index
+        self.top = 0
+        self._status.clear()
+        self._failed.clear()
+        if current_index is not None:
+            self.see(current_index)
+        self.schedule_render()
+
+    def refresh(self, invalidate_status=False):
+        """Zeichnet neu, z.B. nachdem Bilder hinzugefügt oder entfernt wurden."""
+        if invalidate_status:
+            self._status.clear()
+        self.schedule_render()
+
+    def invalidate(self, image_path):
+        """Verwirft das Vorschaubild einer geänderten Datei."""
+        self._photos.invalidate(image_path)
+        self._failed.discard(image_path)
+        self.schedule_render()
+
+    def set_current(self, index):
+        """
+        Markiert das angezeigte Bild und scrollt es in den sichtbaren Bereich.
+
+        Der Annotationsstand des zuvor angezeigten Bildes wird neu gelesen,
+        weil dort gerade Boxen gezeichnet oder gelöscht worden sein können.
+        """
+        previous = self.current_index
+        if previous is not None and previous < len(self.images):
+            self._status.pop(self._name(previous), None)
+        self.current_index = index
+        if index is not None:
+            self.see(index)
+        self.schedule_render()
+
+    def see(self, index):
+        """Scrollt beim nächsten Zeichnen so, dass die Zeile des Bildes sichtbar ist."""
+        self._see_index = index
+        self.schedule_render()
+
+    def _name(self, index):
+        return os.path.splitext(os.path.basename(self.images[index]))[0]
+
+    def schedule_render(self):
+        """Fasst mehrere Scroll- und Größenereignisse zu einem Neuzeichnen zusammen."""
+        if self._render_job is None:
+            self._render_job = self.canvas.after_idle(self.render)
+
+    def render(self):
+        """Zeichnet die sichtbaren Zeilen und fordert fehlende Vorschaubilder an."""
+        self._render_job = None
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return
+
+        self.columns = max(1, width // self.cell_width)
+        if self._see_index is not None:
+            row_top = (self._see_index // self.columns) * self.cell_height
+            if row_top < self.top:
+                self.top = row_top
+            elif row_top + self.cell_height > self.top + height:
+                self.top = row_top + self.cell_height - height
+            self._see_index = None
+        rows = math.ceil(len(self.images) / self.columns)
+        total_height = rows * self.cell_height
+        self.top = max(0, min(self.top, total_height - height))
+
+        first = (self.top // self.cell_height) * self.columns
+        last = min(len(self.images), math.ceil((self.top + height) / self.cell_height) * self.columns)
+        indices = range(first, last)
+
+        with timer("thumbnail_grid_render_seconds"):
+            names = [self._name(index) for index in indices]
+            unknown = [name for name in names if name not in self._status]
+            if unknown:
+                annotated = self.annotated_names(unknown)
+                for name in unknown:
+                    self._status[name] = name in annotated
+
+            while len(self._cells) < len(indices):
+                self._cells.append(self._create_cell())
+
+            self._visible_paths = set()
+            size = (self.thumb_size, self.thumb_size)
+            self._wanted = []
+            for slot, (index, name) in enumerate(zip(indices, names)):
+                cell = self._cells[slot]
+                x = (index % self.columns) * self.cell_width
+                y = (index // self.columns) * self.cell_height - self.top
+                path = self.images[index]
+                self._visible_paths.add(path)
+                photo = self._photos.get(path, size)
+                if photo is None and path not in self._pending and path not in self._failed:
+                    self._wanted.append(path)
+                self._place_cell(cell, x, y, name, photo, self._status[name], index == self.current_index,
+                                 path in self._failed)
+
+            for cell in self._cells[len(indices):]:
+                for item in cell.values():
+                    self.canvas.itemconfigure(item, state=tk.HIDDEN)
+
+        if total_height > 0:
+            self.scrollbar.set(self.top / total_height, min(1.0, (self.top + height) / total_height))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self._submit()
+
+    def _create_cell(self):
+        size = self.thumb_size
+        return {
+            "frame": self.canvas.create_rectangle(0, 0, size, size, outline="", fill="#eeeeee"),
+            "image": self.canvas.create_image(0, 0, anchor=tk.CENTER),
+            "badge": self.canvas.create_oval(0, 0, 12, 12, outline="white"),
+            "label": self.canvas.create_text(0, 0, anchor=tk.N, font=("TkDefaultFont", 8)),
+        }
+
+    def _place_cell(self, cell, x, y, name, photo, annotated, current, failed):
+        size = self.thumb_size
+        left, top = x + CELL_PADDING, y + CELL_PADDING
+        self.canvas.coords(cell["frame"], left - 2, top - 2, left + size + 2, top + size + 2)
+        self.canvas.itemconfigure(cell["frame"], state=tk.NORMAL,
+                                  outline=CURRENT_COLOR if current else "",
+                                  width=3 if current else 1,
+                                  fill="#ffdddd" if failed else "#eeeeee")
+        self.canvas.coords(cell["image"], left + size // 2, top + size // 2)
+        self.canvas.itemconfigure(cell["image"], state=tk.NORMAL, image=photo or "")
+        self.canvas.coords(cell["badge"], left + size - 14, top + 2, left + size - 2, top + 14)
+        self.canvas.itemconfigure(cell["badge"], state=tk.NORMAL,
+                                  fill=ANNOTATED_COLOR if annotated else OPEN_COLOR)
+        self.canvas.coords(cell["label"], left + size // 2, top + size + 2)
+        label = name if len(name) <= 20 else name[:19] + "…"
+        self.canvas.itemconfigure(cell["label"], state=tk.NORMAL, text=label)
+
+    def _submit(self):
+        """Vergibt die sichtbaren fehlenden Vorschaubilder in Reihenfolge an den Pool."""
+        while self._wanted and len(self._pending) < self.max_pending:
+            path = self._wanted.pop(0)
+            self._pending.add(path)
+            future = self._executor.submit(load_thumbnail, self.cache, path, self.thumb_size)
+            future.add_done_callback(lambda done, path=path: self._results.put((path, done)))
+        if self._pending and self._poll_job is None:
+            self._poll_job = self.canvas.after(POLL_INTERVAL_MS, self.poll_results)
+
+    def poll_results(self):
+        """Übernimmt fertige Vorschaubilder im Tk-Thread."""
+        self._poll_job = None
+        size = (self.thumb_size, self.thumb_size)
+        changed = False
+        while True:
+            try:
+                path, future = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending.discard(path)
+            try:
+                photo = ImageTk.PhotoImage(future.result())
+            except Exception as e:
+                self._failed.add(path)
+                if self.logger:
+                    self.logger.warning(f"Vorschaubild für '{path}' nicht erzeugt: {e}")
+            else:
+                self._photos.put(path, size, photo)
+            changed = changed or path in self._visible_paths
+        if changed:
+            self.schedule_render()
+        else:
+            self._submit()
+
+    def on_scrollbar(self, *args):
+        """Verarbeitet die Befehle der Scrollbar (moveto/scroll)."""
+        total_height = math.ceil(len(self.images) / self.columns) * self.cell_height
+        height = self.canvas.winfo_height()
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total_height)
+        elif args[0] == "scroll":
+            step = height if args[2] == "pages" else self.cell_height // 2
+            self.top += int(args[1]) * step
+        self.schedule_render()
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.top -= self.cell_height // 2
+        else:
+            self.top += self.cell_height // 2
+        self.schedule_render()
+
+    def on_click(self, event):
+        column = event.x // self.cell_width
+        if column >= self.columns:
+            return
+        index = ((event.y + self.top) // self.cell_height) * self.columns + column
+        if index < len(self.images):
+            self.on_open(index)
+
+    def shutdown(self):
+        """Bricht wartende Aufträge ab und stoppt das Abholen."""
+        for job in (self._poll_job, self._render_job):
+            if job is not None:
+                self.canvas.after_cancel(job)
+        self._poll_job = self._render_job = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
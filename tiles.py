@@ -0,0 +1,250 @@
+import math
+import os
+from PIL import Image
+
+from image_cache import ImageCache
+
+# Kantenlänge einer Kachel in Pixeln der jeweiligen Pyramidenstufe
+TILE_SIZE = 512
+
+# Feste Canvasgröße der älteren Werkzeuge gui.py, gui3.py und gut2.py
+LEGACY_CANVAS_SIZE = (800, 600)
+
+# Gigapixel-Scans liegen weit über der Standardgrenze von PIL für
+# Dekompressionsbomben; die Bilder stammen aus dem eigenen Bildordner.
+Image.MAX_IMAGE_PIXELS = None
+
+
+def pil_image_nbytes(img):
+    """Berechnet den Speicherbedarf eines dekodierten PIL-Images."""
+    return img.width * img.height * len(img.getbands())
+
+
+class ViewTransform:
+    """
+    Abbildung zwischen Originalbild- und Canvas-Koordinaten.
+
+    canvas = original * scale + offset
+    """
+
+    def __init__(self, scale=1.0, offset_x=0.0, offset_y=0.0):
+        self.scale = scale
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+
+    def to_canvas(self, x, y):
+        """Rechnet einen Punkt des Originalbildes in Canvas-Koordinaten um."""
+        return x * self.scale + self.offset_x, y * self.scale + self.offset_y
+
+    def to_image(self, x, y):
+        """Rechnet einen Canvas-Punkt in Originalbild-Koordinaten um."""
+        return (x - self.offset_x) / self.scale, (y - self.offset_y) / self.scale
+
+    def box_to_canvas(self, box):
+        """Rechnet eine Box (x1, y1, x2, y2) in Canvas-Koordinaten um."""
+        x1, y1 = self.to_canvas(box[0], box[1])
+        x2, y2 = self.to_canvas(box[2], box[3])
+        return x1, y1, x2, y2
+
+    def box_to_image(self, box):
+        """Rechnet eine Canvas-Box in gerundete Originalbild-Koordinaten um."""
+        x1, y1 = self.to_image(box[0], box[1])
+        x2, y2 = self.to_image(box[2], box[3])
+        return round(x1), round(y1), round(x2), round(y2)
+
+    def zoom_at(self, factor, canvas_x, canvas_y):
+        """Zoomt um den Faktor, wobei der Punkt unter dem Mauszeiger fest bleibt."""
+        self.offset_x = canvas_x - (canvas_x - self.offset_x) * factor
+        self.offset_y = canvas_y - (canvas_y - self.offset_y) * factor
+        self.scale *= factor
+
+    def pan(self, dx, dy):
+        """Verschiebt die Ansicht um (dx, dy) Canvas-Pixel."""
+        self.offset_x += dx
+        self.offset_y += dy
+
+
+def thumbnail_size(original_size, max_size=LEGACY_CANVAS_SIZE):
+    """Größe, auf die Image.thumbnail(max_size) ein Bild verkleinert (ohne es zu laden)."""
+    width, height = original_size
+    max_width, max_height = max_size
+    if width <= max_width and height <= max_height:
+        return width, height
+    # Gleiche Rundung wie Image.thumbnail(): die Seite, die das Seitenverhältnis am besten trifft
+    aspect = width / height
+    if max_width / max_height >= aspect:
+        candidates = (math.floor(max_height * aspect), math.ceil(max_height * aspect))
+        return max(min(candidates, key=lambda n: abs(aspect - n / max_height)), 1), max_height
+    candidates = (math.floor(max_width / aspect), math.ceil(max_width / aspect))
+    return max_width, max(min(candidates, key=lambda n: 0 if n == 0 else abs(aspect - max_width / n)), 1)
+
+
+def centered_view(original_size, display_size, canvas_size=LEGACY_CANVAS_SIZE):
+    """
+    ViewTransform für ein auf display_size verkleinertes, im Canvas zentriertes Bild.
+
+    So zeigen gui.py, gui3.py und gut2.py ihre Bilder an (create_image mit
+    anchor=CENTER in der Canvasmitte); Tk rundet die linke obere Ecke ab.
+    """
+    return ViewTransform(
+        display_size[0] / original_size[0],
+        canvas_size[0] // 2 - display_size[0] // 2,
+        canvas_size[1] // 2 - display_size[1] // 2
+    )
+
+
+def fitted_view(original_size, canvas_size):
+    """
+    ViewTransform der früheren gui4.py für eine damalige Canvasgröße.
+
+    Sie speicherte Boxen relativ zur linken oberen Bildecke; größere Bilder
+    waren auf 90% des Canvas eingepasst, kleinere wurden nicht vergrößert.
+    """
+    width, height = original_size
+    ratio = min(canvas_size[0] / width, canvas_size[1] / height)
+    if ratio >= 1:
+        return ViewTransform()
+    return ViewTransform(int(width * ratio * 0.9) / width)
+
+
+class TilePyramid:
+    """
+    Bildpyramide eines großen Bildes mit Dekodierung nach Bedarf.
+
+    Stufe 0 ist die Originalauflösung, jede weitere Stufe halbiert Breite und
+    Höhe. Eine Stufe wird erst dekodiert, wenn eine ihrer Kacheln sichtbar
+    wird, und zwar mit verkleinernder Dekodierung (JPEG-Draft-Modus) bzw.
+    Image.reduce() oder aus einer bereits vorhandenen feineren Stufe.
+
+    PIL kann komprimierte Bilder nicht ausschnittweise dekodieren. Damit der
+    Speicher begrenzt bleibt, wird daher nur bis zur feinsten Stufe hinab
+    dekodiert, deren Stufenbild in das Budget des Stufen-Caches passt;
+    stärkere Vergrößerungen skalieren die Kacheln dieser Stufe hoch.
+    """
+
+    def __init__(self, image_path, tile_cache=None, level_cache=None):
+        """
+        Args:
+            image_path: Pfad zum Bild
+            tile_cache: ImageCache für Kacheln (PIL-Images)
+            level_cache: ImageCache für dekodierte Stufenbilder
+        """
+        self.image_path = image_path
+        self.tile_cache = tile_cache or ImageCache(64 * 1024 * 1024, sizeof=pil_image_nbytes)
+        self.level_cache = level_cache or ImageCache(512 * 1024 * 1024, sizeof=pil_image_nbytes)
+        self.mtime = os.stat(image_path).st_mtime_ns
+
+        # Liest nur den Header, das Bild wird hier nicht dekodiert
+        with Image.open(image_path) as img:
+            self.width, self.height = img.size
+            self.format = img.format
+
+        self.max_level = max(0, math.ceil(math.log2(max(self.width, self.height) / TILE_SIZE)))
+
+        # Feinste Stufe, deren Stufenbild (RGB) noch in das Budget passt
+        self.min_level = 0
+        while (self.min_level < self.max_level and
+               self.level_size(self.min_level)[0] * self.level_size(self.min_level)[1] * 3
+               > self.level_cache.max_bytes // 2):
+            self.min_level += 1
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def level_size(self, level):
+        """Gibt die Größe (Breite, Höhe) einer Pyramidenstufe zurück."""
+        factor = 2 ** level
+        return max(1, math.ceil(self.width / factor)), max(1, math.ceil(self.height / factor))
+
+    def level_for_scale(self, scale):
+        """
+        Wählt die Stufe, deren Auflösung für den Anzeigemaßstab ausreicht.
+
+        Args:
+            scale: Canvas-Pixel pro Originalpixel
+        """
+        if scale <= 0:
+            return self.max_level
+        level = math.floor(math.log2(1 / scale)) if scale < 1 else 0
+        return min(self.max_level, max(self.min_level, level))
+
+    def _decode_level(self, level):
+        """Dekodiert eine Stufe aus einer feineren Stufe oder der Datei."""
+        target = self.level_size(level)
+
+        # Bevorzugt eine bereits dekodierte feinere Stufe
+        for finer in range(level - 1, self.min_level - 1, -1):
+            img = self.level_cache.get(self.image_path, ("level", finer))
+            if img is not None:
+                img = img.reduce(2 ** (level - finer))
+                if img.size != target:
+                    img = img.resize(target, Image.LANCZOS)
+                return img
+        img = Image.open(self.image_path)
+        if img.format == "JPEG":
+            # Der JPEG-Decoder skaliert beim Dekodieren um bis zu 1/8
+            img.draft("RGB", target)
+        if img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGB")
+        factor = min(img.width // target[0], img.height // target[1])
+        if factor > 1:
+            img = img.reduce(factor)
+        if img.size != target:
+            img = img.resize(target, Image.LANCZOS)
+        return img
+
+    def level_image(self, level):
+        """Liefert das (zwischengespeicherte) Stufenbild."""
+        key = ("level", level)
+        img = self.level_cache.get(self.image_path, key)
+        if img is None:
+            img = self._decode_level(level)
+            self.level_cache.put(self.image_path, key, img, mtime=self.mtime)
+        return img
+
+    def tile(self, level, tx, ty):
+        """
+        Liefert eine Kachel als PIL-Image.
+
+        Args:
+            level: Pyramidenstufe
+            tx, ty: Kachelindex in der Stufe
+        """
+        key = (level, tx, ty)
+        tile = self.tile_cache.get(self.image_path, key)
+        if tile is None:
+            level_width, level_height = self.level_size(level)
+            x0, y0 = tx * TILE_SIZE, ty * TILE_SIZE
+            box = (x0, y0, min(x0 + TILE_SIZE, level_width), min(y0 + TILE_SIZE, level_height))
+            tile = self.level_image(level).crop(box)
+            self.tile_cache.put(self.image_path, key, tile, mtime=self.mtime)
+        return tile
+
+    def visible_tiles(self, level, region):
+        """
+        Ermittelt die Kacheln einer Stufe, die einen Bereich schneiden.
+
+        Args:
+            level: Pyramidenstufe
+            region: Bereich (x1, y1, x2, y2) in Originalbild-Koordinaten
+
+        Returns:
+            Liste von (tx, ty, Box in Originalbild-Koordinaten)
+        """
+        factor = 2 ** level
+        span = TILE_SIZE * factor
+        x1 = max(0, region[0])
+        y1 = max(0, region[1])
+        x2 = min(self.width, region[2])
+        y2 = min(self.height, region[3])
+        if x1 >= x2 or y1 >= y2:
+            return []
+
+        tiles = []
+        for ty in range(int(y1 // span), int(math.ceil(y2 / span))):
+            for tx in range(int(x1 // span), int(math.ceil(x2 / span))):
+                box = (tx * span, ty * span,
+                       min(self.width, (tx + 1) * span), min(self.height, (ty + 1) * span))
+                tiles.append((tx, ty, box))
+        return tiles
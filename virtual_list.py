@@ -0,0 +1,278 @@
+"""
+Virtualisierte, durchsuchbare Liste für sehr viele Einträge.
+
+Ersetzt tkinter.Listbox dort, wo zehntausende Einträge vorkommen: Die
+Einträge liegen nur als Python-Liste vor, gezeichnet werden ausschließlich
+die sichtbaren Zeilen mit wiederverwendeten Canvas-Elementen. Das Befüllen
+kostet daher unabhängig von der Anzahl der Einträge nur eine Zuweisung.
+
+Das Suchfeld filtert beim Tippen: Treffer am Wortanfang kommen über einen
+sortierten Index per bisect, Treffer innerhalb des Namens folgen danach.
+Verlängert sich der Suchbegriff, wird nur die vorige Trefferliste weiter
+eingeschränkt.
+"""
+import bisect
+import tkinter as tk
+from tkinter import font as tkfont
+
+from metrics import timer
+
+SELECTED_COLOR = "#cde3f7"
+ROW_PADDING = 4
+
+
+class VirtualList:
+    """
+    Liste mit Suchfeld, die nur die sichtbaren Zeilen erzeugt.
+
+    Die Einträge werden in der übergebenen Reihenfolge angezeigt; insert()
+    setzt voraus, dass diese Reihenfolge sortiert ist (wie bei den Kategorien).
+    """
+
+    def __init__(self, parent, on_select=None, width=20, search=True):
+        """
+        Args:
+            parent: Tk-Container für die Liste
+            on_select: Funktion (Eintrag), aufgerufen bei Auswahl per Klick oder Tastatur
+            width: Breite in Zeichen
+            search: Suchfeld anzeigen
+        """
+        self.on_select = on_select
+        self.font = tkfont.nametofont("TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + ROW_PADDING
+
+        self.frame = tk.Frame(parent)
+        self.query = tk.StringVar()
+        self.entry = None
+        if search:
+            self.entry = tk.Entry(self.frame, textvariable=self.query)
+            self.entry.pack(side=tk.TOP, fill=tk.X)
+            # Tastenkürzel des Hauptfensters (z.B. "z", Pfeiltasten) nicht beim Tippen auslösen
+            self.entry.bindtags((str(self.entry), "Entry", "all"))
+            self.entry.bind("<Down>", lambda event: self.move_selection(1))
+            self.entry.bind("<Up>", lambda event: self.move_selection(-1))
+            self.entry.bind("<Return>", lambda event: self.move_selection(0))
+            self.entry.bind("<Escape>", lambda event: self.query.set(""))
+            self.query.trace_add("write", lambda *args: self.schedule_filter())
+        self.canvas = tk.Canvas(self.frame, bg="white", highlightthickness=0,
+                                width=width * self.font.measure("0"))
+        self.scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self.on_scrollbar)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill="y")
+
+        self.items = []
+        self.visible = self.items
+        self.selection = None
+        self.top = 0
+
+        # Suchindex: sortierte Liste (kleingeschrieben, Eintrag), erst bei der ersten Suche aufgebaut
+        self._index = None
+        self._lower = None
+        self._query = ""
+        self._substring_matches = None
+
+        self._rows = []
+        self._highlight = self.canvas.create_rectangle(0, 0, 0, 0, outline="", fill=SELECTED_COLOR,
+                                                       state=tk.HIDDEN)
+        self._render_job = None
+        self._filter_job = None
+
+        self.canvas.bind("<Configure>", lambda event: self.schedule_render())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-5>", self.on_mouse_wheel)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        position = bisect.bisect_left(self.items, item)
+        return position < len(self.items) and self.items[position] == item
+
+    def set_items(self, items):
+        """Ersetzt alle Einträge; die Auswahl bleibt erhalten, wenn der Eintrag noch vorkommt."""
+        self.items = list(items)
+        self._index = self._lower = None
+        if self.selection is not None and self.selection not in self:
+            self.selection = None
+        self.apply_filter(force=True)
+
+    def insert(self, item):
+        """Fügt einen Eintrag an seiner sortierten Position ein."""
+        position = bisect.bisect_left(self.items, item)
+        if position < len(self.items) and self.items[position] == item:
+            return
+        self.items.insert(position, item)
+        if self._index is not None:
+            lower = item.lower()
+            self._lower[item] = lower
+            bisect.insort(self._index, (lower, item))
+        self.apply_filter(force=True)
+
+    def remove(self, item):
+        """Entfernt einen Eintrag; fehlt er, passiert nichts."""
+        position = bisect.bisect_left(self.items, item)
+        if position >= len(self.items) or self.items[position] != item:
+            return
+        del self.items[position]
+        if self._index is not None:
+            lower = self._lower.pop(item)
+            del self._index[bisect.bisect_left(self._index, (lower, item))]
+        if self.selection == item:
+            self.selection = None
+        self.apply_filter(force=True)
+
+    def next_item(self, item, step=1):
+        """Gibt den Eintrag step Positionen nach item zurück (zyklisch, ungefiltert)."""
+        if not self.items:
+            return None
+        position = bisect.bisect_left(self.items, item)
+        if position < len(self.items) and self.items[position] == item:
+            position += step
+        return self.items[position % len(self.items)]
+
+    def select(self, item, notify=False):
+        """
+        Wählt einen Eintrag aus und scrollt ihn in den sichtbaren Bereich.
+
+        Ist der Eintrag durch die Suche ausgeblendet, wird die Suche geleert.
+        """
+        if self.visible is not self.items and item not in self.visible:
+            self.query.set("")
+            self.apply_filter()
+        self.selection = item
+        self.see(item)
+        if notify and self.on_select:
+            self.on_select(item)
+
+    def see(self, item):
+        """Scrollt so, dass der Eintrag sichtbar ist."""
+        if self.visible is self.items:
+            position = bisect.bisect_left(self.items, item)
+        else:
+            try:
+                position = self.visible.index(item)
+            except ValueError:
+                return
+        row_top = position * self.row_height
+        height = self.canvas.winfo_height() or self.row_height
+        if row_top < self.top:
+            self.top = row_top
+        elif row_top + self.row_height > self.top + height:
+            self.top = row_top + self.row_height - height
+        self.schedule_render()
+
+    def move_selection(self, step):
+        """Verschiebt die Auswahl innerhalb der gefilterten Einträge (Pfeiltasten, Enter)."""
+        if not self.visible:
+            return "break"
+        try:
+            position = self.visible.index(self.selection) + step
+        except ValueError:
+            position = 0
+        self.select(self.visible[max(0, min(position, len(self.visible) - 1))], notify=True)
+        return "break"
+
+    def schedule_filter(self):
+        if self._filter_job is None:
+            self._filter_job = self.canvas.after_idle(self.apply_filter)
+
+    def _build_index(self):
+        self._lower = {item: item.lower() for item in self.items}
+        self._index = sorted((lower, item) for item, lower in self._lower.items())
+
+    def apply_filter(self, force=False):
+        """Filtert die Einträge nach dem Suchbegriff."""
+        self._filter_job = None
+        query = self.query.get().strip().lower()
+        if query == self._query and not force:
+            return
+        with timer("list_filter_seconds"):
+            if not query:
+                self.visible = self.items
+                self._substring_matches = None
+            else:
+                if self._index is None:
+                    self._build_index()
+                # Treffer am Anfang: zusammenhängender Bereich im sortierten Index
+                start = bisect.bisect_left(self._index, (query,))
+                end = bisect.bisect_left(self._index, (query + "\uffff",))
+                prefix = [item for _, item in self._index[start:end]]
+                # Treffer im Inneren: bei verlängertem Suchbegriff nur die vorigen Treffer
+                # weiter einschränken, und zwar alle (ein voriger Treffer am Anfang kann
+                # jetzt einer im Inneren sein); sorted() stellt die Reihenfolge von items her
+                lower = self._lower
+                if self._substring_matches is not None and self._query and query.startswith(self._query) \
+                        and not force:
+                    self._substring_matches = sorted(
+                        item for item in self.visible
+                        if query in lower[item] and not lower[item].startswith(query))
+                else:
+                    self._substring_matches = [item for item in self.items
+                                               if query in lower[item] and not lower[item].startswith(query)]
+                self.visible = prefix + self._substring_matches
+        self._query = query
+        self.top = 0
+        if self.selection is not None:
+            self.see(self.selection)
+        self.schedule_render()
+
+    def schedule_render(self):
+        if self._render_job is None:
+            self._render_job = self.canvas.after_idle(self.render)
+
+    def render(self):
+        """Zeichnet nur die sichtbaren Zeilen."""
+        self._render_job = None
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if height <= 1:
+            return
+        total_height = len(self.visible) * self.row_height
+        self.top = max(0, min(self.top, total_height - height))
+        first = self.top // self.row_height
+        last = min(len(self.visible), (self.top + height) // self.row_height + 1)
+
+        while len(self._rows) < last - first:
+            self._rows.append(self.canvas.create_text(0, 0, anchor=tk.W, font=self.font))
+        self.canvas.itemconfigure(self._highlight, state=tk.HIDDEN)
+        for row, position in zip(self._rows, range(first, last)):
+            item = self.visible[position]
+            y = position * self.row_height - self.top
+            self.canvas.coords(row, 4, y + self.row_height // 2)
+            self.canvas.itemconfigure(row, text=item, state=tk.NORMAL)
+            if item == self.selection:
+                self.canvas.coords(self._highlight, 0, y, width, y + self.row_height)
+                self.canvas.itemconfigure(self._highlight, state=tk.NORMAL)
+        for row in self._rows[last - first:]:
+            self.canvas.itemconfigure(row, state=tk.HIDDEN)
+
+        if total_height > height:
+            self.scrollbar.set(self.top / total_height, (self.top + height) / total_height)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.visible) * self.row_height)
+        elif args[0] == "scroll":
+            step = self.canvas.winfo_height() if args[2] == "pages" else self.row_height
+            self.top += int(args[1]) * step
+        self.schedule_render()
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.top -= 3 * self.row_height
+        else:
+            self.top += 3 * self.row_height
+        self.schedule_render()
+
+    def on_click(self, event):
+        position = (event.y + self.top) // self.row_height
+        if position < len(self.visible):
+            self.select(self.visible[position], notify=True)
+            self.canvas.focus_set()
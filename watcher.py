@@ -0,0 +1,285 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+
+from catalog import is_image_file
+
+# Konstanten aus <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+ROOT_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+CATEGORY_MASK = IN_CLOSE_WRITE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+
+EVENT_HEADER = struct.Struct("iIII")
+
+# Ereignisarten, die in die Warteschlange gelegt werden
+CATEGORY_ADDED = "category_added"
+CATEGORY_REMOVED = "category_removed"
+IMAGE_ADDED = "image_added"
+IMAGE_REMOVED = "image_removed"
+IMAGE_MODIFIED = "image_modified"
+
+
+def _load_inotify():
+    """Gibt die libc mit inotify-Funktionen zurück oder None, falls nicht verfügbar."""
+    if not hasattr(os, "O_NONBLOCK"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+def _scan_files(path):
+    """Liefert {Dateiname: (Größe, mtime in ns)} aller Bilder eines Verzeichnisses."""
+    files = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if is_image_file(entry.name) and entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+class FolderWatcher(threading.Thread):
+    """
+    Überwacht den Bilderordner und meldet Änderungen als einzelne Ereignisse.
+
+    Unter Linux wird inotify verwendet; andernfalls werden die mtimes der
+    Kategorieverzeichnisse abgefragt und nur geänderte Verzeichnisse neu
+    eingelesen. Ereignisse werden als Tupel (Art, Kategorie, Dateiname) in die
+    übergebene Warteschlange gelegt; bei Kategorieereignissen ist der
+    Dateiname None. Der Thread berührt weder Tkinter noch die Datenbank.
+    """
+
+    def __init__(self, img_folder, events, poll_interval=2.0, full_scan_every=15,
+                 use_inotify=True, logger=None):
+        """
+        Args:
+            img_folder: Pfad zum Bilderordner
+            events: queue.Queue für die Ereignisse
+            poll_interval: Abfrageintervall in Sekunden ohne inotify
+            full_scan_every: Ohne inotify wird nach so vielen Intervallen auch
+                jedes unveränderte Verzeichnis eingelesen, um überschriebene
+                Dateien zu erkennen
+            use_inotify: inotify verwenden, falls verfügbar
+            logger: Optionaler Logger
+        """
+        super().__init__(daemon=True, name="watcher")
+        self.img_folder = img_folder
+        self.events = events
+        self.poll_interval = poll_interval
+        self.full_scan_every = full_scan_every
+        self.logger = logger
+        self._libc = _load_inotify() if use_inotify else None
+        self._stop_event = threading.Event()
+        self._files = {}
+        self._dir_mtimes = {}
+        self._wds = {}
+
+    @property
+    def backend(self):
+        return "inotify" if self._libc else "polling"
+
+    def stop(self):
+        """Beendet die Überwachung spätestens nach einem Intervall."""
+        self._stop_event.set()
+
+    def _emit(self, kind, category, name=None):
+        self.events.put((kind, category, name))
+
+    def _list_categories(self):
+        dirs = {}
+        with os.scandir(self.img_folder) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    dirs[entry.name] = entry.stat().st_mtime_ns
+        return dirs
+
+    def _sync_category(self, category, dir_mtime=None):
+        """Liest ein Verzeichnis ein und meldet die Unterschiede zum letzten Stand."""
+        path = os.path.join(self.img_folder, category)
+        try:
+            files = _scan_files(path)
+            if dir_mtime is None:
+                dir_mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        old = self._files.get(category, {})
+        for name in files.keys() - old.keys():
+            self._emit(IMAGE_ADDED, category, name)
+        for name in old.keys() - files.keys():
+            self._emit(IMAGE_REMOVED, category, name)
+        for name in files.keys() & old.keys():
+            if files[name] != old[name]:
+                self._emit(IMAGE_MODIFIED, category, name)
+        self._files[category] = files
+        self._dir_mtimes[category] = dir_mtime
+
+    def _sync(self, full=False):
+        """
+        Gleicht Kategorien und Bilder mit dem Dateisystem ab.
+
+        Args:
+            full: Auch Verzeichnisse mit unveränderter mtime einlesen
+        """
+        dirs = self._list_categories()
+        for category in self._files.keys() - dirs.keys():
+            self._remove_category(category)
+        for category, mtime in dirs.items():
+            if category not in self._files:
+                self._add_category(category)
+            elif full or self._dir_mtimes.get(category) != mtime:
+                self._sync_category(category, mtime)
+
+    def _add_category(self, category, emit=True):
+        if self._libc:
+            self._add_watch(category)
+        if emit:
+            self._emit(CATEGORY_ADDED, category)
+        # Bilder einer neuen Kategorie werden nicht einzeln gemeldet
+        path = os.path.join(self.img_folder, category)
+        try:
+            self._dir_mtimes[category] = os.stat(path).st_mtime_ns
+            self._files[category] = _scan_files(path)
+        except FileNotFoundError:
+            pass
+
+    def _remove_category(self, category):
+        self._files.pop(category, None)
+        self._dir_mtimes.pop(category, None)
+        self._emit(CATEGORY_REMOVED, category)
+
+    def run(self):
+        try:
+            if self._libc:
+                self._fd = self._libc.inotify_init1(os.O_NONBLOCK | getattr(os, "O_CLOEXEC", 0))
+                if self._fd < 0 or self._add_watch(None) < 0:
+                    raise OSError(ctypes.get_errno(), "inotify nicht verfügbar")
+            for category in self._list_categories():
+                self._add_category(category, emit=False)
+            if self.logger:
+                self.logger.info(f"Ordnerüberwachung gestartet ({self.backend})")
+            if self._libc:
+                self._run_inotify()
+            else:
+                self._run_polling()
+        except OSError as e:
+            if self._libc:
+                # Fällt auf Abfragen zurück, z.B. bei erschöpften inotify-Limits
+                if self.logger:
+                    self.logger.warning(f"inotify nicht nutzbar, wechsle zu Abfragen: {e}")
+                self._close_inotify()
+                self._run_polling()
+            elif self.logger:
+                self.logger.error(f"Ordnerüberwachung beendet: {e}")
+        finally:
+            self._close_inotify()
+
+    def _run_polling(self):
+        rounds = 0
+        while not self._stop_event.wait(self.poll_interval):
+            rounds += 1
+            full = self.full_scan_every and rounds % self.full_scan_every == 0
+            try:
+                self._sync(full=full)
+            except OSError as e:
+                if self.logger:
+                    self.logger.error(f"Fehler beim Abfragen des Bilderordners: {e}")
+
+    # inotify
+
+    def _add_watch(self, category):
+        if category is None:
+            path, mask = self.img_folder, ROOT_MASK
+        else:
+            path, mask = os.path.join(self.img_folder, category), CATEGORY_MASK
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd >= 0:
+            self._wds[wd] = category
+        elif category is not None and self.logger:
+            self.logger.warning(f"Verzeichnis '{category}' kann nicht überwacht werden")
+        return wd
+
+    def _close_inotify(self):
+        fd = getattr(self, "_fd", None)
+        if fd is not None and fd >= 0:
+            os.close(fd)
+        self._fd = None
+        self._libc = None
+        self._wds.clear()
+
+    def _run_inotify(self):
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select([self._fd], [], [], 0.5)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                self._handle_event(wd, mask, os.fsdecode(name))
+
+    def _handle_event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            # Ereignisse gingen verloren: vollständig abgleichen
+            self._sync(full=True)
+            return
+        if mask & IN_IGNORED:
+            self._wds.pop(wd, None)
+            return
+        if wd not in self._wds:
+            return
+
+        category = self._wds[wd]
+        if category is None:
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                raise OSError(f"Bilderordner '{self.img_folder}' wurde entfernt")
+            if not mask & IN_ISDIR:
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO) and name not in self._files:
+                self._add_category(name)
+            elif mask & (IN_DELETE | IN_MOVED_FROM) and name in self._files:
+                self._remove_category(name)
+            return
+
+        if mask & IN_ISDIR or not is_image_file(name):
+            return
+        files = self._files.setdefault(category, {})
+        path = os.path.join(self.img_folder, category, name)
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            if files.pop(name, None) is not None:
+                self._emit(IMAGE_REMOVED, category, name)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return
+            kind = IMAGE_MODIFIED if name in files else IMAGE_ADDED
+            files[name] = (stat.st_size, stat.st_mtime_ns)
+            self._emit(kind, category, name)